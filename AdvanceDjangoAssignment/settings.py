@@ -46,6 +46,7 @@ INSTALLED_APPS = [
 
 MIDDLEWARE = [
     'django.middleware.security.SecurityMiddleware',
+    'api.middleware.CompressionMiddleware',
     'django.contrib.sessions.middleware.SessionMiddleware',
     'django.middleware.common.CommonMiddleware',
     'django.middleware.csrf.CsrfViewMiddleware',
@@ -67,7 +68,6 @@ TEMPLATES = [
                 'django.template.context_processors.request',
                 'django.contrib.auth.context_processors.auth',
                 'django.contrib.messages.context_processors.messages',
-                'django_filters',
             ],
         },
     },
@@ -105,6 +105,27 @@ AUTH_PASSWORD_VALIDATORS = [
     },
 ]
 
+AUTHENTICATION_BACKENDS = ['api.hashing.PooledModelBackend']
+
+# The first hasher creates new hashes, the others still verify older ones
+PASSWORD_HASHERS = [
+    'api.hashing.PBKDF2PasswordHasher',
+    'django.contrib.auth.hashers.PBKDF2SHA1PasswordHasher',
+    'django.contrib.auth.hashers.Argon2PasswordHasher',
+    'django.contrib.auth.hashers.BCryptSHA256PasswordHasher',
+    'django.contrib.auth.hashers.ScryptPasswordHasher',
+]
+
+# PBKDF2 work factor. Passwords hashed with another value are re-hashed on
+# their next successful login.
+PASSWORD_HASH_ITERATIONS = 870000
+
+# Hashing pool size (defaults to the CPU count), how many jobs may queue on
+# top of it and how long a request waits for a slot before getting a 503
+PASSWORD_HASH_WORKERS = None
+PASSWORD_HASH_QUEUE = 32
+PASSWORD_HASH_WAIT = 2.0
+
 
 # Internationalization
 # https://docs.djangoproject.com/en/5.1/topics/i18n/
@@ -140,8 +161,64 @@ REST_FRAMEWORK = {
         'rest_framework_simplejwt.authentication.JWTAuthentication',
     ),
     'DEFAULT_FILTER_BACKENDS': ['django_filters.rest_framework.DjangoFilterBackend'],
+    'DEFAULT_RENDERER_CLASSES': (
+        'api.renderers.FastJSONRenderer',
+        'rest_framework.renderers.BrowsableAPIRenderer',
+    ),
+    'DEFAULT_THROTTLE_CLASSES': ['api.throttling.TokenBucketThrottle'],
+    # Number of reverse proxies in front of the app. Throttling keys
+    # anonymous clients by IP and only trusts that many X-Forwarded-For hops;
+    # left unset, DRF would take the client-supplied header as is
+    'NUM_PROXIES': 0,
+    'DEFAULT_PARSER_CLASSES': (
+        'api.renderers.FastJSONParser',
+        'rest_framework.parsers.FormParser',
+        'rest_framework.parsers.MultiPartParser',
+    ),
 }
 
+# Responses smaller than this (in bytes) are not compressed
+COMPRESSION_MIN_SIZE = 1024
+
+# How long stored Idempotency-Key responses are replayed
+IDEMPOTENCY_KEY_TTL = timedelta(hours=24)
+# A request still unfinished after this long is assumed dead and its key can
+# be reused by a retry
+IDEMPOTENCY_KEY_LEASE = timedelta(minutes=5)
+
+# Cache alias to share rate limit buckets between workers. When unset each
+# process keeps its own buckets in memory.
+RATE_LIMIT_CACHE = None
+
+# Largest number of calls in one /api/batch/ request and how many of its
+# read-only calls may run at once
+BATCH_MAX_REQUESTS = 20
+BATCH_MAX_WORKERS = 4
+
+# A job worker renews its lease after every chunk. A running job whose lease
+# has expired is picked up again by another worker, at most JOB_MAX_ATTEMPTS
+# times.
+JOB_LEASE = timedelta(minutes=5)
+JOB_MAX_ATTEMPTS = 3
+
+# Audit events are written in bulk every AUDIT_FLUSH_INTERVAL seconds, or once
+# AUDIT_FLUSH_SIZE are buffered, by a background thread in each process.
+# Without AUDIT_SPOOL_DIR a killed process loses the events buffered since
+# its last write, up to AUDIT_FLUSH_INTERVAL seconds' worth. Setting it keeps
+# a copy of unwritten events on disk at the cost of one file write per
+# committed change; run flush_audit_log after a crash to load them.
+AUDIT_FLUSH_SIZE = 500
+AUDIT_FLUSH_INTERVAL = 5
+AUDIT_FLUSH_IN_BACKGROUND = True
+AUDIT_BUFFER_CAPACITY = 100000
+AUDIT_SPOOL_DIR = None
+
+# Admin changelists count at most this many rows instead of the whole table
+ADMIN_COUNT_LIMIT = 10000
+
+# Events older than this are moved to the archive tables by archive_events
+ARCHIVE_EVENTS_AFTER = timedelta(days=30)
+
 AUTH_USER_MODEL = 'api.User'
 
 SIMPLE_JWT = {
@@ -150,3 +227,8 @@ SIMPLE_JWT = {
     'BLACKLIST_AFTER_ROTATION': True,
     'ALGORITHM': 'HS256',
 }
+
+# Whether the api test suite checks the response time budgets in
+# QUERY_BUDGETS. They have a wide margin on a developer machine; turn this
+# off on runners too slow or too noisy to meet them.
+QUERY_BUDGET_TIMINGS = True
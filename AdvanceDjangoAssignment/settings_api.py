@@ -0,0 +1,34 @@
+"""
+API-only settings for AdvanceDjangoAssignment.
+
+The API authenticates with JWT only, so this profile drops the admin,
+sessions, messages, static files, CSRF and clickjacking middleware and the
+browsable API. Select it with
+``DJANGO_SETTINGS_MODULE=AdvanceDjangoAssignment.settings_api``.
+"""
+
+from .settings import *  # noqa: F401,F403
+from .settings import INSTALLED_APPS, REST_FRAMEWORK
+
+INSTALLED_APPS = [
+    app for app in INSTALLED_APPS
+    if app not in (
+        'django.contrib.admin',
+        'django.contrib.sessions',
+        'django.contrib.messages',
+        'django.contrib.staticfiles',
+    )
+]
+
+MIDDLEWARE = [
+    'django.middleware.security.SecurityMiddleware',
+    'api.middleware.CompressionMiddleware',
+    'django.middleware.common.CommonMiddleware',
+]
+
+TEMPLATES = []
+
+REST_FRAMEWORK = {
+    **REST_FRAMEWORK,
+    'DEFAULT_RENDERER_CLASSES': ('api.renderers.FastJSONRenderer',),
+}
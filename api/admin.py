@@ -1,3 +1,127 @@
+"""
+Admin for the large tables.
+
+Changelists never run an exact ``COUNT(*)`` over the whole table, load
+foreign keys with the page in one query, edit foreign keys through raw-ID
+widgets instead of a ``<select>`` of every row, and page backwards through
+the primary key index ("Older entries") instead of with deep OFFSETs. Only
+indexed columns are offered as filters and searches.
+
+Inventory, seats, statuses and amounts are read-only, and rows cannot be
+added or deleted here: those changes have to go through the API so
+``api.lifecycle`` keeps facets, stats, seating and the audit log in step.
+"""
+from django.conf import settings
 from django.contrib import admin
+from django.contrib.admin.views.main import ORDER_VAR, PAGE_VAR, ChangeList
+from django.contrib.auth.admin import UserAdmin as BaseUserAdmin
+from django.core.paginator import Paginator
+from django.db import connections
+from django.utils.functional import cached_property
+
+from .models import Booking, Event, Payment, User
+
+KEYSET_VAR = 'id__lt'
+
+
+class EstimatedCountPaginator(Paginator):
+    """
+    Counts at most ``ADMIN_COUNT_LIMIT`` rows. Past that, an unfiltered
+    PostgreSQL table reports the planner's row estimate and anything else
+    reports the limit, so page links stop there and "Older entries" takes
+    over.
+    """
+
+    @cached_property
+    def count(self):
+        limit = settings.ADMIN_COUNT_LIMIT
+        count = self.object_list[:limit + 1].count()
+        if count <= limit:
+            return count
+        query = self.object_list.query
+        connection = connections[self.object_list.db]
+        if connection.vendor == 'postgresql' and not query.where:
+            with connection.cursor() as cursor:
+                cursor.execute(
+                    'SELECT reltuples::bigint FROM pg_class WHERE oid = %s::regclass',
+                    [self.object_list.model._meta.db_table],
+                )
+                row = cursor.fetchone()
+            if row and row[0] > limit:
+                return row[0]
+        return limit
+
+
+class KeysetChangeList(ChangeList):
+    def get_results(self, request):
+        super().get_results(request)
+        # Only the default newest-first ordering can continue from the last
+        # id on the page
+        self.next_page_url = None
+        if ORDER_VAR not in self.params and len(self.result_list) >= self.list_per_page:
+            last = list(self.result_list)[-1]
+            self.next_page_url = self.get_query_string({KEYSET_VAR: last.pk}, remove=[PAGE_VAR])
+
+
+class ScalableModelAdmin(admin.ModelAdmin):
+    paginator = EstimatedCountPaginator
+    show_full_result_count = False
+    show_facets = admin.ShowFacets.NEVER
+    ordering = ('-id',)
+    list_per_page = 100
+
+    def get_changelist(self, request, **kwargs):
+        return KeysetChangeList
+
+    def has_delete_permission(self, request, obj=None):
+        return False
+
+
+@admin.register(User)
+class UserAdmin(BaseUserAdmin, ScalableModelAdmin):
+    fieldsets = BaseUserAdmin.fieldsets + (('Role', {'fields': ('role',)}),)
+    list_display = ('id', 'username', 'email', 'role', 'is_staff')
+    list_filter = ('role',)
+    # Exact matches use the unique indexes
+    search_fields = ('=username', '=email')
+    ordering = ('-id',)
+
+
+@admin.register(Event)
+class EventAdmin(ScalableModelAdmin):
+    list_display = ('id', 'title', 'date', 'location', 'category', 'available_tickets', 'created_by')
+    list_select_related = ('created_by',)
+    list_filter = ('category',)
+    search_fields = ('=id',)
+    raw_id_fields = ('created_by',)
+    # The schedule and category feed the facet cube and venue conflict checks
+    readonly_fields = (
+        'date', 'time', 'duration', 'location', 'category', 'total_tickets', 'available_tickets', 'status'
+    )
+
+    def has_add_permission(self, request):
+        return False
+
+
+@admin.register(Booking)
+class BookingAdmin(ScalableModelAdmin):
+    list_display = ('id', 'user', 'event', 'number_of_tickets', 'status', 'booking_date')
+    list_select_related = ('user', 'event')
+    list_filter = ('status',)
+    search_fields = ('=id',)
+    readonly_fields = ('user', 'event', 'number_of_tickets', 'status', 'section', 'first_seat', 'booking_date')
+
+    def has_add_permission(self, request):
+        return False
+
+
+@admin.register(Payment)
+class PaymentAdmin(ScalableModelAdmin):
+    list_display = ('id', 'booking', 'amount', 'status', 'payment_method', 'payment_date')
+    list_select_related = ('booking__user', 'booking__event')
+    list_filter = ('status',)
+    search_fields = ('=id', '=booking__id')
+    readonly_fields = ('booking', 'payment_method', 'amount', 'status', 'payment_date')
 
-# Register your models here.
+    def has_add_permission(self, request):
+        return False
@@ -0,0 +1,56 @@
+from django.db import transaction
+
+from . import facets
+from .models import ArchivedBooking, ArchivedEvent, ArchivedEventSalesStats, ArchivedPayment, Booking, Event, \
+    EventSalesStats, Payment
+
+ARCHIVE_BATCH_SIZE = 500
+
+
+def _copy(model, source, exclude=()):
+    names = [field.attname for field in model._meta.concrete_fields if field.name not in exclude]
+    return model(**{name: getattr(source, name) for name in names})
+
+
+def archive_batch(before, batch_size=ARCHIVE_BATCH_SIZE):
+    """
+    Moves up to ``batch_size`` events dated before ``before``, with their
+    bookings, payments and sales stats, into the archive tables in one
+    transaction.
+    Returns the number of events moved.
+    """
+    with transaction.atomic():
+        # Events being cancelled stay until their cancellation job deletes them
+        events = list(
+            Event.objects.select_for_update().filter(date__lt=before).exclude(status='cancelling')
+            .order_by('id')[:batch_size]
+        )
+        if not events:
+            return 0
+        bookings = list(Booking.objects.filter(event__in=events))
+        payments = list(Payment.objects.filter(booking__in=bookings))
+        sales_stats = list(EventSalesStats.objects.filter(event__in=events))
+
+        ArchivedEvent.objects.bulk_create([_copy(ArchivedEvent, event, exclude=('archived_at',)) for event in events])
+        ArchivedBooking.objects.bulk_create([_copy(ArchivedBooking, booking) for booking in bookings])
+        ArchivedPayment.objects.bulk_create([_copy(ArchivedPayment, payment) for payment in payments])
+        ArchivedEventSalesStats.objects.bulk_create([_copy(ArchivedEventSalesStats, stats) for stats in sales_stats])
+
+        Event.objects.filter(id__in=[event.id for event in events]).delete()
+        facets.events_removed(events)
+    return len(events)
+
+
+def archive_past_events(before, batch_size=ARCHIVE_BATCH_SIZE, max_batches=None):
+    """
+    Archives events dated before ``before`` one bounded batch at a time, so
+    no transaction holds locks on more than ``batch_size`` events.
+    """
+    archived = batches = 0
+    while max_batches is None or batches < max_batches:
+        moved = archive_batch(before, batch_size=batch_size)
+        if not moved:
+            break
+        archived += moved
+        batches += 1
+    return archived
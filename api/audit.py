@@ -0,0 +1,242 @@
+"""
+Buffered audit log of booking and payment status changes.
+
+Changes are recorded once their transaction commits, into a per-process
+ring buffer that is written with one bulk INSERT every
+``AUDIT_FLUSH_INTERVAL`` seconds, or as soon as it holds
+``AUDIT_FLUSH_SIZE`` rows. With ``AUDIT_FLUSH_IN_BACKGROUND`` the writes
+happen on a daemon thread, so requests only append to the buffer; without
+it the request that fills the buffer, or the first one after the interval,
+writes it.
+
+Rows still in the buffer are lost if the process is killed. With
+``AUDIT_SPOOL_DIR`` set, every row is also appended to a spool file that is
+only removed once its rows are in the database; the ``flush_audit_log``
+command loads spool files left behind by a crashed process or a failed
+flush.
+"""
+import atexit
+import contextlib
+import json
+import logging
+import os
+import threading
+import time
+import uuid
+from collections import deque
+from datetime import datetime
+
+from django.conf import settings
+from django.db import DatabaseError, close_old_connections, transaction
+from django.utils import timezone
+
+from .models import AuditEvent
+
+logger = logging.getLogger(__name__)
+
+_lock = threading.Lock()
+_buffer = None
+_last_flush = time.monotonic()
+_spool = None
+_wake = threading.Event()
+_flusher_pid = None
+
+
+def _get_buffer():
+    global _buffer
+    if _buffer is None:
+        # Oldest rows are dropped only if flushes keep failing; the spool
+        # file still has them
+        _buffer = deque(maxlen=settings.AUDIT_BUFFER_CAPACITY)
+    return _buffer
+
+
+def _spool_path(suffix):
+    return os.path.join(settings.AUDIT_SPOOL_DIR, f'audit-{os.getpid()}-{suffix}.jsonl')
+
+
+def _write_spool(rows):
+    global _spool
+    if not settings.AUDIT_SPOOL_DIR:
+        return
+    if _spool is None:
+        os.makedirs(settings.AUDIT_SPOOL_DIR, exist_ok=True)
+        _spool = open(_spool_path(uuid.uuid4().hex), 'a')
+    for row in rows:
+        _spool.write(json.dumps({**row, 'created_at': row['created_at'].isoformat()}) + '\n')
+    # Survives a crash of this process; the OS writes it out
+    _spool.flush()
+
+
+def _rotate_spool():
+    global _spool
+    if _spool is None:
+        return None
+    _spool.close()
+    path, _spool = _spool.name, None
+    return path
+
+
+def record(entries):
+    """
+    Records status changes once the current transaction commits. Each entry
+    is a dict with ``entity``, ``entity_id``, ``to_status``, ``booking_id``,
+    ``event_id``, ``user_id`` and optionally ``from_status``.
+    """
+    created_at = timezone.now()
+    rows = [{'uid': uuid.uuid4().hex, 'created_at': created_at, 'from_status': '', **entry} for entry in entries]
+    if rows:
+        transaction.on_commit(lambda: _append(rows))
+
+
+def booking_changed(bookings, to_status, from_status=''):
+    record(
+        {
+            'entity': 'booking', 'entity_id': booking.id, 'from_status': from_status, 'to_status': to_status,
+            'booking_id': booking.id, 'event_id': booking.event_id, 'user_id': booking.user_id,
+        }
+        for booking in bookings
+    )
+
+
+def payment_changed(payments, to_status, from_status=''):
+    """
+    ``payments`` are ``(payment_id, booking)`` pairs.
+    """
+    record(
+        {
+            'entity': 'payment', 'entity_id': payment_id, 'from_status': from_status, 'to_status': to_status,
+            'booking_id': booking.id, 'event_id': booking.event_id, 'user_id': booking.user_id,
+        }
+        for payment_id, booking in payments
+    )
+
+
+def _append(rows):
+    background = settings.AUDIT_FLUSH_IN_BACKGROUND
+    with _lock:
+        buffer = _get_buffer()
+        buffer.extend(rows)
+        _write_spool(rows)
+        if background:
+            _start_flusher()
+        full = len(buffer) >= settings.AUDIT_FLUSH_SIZE
+    if background:
+        if full:
+            _wake.set()
+    elif full or time.monotonic() - _last_flush >= settings.AUDIT_FLUSH_INTERVAL:
+        flush()
+
+
+def _start_flusher():
+    global _flusher_pid
+    # A forked worker does not inherit the parent's thread
+    if _flusher_pid == os.getpid():
+        return
+    _flusher_pid = os.getpid()
+    threading.Thread(target=_run_flusher, name='audit-flush', daemon=True).start()
+
+
+def _run_flusher():
+    while True:
+        _wake.wait(settings.AUDIT_FLUSH_INTERVAL)
+        _wake.clear()
+        _flush_in_background()
+
+
+def _flush_in_background():
+    try:
+        flush()
+    except Exception:
+        logger.exception("Audit flush failed")
+    finally:
+        close_old_connections()
+
+
+def flush():
+    """
+    Writes the buffered rows with one bulk INSERT and returns how many were
+    written. On a database error the rows go back into the buffer.
+    """
+    global _last_flush
+    with _lock:
+        buffer = _get_buffer()
+        batch = list(buffer)
+        buffer.clear()
+        spool_path = _rotate_spool()
+        _last_flush = time.monotonic()
+    if not batch:
+        return 0
+    try:
+        AuditEvent.objects.bulk_create([AuditEvent(**row) for row in batch], ignore_conflicts=True)
+    except DatabaseError:
+        logger.exception("Could not write %d audit events, keeping them for the next flush", len(batch))
+        with _lock:
+            # Back in front of the rows appended meanwhile. Extending on the
+            # right makes a full buffer drop its oldest rows, not the newest
+            pending = list(buffer)
+            buffer.clear()
+            buffer.extend(batch)
+            buffer.extend(pending)
+            dropped = len(batch) + len(pending) - len(buffer)
+        if dropped:
+            logger.error("Audit buffer is full, dropped the %d oldest events", dropped)
+        return 0
+    if spool_path:
+        with contextlib.suppress(FileNotFoundError):
+            os.remove(spool_path)
+    return len(batch)
+
+
+def _is_other_live_process(name):
+    pid = int(name.split('-')[1])
+    if pid == os.getpid():
+        return False
+    try:
+        os.kill(pid, 0)
+    except ProcessLookupError:
+        return False
+    except PermissionError:
+        pass
+    return True
+
+
+def replay_spool(batch_size=1000):
+    """
+    Loads rows from spool files of processes that are gone, and from this
+    process's own failed flushes, then deletes the files. Returns how many
+    rows were read.
+    """
+    directory = settings.AUDIT_SPOOL_DIR
+    if not directory or not os.path.isdir(directory):
+        return 0
+    active = _spool.name if _spool is not None else None
+    replayed = 0
+    for name in sorted(os.listdir(directory)):
+        path = os.path.join(directory, name)
+        if path == active or not name.endswith('.jsonl') or _is_other_live_process(name):
+            continue
+        with open(path) as f:
+            rows = [json.loads(line) for line in f if line.endswith('\n')]
+        for start in range(0, len(rows), batch_size):
+            AuditEvent.objects.bulk_create([
+                AuditEvent(**{**row, 'created_at': datetime.fromisoformat(row['created_at'])})
+                for row in rows[start:start + batch_size]
+            ], ignore_conflicts=True)
+        os.remove(path)
+        replayed += len(rows)
+    return replayed
+
+
+def reset():
+    """
+    Drops buffered rows without writing them. The next row gets a buffer
+    of the current ``AUDIT_BUFFER_CAPACITY``.
+    """
+    global _buffer
+    with _lock:
+        _buffer = None
+        _rotate_spool()
+
+
+atexit.register(flush)
@@ -0,0 +1,142 @@
+"""
+Runs several API calls from one ``/api/batch/`` request.
+
+Sub-requests are dispatched straight to the views in ``api.urls`` with the
+batch request's user forced onto them, so the token is checked once. Runs of
+consecutive read-only calls are executed concurrently unless the batch is
+atomic or already inside a transaction, whose writes other connections could
+not see.
+"""
+import io
+import json
+from concurrent.futures import ThreadPoolExecutor
+from urllib.parse import urlsplit
+
+from django.conf import settings
+from django.core.handlers.wsgi import WSGIRequest
+from django.db import connection, connections, transaction
+from django.urls import Resolver404, resolve
+from rest_framework import status
+
+from .renderers import dumps
+
+SAFE_METHODS = ('GET', 'HEAD')
+# Passed through from the sub-request's own headers
+FORWARDED_HEADERS = ('Idempotency-Key',)
+RETURNED_HEADERS = ('Location', 'Retry-After', 'Idempotent-Replayed')
+
+
+def _error(code, detail):
+    return {'status': code, 'body': {'detail': detail}}
+
+
+def build_request(request, item):
+    """
+    Returns a ``WSGIRequest`` for one sub-request, authenticated as the user
+    of the batch request.
+    """
+    url = urlsplit(item['path'])
+    body = dumps(item['body']) if item.get('body') is not None else b''
+    environ = {
+        key: value for key, value in request.META.items()
+        if not key.startswith('HTTP_') or key in ('HTTP_HOST', 'HTTP_USER_AGENT', 'HTTP_X_FORWARDED_FOR')
+    }
+    environ.update({
+        'REQUEST_METHOD': item['method'],
+        'PATH_INFO': url.path,
+        'QUERY_STRING': url.query,
+        'CONTENT_TYPE': 'application/json',
+        'CONTENT_LENGTH': str(len(body)),
+        'wsgi.input': io.BytesIO(body),
+    })
+    for header, value in item.get('headers', {}).items():
+        if header in FORWARDED_HEADERS:
+            environ['HTTP_' + header.upper().replace('-', '_')] = value
+    sub_request = WSGIRequest(environ)
+    if request.user.is_authenticated:
+        sub_request._force_auth_user = request.user
+        sub_request._force_auth_token = request.auth
+    return sub_request
+
+
+def run_one(request, item, prefix):
+    """
+    Dispatches one sub-request to its view and returns its status and body.
+    Only routes of ``api.urls`` under ``prefix`` can be called.
+    """
+    path = urlsplit(item['path']).path
+    try:
+        if not path.startswith(prefix):
+            raise Resolver404()
+        match = resolve(path[len(prefix) - 1:], urlconf='api.urls')
+    except Resolver404:
+        return _error(status.HTTP_404_NOT_FOUND, "Not found.")
+    if match.url_name == 'batch':
+        return _error(status.HTTP_400_BAD_REQUEST, "Batches cannot be nested.")
+
+    sub_request = build_request(request, item)
+    # Throttling looks the route up by its URL name
+    sub_request.resolver_match = match
+    response = match.func(sub_request, *match.args, **match.kwargs)
+    if response.streaming:
+        return _error(status.HTTP_400_BAD_REQUEST, "Streaming responses cannot be batched.")
+    if hasattr(response, 'data'):
+        body = response.data
+    elif response.content and response['Content-Type'].startswith('application/json'):
+        body = json.loads(response.content)
+    else:
+        body = response.content.decode(response.charset or 'utf-8')
+    result = {'status': response.status_code, 'body': body}
+    headers = {name: response[name] for name in RETURNED_HEADERS if response.has_header(name)}
+    if headers:
+        result['headers'] = headers
+    return result
+
+
+def _run_read(request, item, prefix):
+    try:
+        return run_one(request, item, prefix)
+    finally:
+        connections.close_all()
+
+
+def group_reads(items):
+    """
+    Splits ``items`` into ordered runs, joining consecutive read-only calls.
+    """
+    groups = []
+    for item in items:
+        if item['method'] in SAFE_METHODS and groups and groups[-1][0]['method'] in SAFE_METHODS:
+            groups[-1].append(item)
+        else:
+            groups.append([item])
+    return groups
+
+
+def run_batch(request, items, atomic, prefix):
+    """
+    Runs ``items`` in order and returns one result per item. In an atomic
+    batch the first error rolls back every call and skips the rest.
+    """
+    if atomic:
+        results = []
+        with transaction.atomic():
+            for item in items:
+                result = run_one(request, item, prefix)
+                results.append(result)
+                if result['status'] >= 400:
+                    transaction.set_rollback(True)
+                    break
+        skipped = _error(status.HTTP_424_FAILED_DEPENDENCY, "Skipped because an earlier request failed.")
+        return results + [skipped] * (len(items) - len(results))
+
+    concurrent = not connection.in_atomic_block
+    results = []
+    for group in group_reads(items):
+        if concurrent and len(group) > 1:
+            workers = min(len(group), settings.BATCH_MAX_WORKERS)
+            with ThreadPoolExecutor(max_workers=workers) as executor:
+                results.extend(executor.map(lambda item: _run_read(request, item, prefix), group))
+        else:
+            results.extend(run_one(request, item, prefix) for item in group)
+    return results
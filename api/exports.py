@@ -0,0 +1,40 @@
+import csv
+
+from .renderers import dumps
+
+EXPORT_CHUNK_SIZE = 2000
+
+EVENT_EXPORT_FIELDS = (
+    'id', 'title', 'description', 'date', 'time', 'location', 'category',
+    'payment_options', 'total_tickets', 'available_tickets', 'duration',
+)
+
+BOOKING_EXPORT_FIELDS = (
+    'id', 'event_id', 'event__title', 'user_id', 'user__username', 'user__email',
+    'number_of_tickets', 'booking_date', 'status', 'payment__amount', 'payment__status',
+)
+
+
+class _Echo:
+    # csv.writer only needs an object with a write() method
+    def write(self, value):
+        return value
+
+
+def iter_ndjson(queryset, fields):
+    """
+    Yields one JSON document per row. Rows come from a server-side cursor so
+    memory use does not depend on the size of the export.
+    """
+    for row in queryset.values(*fields).iterator(chunk_size=EXPORT_CHUNK_SIZE):
+        yield dumps(row) + b'\n'
+
+
+def iter_csv(queryset, fields):
+    """
+    Yields a header line followed by one CSV line per row.
+    """
+    writer = csv.writer(_Echo())
+    yield writer.writerow(fields)
+    for row in queryset.values_list(*fields).iterator(chunk_size=EXPORT_CHUNK_SIZE):
+        yield writer.writerow(row)
@@ -0,0 +1,148 @@
+from collections import Counter, defaultdict
+from functools import reduce
+from operator import or_
+
+from django.db import IntegrityError, transaction
+from django.db.models import Case, Count, F, Q, When
+from django.db.models.functions import TruncMonth
+
+from .models import Event, EventFacetCount
+
+FACETS = ('category', 'location', 'month')
+
+
+def facet_key(event):
+    return event.category, event.location, event.date.replace(day=1)
+
+
+def _adjust(key, events=0, available=0):
+    if not events and not available:
+        return
+    category, location, month = key
+    cell = EventFacetCount.objects.filter(category=category, location=location, month=month)
+    if cell.update(events=F('events') + events, available=F('available') + available):
+        return
+    try:
+        with transaction.atomic():
+            EventFacetCount.objects.create(
+                category=category, location=location, month=month, events=events, available=available
+            )
+    except IntegrityError:
+        # Created concurrently by another request
+        cell.update(events=F('events') + events, available=F('available') + available)
+
+
+def _count_events(events, sign):
+    deltas = defaultdict(Counter)
+    for event in events:
+        deltas[facet_key(event)]['events'] += sign
+        deltas[facet_key(event)]['available'] += sign if event.available_tickets > 0 else 0
+    for key, delta in deltas.items():
+        _adjust(key, events=delta['events'], available=delta['available'])
+
+
+def events_created(events):
+    """
+    Counts newly created events, one update per cube cell.
+    """
+    _count_events(events, 1)
+
+
+def event_deleted(event, was_available):
+    _adjust(facet_key(event), events=-1, available=-1 if was_available else 0)
+
+
+def events_removed(events):
+    """
+    Uncounts events that leave the events table, one update per cube cell.
+    """
+    _count_events(events, -1)
+
+
+def availability_changed(event, before, after):
+    """
+    Records a sell-out (``after == 0``) or a sold-out event getting tickets
+    back. Other inventory changes do not touch the cube.
+    """
+    if (before > 0) != (after > 0):
+        _adjust(facet_key(event), available=1 if after > 0 else -1)
+
+
+def availability_changed_many(changes):
+    """
+    Same as ``availability_changed`` for ``(event, before, after)`` triples,
+    in a constant number of queries.
+    """
+    deltas = Counter()
+    for event, before, after in changes:
+        if (before > 0) != (after > 0):
+            deltas[facet_key(event)] += 1 if after > 0 else -1
+    deltas = {key: delta for key, delta in deltas.items() if delta}
+    if not deltas:
+        return
+    EventFacetCount.objects.bulk_create([
+        EventFacetCount(category=category, location=location, month=month)
+        for category, location, month in deltas
+    ], ignore_conflicts=True)
+    cells = {
+        key: Q(category=key[0], location=key[1], month=key[2]) for key in deltas
+    }
+    EventFacetCount.objects.filter(reduce(or_, cells.values())).update(available=Case(
+        *[When(cells[key], then=F('available') + delta) for key, delta in deltas.items()]
+    ))
+
+
+def live_counts():
+    """
+    Computes the cube from the events table with a GROUP BY.
+    """
+    rows = (
+        Event.objects.annotate(month=TruncMonth('date'))
+        .values('category', 'location', 'month')
+        .annotate(events=Count('id'), available=Count('id', filter=Q(available_tickets__gt=0)))
+    )
+    return {
+        (row['category'], row['location'], row['month']): (row['events'], row['available'])
+        for row in rows
+    }
+
+
+def stored_counts():
+    return {
+        (row['category'], row['location'], row['month']): (row['events'], row['available'])
+        for row in EventFacetCount.objects.values('category', 'location', 'month', 'events', 'available')
+        if row['events'] or row['available']
+    }
+
+
+def rebuild():
+    with transaction.atomic():
+        EventFacetCount.objects.all().delete()
+        EventFacetCount.objects.bulk_create([
+            EventFacetCount(category=category, location=location, month=month, events=events, available=available)
+            for (category, location, month), (events, available) in live_counts().items()
+        ])
+
+
+def facet_counts(category=None, location=None, month=None, available_only=False):
+    """
+    Returns ``{facet: {value: count}}`` for the events matching the given
+    filters, read from the cube with a single query.
+    """
+    cells = EventFacetCount.objects.all()
+    if category:
+        cells = cells.filter(category=category)
+    if location:
+        cells = cells.filter(location=location)
+    if month:
+        cells = cells.filter(month=month)
+
+    counts = {facet: Counter() for facet in FACETS}
+    column = 'available' if available_only else 'events'
+    for row in cells.values('category', 'location', 'month', column):
+        if not row[column]:
+            continue
+        counts['category'][row['category']] += row[column]
+        counts['location'][row['location']] += row[column]
+        counts['month'][row['month'].strftime('%Y-%m')] += row[column]
+    return {facet: dict(sorted(values.items())) for facet, values in counts.items()}
@@ -0,0 +1,24 @@
+from django_filters import rest_framework as django_filters
+
+from .models import Event
+
+
+class EventFilter(django_filters.FilterSet):
+    """
+    Filters for the event list. Declared without a model so the same filters
+    apply to ``ArchivedEvent`` when archived events are included.
+
+    ``available_only`` adds ``available_tickets > 0`` verbatim, which is the
+    condition of the partial ``event_available_idx`` index, so browsing a
+    category with ``date__gte`` and ``available_only`` never reads past or
+    sold-out events.
+    """
+    location = django_filters.CharFilter()
+    date = django_filters.DateFilter()
+    date__gte = django_filters.DateFilter(field_name='date', lookup_expr='gte')
+    date__lte = django_filters.DateFilter(field_name='date', lookup_expr='lte')
+    category = django_filters.ChoiceFilter(choices=Event.CATEGORY_CHOICES)
+    available_only = django_filters.BooleanFilter(method='filter_available_only')
+
+    def filter_available_only(self, queryset, name, value):
+        return queryset.filter(available_tickets__gt=0) if value else queryset
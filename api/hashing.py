@@ -0,0 +1,130 @@
+"""
+Password hashing on a bounded thread pool.
+
+PBKDF2 releases the GIL, so hashes computed on the pool run in parallel with
+each other and with request threads. The pool admits at most
+``PASSWORD_HASH_WORKERS + PASSWORD_HASH_QUEUE`` jobs at a time; a caller that
+cannot get a slot within ``PASSWORD_HASH_WAIT`` seconds gets a 503 instead of
+piling more work onto a saturated CPU.
+"""
+import os
+import threading
+from collections import deque
+from concurrent.futures import ThreadPoolExecutor
+
+from django.conf import settings
+from django.contrib.auth import get_user_model, hashers
+from django.contrib.auth.backends import ModelBackend
+from rest_framework import status
+from rest_framework.exceptions import APIException
+
+_executor = None
+_slots = None
+_workers = None
+_lock = threading.Lock()
+
+
+class HashingBusy(APIException):
+    status_code = status.HTTP_503_SERVICE_UNAVAILABLE
+    default_detail = "Too many sign-in requests, please retry shortly."
+    default_code = 'hashing_busy'
+    wait = 1
+
+
+class PBKDF2PasswordHasher(hashers.PBKDF2PasswordHasher):
+    """
+    Django's PBKDF2 hasher with the work factor read from
+    ``PASSWORD_HASH_ITERATIONS``. Stored hashes keep their own iteration
+    count, so changing the setting re-hashes each password on its next
+    successful login instead of invalidating it.
+    """
+
+    @property
+    def iterations(self):
+        return getattr(settings, 'PASSWORD_HASH_ITERATIONS', hashers.PBKDF2PasswordHasher.iterations)
+
+
+def _get_pool():
+    global _executor, _slots, _workers
+    if _executor is None:
+        with _lock:
+            if _executor is None:
+                _workers = getattr(settings, 'PASSWORD_HASH_WORKERS', None) or os.cpu_count() or 1
+                _slots = threading.BoundedSemaphore(_workers + settings.PASSWORD_HASH_QUEUE)
+                _executor = ThreadPoolExecutor(max_workers=_workers, thread_name_prefix='password-hash')
+    return _executor, _slots
+
+
+def _submit(fn, *args):
+    executor, slots = _get_pool()
+    if not slots.acquire(timeout=settings.PASSWORD_HASH_WAIT):
+        raise HashingBusy()
+    try:
+        future = executor.submit(fn, *args)
+    except BaseException:
+        slots.release()
+        raise
+    future.add_done_callback(lambda _: slots.release())
+    return future
+
+
+def run(fn, *args):
+    """
+    Runs ``fn(*args)`` on the hashing pool and returns its result. Raises
+    ``HashingBusy`` when the pool is saturated.
+    """
+    return _submit(fn, *args).result()
+
+
+def make_password(password):
+    return run(hashers.make_password, password)
+
+
+def make_passwords(passwords):
+    """
+    Hashes many passwords in parallel and returns the hashes in order. At
+    most one hash per worker is in flight, so a bulk job leaves the queue
+    slots to interactive logins.
+    """
+    _get_pool()
+    hashes, pending = [], deque()
+    for password in passwords:
+        if len(pending) >= _workers:
+            hashes.append(pending.popleft().result())
+        pending.append(_submit(hashers.make_password, password))
+    hashes.extend(future.result() for future in pending)
+    return hashes
+
+
+def check_password(user, password):
+    """
+    Verifies ``password`` for ``user`` on the pool. A correct password stored
+    with an outdated hasher or work factor is re-hashed and saved.
+    """
+    is_correct, must_update = run(hashers.verify_password, password, user.password)
+    if is_correct and must_update:
+        user.password = make_password(password)
+        user.save(update_fields=['password'])
+    return is_correct
+
+
+class PooledModelBackend(ModelBackend):
+    """
+    ``ModelBackend`` that verifies passwords through the hashing pool.
+    """
+
+    def authenticate(self, request, username=None, password=None, **kwargs):
+        UserModel = get_user_model()
+        if username is None:
+            username = kwargs.get(UserModel.USERNAME_FIELD)
+        if username is None or password is None:
+            return None
+        try:
+            user = UserModel._default_manager.get_by_natural_key(username)
+        except UserModel.DoesNotExist:
+            # Hash anyway so unknown usernames take as long as wrong passwords
+            make_password(password)
+            return None
+        if check_password(user, password) and self.user_can_authenticate(user):
+            return user
+        return None
@@ -0,0 +1,106 @@
+import hashlib
+import json
+
+from django.conf import settings
+from django.db import IntegrityError, transaction
+from django.db.models import Q
+from django.utils import timezone
+from rest_framework import status
+from rest_framework.response import Response
+
+from .models import IdempotencyKey
+from .renderers import dumps
+
+IDEMPOTENCY_HEADER = 'Idempotency-Key'
+
+
+def get_ttl():
+    return settings.IDEMPOTENCY_KEY_TTL
+
+
+def get_lease():
+    return settings.IDEMPOTENCY_KEY_LEASE
+
+
+def purge_expired_keys(batch_size=1000):
+    """
+    Deletes expired keys in bounded batches and returns how many were removed.
+    """
+    cutoff = timezone.now() - get_ttl()
+    deleted = 0
+    while True:
+        ids = list(IdempotencyKey.objects.filter(created_at__lt=cutoff).values_list('id', flat=True)[:batch_size])
+        if not ids:
+            return deleted
+        deleted += IdempotencyKey.objects.filter(id__in=ids).delete()[0]
+
+
+class IdempotencyMixin:
+    """
+    Makes ``post`` safe to retry. The first request with a given
+    ``Idempotency-Key`` header is processed and its response stored; later
+    requests with the same key replay that response without running the view
+    again. A duplicate that arrives while the first one is still in flight
+    gets ``409 Conflict``.
+
+    An in-flight record older than ``IDEMPOTENCY_KEY_LEASE`` belongs to a
+    worker that died mid-request, and a record older than the TTL has
+    expired; a retry takes either over instead of being turned away.
+    """
+
+    def post(self, request, *args, **kwargs):
+        key = request.headers.get(IDEMPOTENCY_HEADER)
+        if not key:
+            return super().post(request, *args, **kwargs)
+
+        key_hash = hashlib.sha256(f'{request.user.pk}:{request.path}:{key}'.encode()).hexdigest()
+        request_hash = hashlib.sha256(json.dumps(request.data, sort_keys=True, default=str).encode()).hexdigest()
+
+        try:
+            with transaction.atomic():
+                record = IdempotencyKey.objects.create(key_hash=key_hash, request_hash=request_hash)
+        except IntegrityError:
+            record = self.take_over(key_hash, request_hash)
+            if record is None:
+                return self.replay(key_hash, request_hash)
+
+        # Scoped to this attempt, so a worker whose record was taken over
+        # cannot overwrite or delete the new owner's
+        owned = IdempotencyKey.objects.filter(id=record.id, created_at=record.created_at)
+        try:
+            response = super().post(request, *args, **kwargs)
+        except Exception:
+            owned.delete()
+            raise
+
+        if response.status_code >= 500:
+            owned.delete()
+        else:
+            owned.update(status_code=response.status_code, response_body=dumps(response.data))
+        return response
+
+    def take_over(self, key_hash, request_hash):
+        now = timezone.now()
+        abandoned = Q(status_code__isnull=True, created_at__lt=now - get_lease()) | Q(created_at__lt=now - get_ttl())
+        if not IdempotencyKey.objects.filter(abandoned, key_hash=key_hash).update(
+            request_hash=request_hash, created_at=now, status_code=None, response_body=None
+        ):
+            return None
+        return IdempotencyKey.objects.only('id', 'created_at').get(key_hash=key_hash)
+
+    def replay(self, key_hash, request_hash):
+        record = IdempotencyKey.objects.filter(key_hash=key_hash).first()
+        if record is None or record.status_code is None:
+            return Response(
+                {"detail": "A request with this Idempotency-Key is already being processed."},
+                status=status.HTTP_409_CONFLICT, headers={'Retry-After': '1'}
+            )
+        if record.request_hash != request_hash:
+            return Response(
+                {"detail": "This Idempotency-Key was already used with a different request."},
+                status=status.HTTP_422_UNPROCESSABLE_ENTITY
+            )
+        return Response(
+            json.loads(bytes(record.response_body)), status=record.status_code,
+            headers={'Idempotent-Replayed': 'true'}
+        )
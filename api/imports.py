@@ -0,0 +1,95 @@
+import csv
+import io
+from itertools import islice
+
+from django.db import transaction
+from rest_framework.exceptions import ValidationError
+
+from . import facets
+from .models import Event
+from .scheduling import VenueSchedule, lock_venues
+from .serializers import EventSerializer
+
+IMPORT_BATCH_SIZE = 1000
+IMPORT_MAX_ROWS = 50000
+
+
+def read_csv_rows(uploaded_file, max_rows):
+    """
+    Returns the rows of an uploaded CSV file as dicts keyed by the header line.
+    Stops reading after ``max_rows + 1`` rows, so an oversized file is never
+    loaded whole and callers can reject it with ``len(rows) > max_rows``.
+    """
+    text = io.TextIOWrapper(uploaded_file, encoding='utf-8-sig', newline='')
+    return list(islice(csv.DictReader(text), max_rows + 1))
+
+
+def validate_event_rows(rows):
+    """
+    Validates every row with a single serializer instance, so the field set is
+    built once per batch instead of once per row. Returns ``(index, data)``
+    pairs for the valid rows and a list of ``{'row': index, 'errors': ...}``
+    for the rejected ones.
+    """
+    serializer = EventSerializer()
+    valid, errors = [], []
+    for index, row in enumerate(rows):
+        if not isinstance(row, dict):
+            errors.append({'row': index, 'errors': {'non_field_errors': ["Expected an object."]}})
+            continue
+        try:
+            valid.append((index, serializer.run_validation(row)))
+        except ValidationError as exc:
+            errors.append({'row': index, 'errors': exc.detail})
+    return valid, errors
+
+
+def import_events(rows, created_by):
+    """
+    Inserts the valid rows in chunks inside one transaction and reports the
+    invalid ones without aborting the import.
+    """
+    valid, errors = validate_event_rows(rows)
+    events = []
+    for index, data in valid:
+        event = Event(created_by=created_by, available_tickets=data.get('total_tickets', 100), **data)
+        event.set_schedule()
+        events.append((index, event))
+
+    with transaction.atomic():
+        events = reject_venue_conflicts(events, errors)
+        Event.objects.bulk_create(events, batch_size=IMPORT_BATCH_SIZE)
+        facets.events_created(events)
+    errors.sort(key=lambda error: error['row'])
+    return events, errors
+
+
+def reject_venue_conflicts(events, errors):
+    """
+    Drops the events that overlap an existing event or an earlier row of the
+    batch at the same location, adding an error for each. Runs one query per
+    distinct location, after locking all of them (see ``lock_venues``), so
+    it has to run in the transaction that inserts the events.
+    """
+    by_location = {}
+    for index, event in events:
+        by_location.setdefault(event.location, []).append((index, event))
+
+    lock_venues(by_location)
+    accepted = []
+    for location, located in by_location.items():
+        schedule = VenueSchedule.load(
+            location,
+            min(event.starts_at for _, event in located),
+            max(event.ends_at for _, event in located),
+        )
+        for index, event in located:
+            if schedule.overlaps(event.starts_at, event.ends_at):
+                errors.append({'row': index, 'errors': {
+                    'non_field_errors': ["Another event is already scheduled at this location and time."]
+                }})
+                continue
+            schedule.add(event.starts_at, event.ends_at)
+            accepted.append((index, event))
+    accepted.sort(key=lambda pair: pair[0])
+    return [event for _, event in accepted]
@@ -0,0 +1,102 @@
+"""
+Database-backed job queue for long-running manager operations.
+
+A job is processed by repeatedly calling its handler, each call doing one
+bounded chunk of work in the same transaction that records the job's
+progress. A worker that dies mid-job leaves the job ``running`` with an
+expired lease, and the next worker resumes it from its saved cursor.
+"""
+import time
+
+from django.conf import settings
+from django.db import transaction
+from django.db.models import F, Q
+from django.utils import timezone
+
+from . import lifecycle
+from .models import Event, Job
+
+
+def cancel_event(job):
+    event = Event.objects.filter(id=job.payload['event_id']).only('id', 'title').first()
+    if event is None:
+        return True
+    bookings = lifecycle.cancel_event_bookings(event, after_id=job.cursor)
+    if bookings:
+        job.cursor = bookings[-1].id
+        job.processed += len(bookings)
+        return False
+    # Bookings made since the last chunk are cancelled with the event itself
+    job.processed += len(lifecycle.cancel_event(event))
+    return True
+
+
+# Job kind -> handler. A handler processes one chunk, updates the job's
+# cursor and progress in memory and returns True once the job is finished.
+HANDLERS = {
+    'cancel_event': cancel_event,
+}
+
+
+def enqueue(kind, created_by, total=None, **payload):
+    return Job.objects.create(kind=kind, created_by=created_by, total=total, payload=payload)
+
+
+def _claimable(now):
+    return Q(status='queued') | Q(status='running', locked_until__lt=now)
+
+
+def claim():
+    """
+    Leases the oldest runnable job to this worker and returns it, or None
+    when the queue is empty.
+    """
+    now = timezone.now()
+    for job_id in Job.objects.filter(_claimable(now)).order_by('id').values_list('id', flat=True)[:10]:
+        claimed = Job.objects.filter(_claimable(now), id=job_id).update(
+            status='running', locked_until=now + settings.JOB_LEASE, attempts=F('attempts') + 1
+        )
+        # Another worker may have taken it between the two queries
+        if claimed:
+            return Job.objects.get(id=job_id)
+    return None
+
+
+def run(job):
+    """
+    Processes ``job`` chunk by chunk until it is done or fails.
+    """
+    if job.attempts > settings.JOB_MAX_ATTEMPTS:
+        Job.objects.filter(id=job.id).update(status='failed', error="Gave up after repeated worker crashes.")
+        return
+    handler = HANDLERS[job.kind]
+    try:
+        while job.status == 'running':
+            with transaction.atomic():
+                if handler(job):
+                    job.status = 'done'
+                job.locked_until = timezone.now() + settings.JOB_LEASE
+                job.save(update_fields=['status', 'cursor', 'processed', 'locked_until', 'updated_at'])
+    except Exception as exc:
+        Job.objects.filter(id=job.id).update(status='failed', error=str(exc), updated_at=timezone.now())
+
+
+def run_pending():
+    """
+    Runs queued jobs in this process until the queue is empty and returns
+    how many were run.
+    """
+    count = 0
+    while (job := claim()) is not None:
+        run(job)
+        count += 1
+    return count
+
+
+def work(poll_interval=1.0):
+    """
+    Worker loop: runs jobs as they arrive.
+    """
+    while True:
+        if not run_pending():
+            time.sleep(poll_interval)
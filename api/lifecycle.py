@@ -0,0 +1,185 @@
+"""
+Booking state transitions shared by every view that cancels bookings.
+
+Each transition runs in one transaction, locks the rows it touches, writes
+only the changed columns and keeps inventory, seats, facet counts, sales
+stats and the waitlist in step. Rows are always locked event first, then its
+bookings, the same order booking creation uses, so a user's cancellation
+cannot deadlock with an event cancellation.
+"""
+from django.conf import settings
+from django.core.mail import send_mass_mail
+from django.db import transaction
+from django.db.models import F, Subquery
+
+from . import audit, facets, stats
+from .models import Booking, Event, Payment
+from .seating import release_seats
+from .waitlist import promote_waitlist
+
+CANCEL_EVENT_CHUNK_SIZE = 500
+
+
+class BookingLifecycleError(Exception):
+    pass
+
+
+def _lock_booking(booking_id, user=None):
+    # Returns the booking and its event, locking the event first. The
+    # booking's event never changes, so it is looked up without a lock.
+    bookings = Booking.objects.all() if user is None else Booking.objects.filter(user=user)
+    event = Event.objects.select_for_update().only(
+        'available_tickets', 'status', 'category', 'location', 'date'
+    ).filter(
+        id=Subquery(bookings.filter(id=booking_id).values('event_id'))
+    ).first()
+    if event is None:
+        raise Booking.DoesNotExist("Booking matching query does not exist.")
+    booking = bookings.select_for_update(of=('self',)).select_related('payment').get(id=booking_id)
+    return booking, event
+
+
+def _release(booking, event, refunded):
+    # Puts the booking's tickets and seats back and records the cancellation.
+    # The tickets of an event being cancelled stay off sale.
+    if booking.section_id is not None:
+        release_seats(booking.section_id, booking.first_seat, booking.number_of_tickets)
+    stats.cancelled(event.id, booking.number_of_tickets, refunded=refunded)
+    if event.status == 'cancelling':
+        return
+    Event.objects.filter(id=event.id).update(available_tickets=F('available_tickets') + booking.number_of_tickets)
+    facets.availability_changed(event, event.available_tickets, event.available_tickets + booking.number_of_tickets)
+    promote_waitlist(event.id)
+
+
+def _revert_payment(booking):
+    payment = getattr(booking, 'payment', None)
+    if payment is None or payment.status != 'completed':
+        return None
+    payment.status = 'reverted'
+    payment.save(update_fields=['status'])
+    audit.payment_changed([(payment.id, booking)], 'reverted', 'completed')
+    return payment.amount
+
+
+def cancel_booking(booking_id, user=None):
+    """
+    Cancels a booking, reverting its payment if it has one. Raises
+    ``Booking.DoesNotExist`` when ``user`` does not own the booking.
+    """
+    with transaction.atomic():
+        booking, event = _lock_booking(booking_id, user=user)
+        if booking.status == 'cancelled':
+            raise BookingLifecycleError("Booking already cancelled.")
+        booking.status = 'cancelled'
+        booking.save(update_fields=['status'])
+        audit.booking_changed([booking], 'cancelled', 'booked')
+        _release(booking, event, _revert_payment(booking))
+    return booking
+
+
+def revert_payment(booking_id):
+    """
+    Reverts the payment of a booking and cancels the booking.
+    """
+    with transaction.atomic():
+        booking, event = _lock_booking(booking_id)
+        if not hasattr(booking, 'payment'):
+            raise BookingLifecycleError("No payment found for this booking.")
+        if booking.payment.status == 'reverted' or booking.status == 'cancelled':
+            raise BookingLifecycleError("Payment already reverted.")
+        refunded = _revert_payment(booking)
+        booking.status = 'cancelled'
+        booking.save(update_fields=['status'])
+        audit.booking_changed([booking], 'cancelled', 'booked')
+        _release(booking, event, refunded)
+    return booking
+
+
+def _cancel_bookings(bookings, event):
+    # Cancels locked bookings, reverts their payments and emails the attendees
+    # once the transaction commits
+    bookings_by_id = {booking.id: booking for booking in bookings}
+    Booking.objects.filter(id__in=bookings_by_id).update(status='cancelled')
+    payments = list(
+        Payment.objects.filter(booking_id__in=bookings_by_id, status='completed')
+        .values_list('id', 'booking_id', 'amount')
+    )
+    Payment.objects.filter(id__in=[payment_id for payment_id, _, _ in payments]).update(status='reverted')
+    if bookings:
+        # In the same transaction, so a chunked cancellation that stops
+        # halfway leaves the stats matching the bookings it did cancel
+        stats.cancelled(
+            event.id,
+            sum(booking.number_of_tickets for booking in bookings),
+            refunded=sum(amount for _, _, amount in payments),
+            bookings=len(bookings),
+        )
+    audit.booking_changed(bookings, 'cancelled', 'booked')
+    audit.payment_changed(
+        [(payment_id, bookings_by_id[booking_id]) for payment_id, booking_id, _ in payments], 'reverted', 'completed'
+    )
+
+    messages = [
+        (
+            'Event Cancelled',
+            f'Hi {booking.user.username}, the event {event.title} has been cancelled.',
+            settings.EMAIL_HOST_USER,
+            [booking.user.email],
+        )
+        for booking in bookings
+    ]
+    if messages:
+        transaction.on_commit(lambda: send_mass_mail(messages, fail_silently=False))
+
+
+def _active_bookings(event_id):
+    return (
+        Booking.objects.select_for_update(of=('self',))
+        .filter(event_id=event_id, status='booked')
+        .select_related('user')
+        .only('id', 'event_id', 'number_of_tickets', 'user__username', 'user__email')
+        .order_by('id')
+    )
+
+
+def close_event(event_id):
+    """
+    Stops ticket sales for an event that is about to be cancelled. The event
+    is marked ``cancelling``, so bookings, waitlist joins and released
+    tickets cannot reopen it while its bookings are cancelled.
+    """
+    with transaction.atomic():
+        event = Event.objects.select_for_update().only('available_tickets', 'category', 'location', 'date').get(
+            id=event_id
+        )
+        Event.objects.filter(id=event.id).update(available_tickets=0, status='cancelling')
+        facets.availability_changed(event, event.available_tickets, 0)
+
+
+def cancel_event_bookings(event, after_id=0, limit=None):
+    """
+    Cancels the next ``limit`` active bookings of ``event`` with an id above
+    ``after_id`` and returns them, so a large cancellation can be processed
+    in chunks.
+    """
+    with transaction.atomic():
+        bookings = list(_active_bookings(event.id).filter(id__gt=after_id)[:limit or CANCEL_EVENT_CHUNK_SIZE])
+        _cancel_bookings(bookings, event)
+    return bookings
+
+
+def cancel_event(event):
+    """
+    Cancels every active booking of an event, reverts their payments, emails
+    the attendees and deletes the event. Runs a fixed number of queries
+    whatever the number of bookings.
+    """
+    with transaction.atomic():
+        event = Event.objects.select_for_update().get(id=event.id)
+        was_available = event.available_tickets > 0
+        bookings = list(_active_bookings(event.id))
+        _cancel_bookings(bookings, event)
+        event.delete()
+        facets.event_deleted(event, was_available)
+    return bookings
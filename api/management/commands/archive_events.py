@@ -0,0 +1,24 @@
+from datetime import timedelta
+
+from django.conf import settings
+from django.core.management.base import BaseCommand
+from django.utils import timezone
+
+from api.archive import ARCHIVE_BATCH_SIZE, archive_past_events
+
+
+class Command(BaseCommand):
+    help = "Moves past events with their bookings and payments into the archive tables."
+
+    def add_arguments(self, parser):
+        parser.add_argument('--days', type=int, help="Archive events older than this many days.")
+        parser.add_argument('--batch-size', type=int, default=ARCHIVE_BATCH_SIZE)
+        parser.add_argument('--max-batches', type=int)
+
+    def handle(self, *args, **options):
+        if options['days'] is not None:
+            before = timezone.now().date() - timedelta(days=options['days'])
+        else:
+            before = timezone.now().date() - settings.ARCHIVE_EVENTS_AFTER
+        archived = archive_past_events(before, batch_size=options['batch_size'], max_batches=options['max_batches'])
+        self.stdout.write(f"Archived {archived} events dated before {before}.")
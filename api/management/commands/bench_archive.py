@@ -0,0 +1,76 @@
+import time
+from datetime import time as dt_time, timedelta
+
+from django.core.management.base import BaseCommand
+from django.db import transaction
+from django.test import RequestFactory
+from django.utils import timezone
+
+from api import facets
+from api.archive import archive_past_events
+from api.models import Booking, Event, User, event_window
+from api.views import EventListView
+
+
+class Command(BaseCommand):
+    help = (
+        "Seeds historical events and bookings, then times the events/ hot path "
+        "before and after archiving them. Everything runs in a transaction "
+        "that is rolled back at the end."
+    )
+
+    def add_arguments(self, parser):
+        parser.add_argument('--events', type=int, default=100000, help="Historical events to seed.")
+        parser.add_argument('--bookings-per-event', type=int, default=2)
+        parser.add_argument('--upcoming', type=int, default=200, help="Upcoming events left in the hot table.")
+        parser.add_argument('--repeat', type=int, default=20)
+
+    def handle(self, *args, **options):
+        with transaction.atomic():
+            self.run(options)
+            transaction.set_rollback(True)
+
+    def run(self, options):
+        user, _ = User.objects.get_or_create(
+            username='bench-archive', defaults={'email': 'bench-archive@example.com', 'role': 'event_manager'}
+        )
+        today = timezone.now().date()
+        self.seed(user, today - timedelta(days=3650), options['events'], options['bookings_per_event'])
+        self.seed(user, today + timedelta(days=1), options['upcoming'], 0)
+        # Seeding bypasses the facet counters, which archiving decrements
+        facets.rebuild()
+
+        request = RequestFactory().get('/api/events/', {'category': 'music', 'fields': 'id,title,date,available_tickets'})
+        view = EventListView.as_view()
+        self.stdout.write(f"Before archiving: {self.time(view, request, options['repeat']):8.2f} ms per request")
+
+        start = time.perf_counter()
+        archived = archive_past_events(today - timedelta(days=30), batch_size=5000)
+        self.stdout.write(f"Archived {archived:,} events in {time.perf_counter() - start:.1f} s")
+        self.stdout.write(f"After archiving:  {self.time(view, request, options['repeat']):8.2f} ms per request")
+
+    def seed(self, user, first_date, count, bookings_per_event, batch_size=5000):
+        for offset in range(0, count, batch_size):
+            events = []
+            for index in range(offset, min(offset + batch_size, count)):
+                date = first_date + timedelta(days=index % 3000)
+                event = Event(
+                    title=f"Event {index}", description="Benchmark event", date=date,
+                    time=dt_time(19, 0), location=f"Venue {index % 100}",
+                    category='music', payment_options="Credit Card", created_by=user,
+                )
+                event.starts_at, event.ends_at = event_window(event.date, event.time, event.duration)
+                events.append(event)
+            Event.objects.bulk_create(events)
+            Booking.objects.bulk_create([
+                Booking(user=user, event=event, number_of_tickets=1)
+                for event in events for _ in range(bookings_per_event)
+            ])
+
+    def time(self, view, request, repeat):
+        timings = []
+        for _ in range(repeat):
+            start = time.perf_counter()
+            view(request).render()
+            timings.append(time.perf_counter() - start)
+        return min(timings) * 1000
@@ -0,0 +1,65 @@
+import gzip
+import time
+from datetime import date, time as dt_time, timedelta
+
+from django.core.management.base import BaseCommand
+from rest_framework.renderers import JSONRenderer
+
+from api.models import Event
+from api.renderers import FastJSONRenderer, orjson
+from api.serializers import EventListSerializer
+
+try:
+    import brotli
+except ImportError:
+    brotli = None
+
+
+class Command(BaseCommand):
+    help = "Benchmarks JSON encode time and bytes on the wire for a large event list."
+
+    def add_arguments(self, parser):
+        parser.add_argument('--events', type=int, default=10000)
+        parser.add_argument('--repeat', type=int, default=5)
+
+    def handle(self, *args, **options):
+        # Unsaved instances keep the benchmark independent of the database
+        events = [
+            Event(
+                id=index,
+                title=f"Event {index}",
+                description="Live performance with guest artists " * 4,
+                date=date(2025, 1, 1) + timedelta(days=index % 365),
+                time=dt_time(18, 30),
+                location=f"Venue {index % 50}",
+                category='music',
+                payment_options="Credit Card, PayPal",
+                created_by_id=1,
+                total_tickets=500,
+                available_tickets=index % 500,
+            )
+            for index in range(options['events'])
+        ]
+        data = EventListSerializer(events, many=True).data
+
+        if orjson is None:
+            self.stdout.write("orjson is not installed, FastJSONRenderer falls back to the stdlib encoder.")
+
+        for renderer in (JSONRenderer(), FastJSONRenderer()):
+            timings = []
+            for _ in range(options['repeat']):
+                start = time.perf_counter()
+                body = renderer.render(data)
+                timings.append(time.perf_counter() - start)
+            self.stdout.write(
+                f"{type(renderer).__name__:<18} best {min(timings) * 1000:8.2f} ms  "
+                f"raw {len(body):>10,} B"
+            )
+
+        start = time.perf_counter()
+        gzipped = gzip.compress(body, compresslevel=6)
+        self.stdout.write(f"{'gzip':<18} {(time.perf_counter() - start) * 1000:8.2f} ms  {len(gzipped):>10,} B")
+        if brotli is not None:
+            start = time.perf_counter()
+            compressed = brotli.compress(body, quality=5)
+            self.stdout.write(f"{'brotli':<18} {(time.perf_counter() - start) * 1000:8.2f} ms  {len(compressed):>10,} B")
@@ -0,0 +1,51 @@
+import time
+from concurrent.futures import ThreadPoolExecutor
+
+from django.contrib.auth import hashers
+from django.core.management.base import BaseCommand
+from django.test.utils import override_settings
+
+from api import hashing
+
+
+class Command(BaseCommand):
+    help = "Benchmarks password verification throughput for concurrent logins, inline and on the hashing pool."
+
+    def add_arguments(self, parser):
+        parser.add_argument('--logins', type=int, default=200)
+        parser.add_argument('--concurrency', type=int, default=32)
+        parser.add_argument('--iterations', type=int, default=None, help="PBKDF2 work factor to benchmark with.")
+
+    def handle(self, *args, **options):
+        overrides = {}
+        if options['iterations']:
+            overrides['PASSWORD_HASH_ITERATIONS'] = options['iterations']
+        with override_settings(**overrides):
+            encoded = hashers.make_password('correct horse battery staple')
+            self.stdout.write(f"Hash: {encoded.split('$')[0]} with {encoded.split('$')[1]} iterations")
+            self.run('inline', lambda: hashers.check_password('correct horse battery staple', encoded), options)
+            self.run('pool', lambda: hashing.run(hashers.verify_password, 'correct horse battery staple', encoded),
+                     options)
+
+    def run(self, label, login, options):
+        def timed():
+            start = time.perf_counter()
+            try:
+                login()
+            except hashing.HashingBusy:
+                return None
+            return time.perf_counter() - start
+
+        start = time.perf_counter()
+        with ThreadPoolExecutor(max_workers=options['concurrency']) as workers:
+            results = list(workers.map(lambda _: timed(), range(options['logins'])))
+        elapsed = time.perf_counter() - start
+
+        latencies = sorted(result for result in results if result is not None)
+        rejected = len(results) - len(latencies)
+        p50 = latencies[len(latencies) // 2] * 1000 if latencies else 0
+        p95 = latencies[int(len(latencies) * 0.95)] * 1000 if latencies else 0
+        self.stdout.write(
+            f"{label:>6}: {len(latencies) / elapsed:,.1f} logins/s, p50 {p50:.0f} ms, p95 {p95:.0f} ms, "
+            f"{rejected} rejected"
+        )
@@ -0,0 +1,41 @@
+import random
+import time
+
+from django.core.management.base import BaseCommand
+
+from api.seating import block_mask, find_adjacent, to_bitmap
+
+
+class Command(BaseCommand):
+    help = "Benchmarks seat map memory and adjacent-seat allocation throughput."
+
+    def add_arguments(self, parser):
+        parser.add_argument('--capacity', type=int, default=100000)
+        parser.add_argument('--seats-per-row', type=int, default=50)
+        parser.add_argument('--seed', type=int, default=0)
+
+    def handle(self, *args, **options):
+        capacity = options['capacity']
+        seats_per_row = options['seats_per_row']
+        rng = random.Random(options['seed'])
+
+        self.stdout.write(f"Seat map for {capacity:,} seats: {len(to_bitmap(0, capacity)):,} bytes")
+
+        taken = 0
+        allocations = 0
+        start = time.perf_counter()
+        while True:
+            count = rng.randint(1, 6)
+            first_seat = find_adjacent(taken, capacity, seats_per_row, count)
+            if first_seat is None:
+                first_seat = find_adjacent(taken, capacity, seats_per_row, 1)
+                if first_seat is None:
+                    break
+                count = 1
+            taken |= block_mask(first_seat, count)
+            allocations += 1
+        elapsed = time.perf_counter() - start
+        self.stdout.write(
+            f"Sold out with {allocations:,} allocations in {elapsed:.2f} s "
+            f"({allocations / elapsed:,.0f} allocations/s)"
+        )
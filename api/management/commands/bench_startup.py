@@ -0,0 +1,64 @@
+import json
+import os
+import subprocess
+import sys
+from statistics import median
+
+from django.conf import settings
+from django.core.management.base import BaseCommand, CommandError
+
+# Runs in a fresh interpreter for each settings module
+PROBE = '''
+import json, sys, time
+start = time.perf_counter()
+from django.core.wsgi import get_wsgi_application
+get_wsgi_application()
+from django.conf import settings
+from django.urls import get_resolver
+get_resolver().url_patterns
+startup = time.perf_counter() - start
+
+from django.http import HttpResponse
+from django.test import RequestFactory
+from django.utils.module_loading import import_string
+handler = lambda request: HttpResponse(b'[]', content_type='application/json')
+for path in reversed(settings.MIDDLEWARE):
+    handler = import_string(path)(handler)
+request_factory = RequestFactory()
+requests = int(sys.argv[1])
+start = time.perf_counter()
+for _ in range(requests):
+    handler(request_factory.get('/api/events/', HTTP_HOST='localhost', HTTP_ACCEPT_ENCODING='gzip'))
+per_request = (time.perf_counter() - start) / requests
+print(json.dumps({'startup': startup, 'per_request': per_request, 'modules': len(sys.modules)}))
+'''
+
+
+class Command(BaseCommand):
+    help = "Compares worker cold start and per-request middleware overhead between settings profiles."
+
+    def add_arguments(self, parser):
+        parser.add_argument('--runs', type=int, default=5)
+        parser.add_argument('--requests', type=int, default=5000)
+        parser.add_argument(
+            '--settings-modules', nargs='+',
+            default=['AdvanceDjangoAssignment.settings', 'AdvanceDjangoAssignment.settings_api']
+        )
+
+    def handle(self, *args, **options):
+        for module in options['settings_modules']:
+            env = {**os.environ, 'DJANGO_SETTINGS_MODULE': module}
+            samples = []
+            for _ in range(options['runs']):
+                probe = subprocess.run(
+                    [sys.executable, '-c', PROBE, str(options['requests'])],
+                    cwd=settings.BASE_DIR, env=env, capture_output=True, text=True
+                )
+                if probe.returncode:
+                    raise CommandError(f"Probe failed for {module}:\n{probe.stderr}")
+                samples.append(json.loads(probe.stdout))
+            self.stdout.write(
+                f"{module}: cold start {median(s['startup'] for s in samples) * 1000:.0f} ms "
+                f"({samples[0]['modules']} modules), "
+                f"middleware {median(s['per_request'] for s in samples) * 1e6:.1f} us/request"
+            )
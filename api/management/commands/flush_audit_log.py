@@ -0,0 +1,10 @@
+from django.core.management.base import BaseCommand
+
+from api import audit
+
+
+class Command(BaseCommand):
+    help = "Loads audit events left in spool files by crashed processes or failed flushes."
+
+    def handle(self, *args, **options):
+        self.stdout.write(f"Replayed {audit.replay_spool()} audit events.")
@@ -0,0 +1,33 @@
+import csv
+from itertools import islice
+
+from django.core.management.base import BaseCommand, CommandError
+from django.db import IntegrityError
+
+from api.hashing import HashingBusy
+from api.provisioning import PROVISION_MAX_ROWS, provision_users
+
+
+class Command(BaseCommand):
+    help = (
+        "Creates user accounts from a CSV file with username, email, password, role, first_name and "
+        "last_name columns."
+    )
+
+    def add_arguments(self, parser):
+        parser.add_argument('path')
+
+    def handle(self, *args, **options):
+        with open(options['path'], encoding='utf-8-sig', newline='') as csv_file:
+            rows = list(islice(csv.DictReader(csv_file), PROVISION_MAX_ROWS + 1))
+        if len(rows) > PROVISION_MAX_ROWS:
+            raise CommandError(f"At most {PROVISION_MAX_ROWS} users can be created at once, split the file.")
+        try:
+            users, errors = provision_users(rows)
+        except IntegrityError as exc:
+            raise CommandError(f"Some users were created concurrently, nothing was created: {exc}")
+        except HashingBusy:
+            raise CommandError("The password hashing pool is busy, nothing was created. Retry shortly.")
+        for error in errors:
+            self.stderr.write(f"Row {error['row'] + 1}: {error['errors']}")
+        self.stdout.write(f"Created {len(users)} users, rejected {len(errors)} rows.")
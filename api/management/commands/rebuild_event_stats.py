@@ -0,0 +1,31 @@
+from django.core.management.base import BaseCommand, CommandError
+
+from api import stats
+
+ZERO = {'tickets_sold': 0, 'revenue': 0, 'cancellations': 0, 'refunded_amount': 0}
+
+
+class Command(BaseCommand):
+    help = "Recomputes per-event sales stats from bookings and payments, or checks them with --check."
+
+    def add_arguments(self, parser):
+        parser.add_argument('--check', action='store_true', help="Only report events whose stats differ.")
+        parser.add_argument('--batch-size', type=int, default=1000)
+
+    def handle(self, *args, **options):
+        if not options['check']:
+            stats.rebuild(batch_size=options['batch_size'])
+            self.stdout.write("Event sales stats rebuilt.")
+            return
+
+        live = stats.live_stats()
+        stored = stats.stored_stats()
+        mismatches = sorted(
+            event_id for event_id in live.keys() | stored.keys()
+            if live.get(event_id, ZERO) != stored.get(event_id, ZERO)
+        )
+        for event_id in mismatches:
+            self.stdout.write(f"Event {event_id}: stored {stored.get(event_id, ZERO)}, live {live.get(event_id, ZERO)}")
+        if mismatches:
+            raise CommandError(f"{len(mismatches)} event(s) have stale sales stats.")
+        self.stdout.write("All event sales stats match.")
@@ -0,0 +1,36 @@
+from django.core.management.base import BaseCommand, CommandError
+
+from api.reconciliation import reconcile, write_settlement_file
+
+
+class Command(BaseCommand):
+    help = "Compares payments with a settlement file and writes a CSV report of the discrepancies."
+
+    def add_arguments(self, parser):
+        parser.add_argument('settlement_file')
+        parser.add_argument('--report', default='reconciliation-report.csv')
+        parser.add_argument('--workers', type=int, help="Worker processes (defaults to the CPU count).")
+        parser.add_argument('--partitions', type=int)
+        parser.add_argument(
+            '--write-settlement', action='store_true',
+            help="Write a settlement file matching the current payments instead, for testing."
+        )
+
+    def handle(self, *args, **options):
+        if options['write_settlement']:
+            write_settlement_file(options['settlement_file'])
+            self.stdout.write(f"Wrote {options['settlement_file']}.")
+            return
+
+        try:
+            totals = reconcile(
+                options['settlement_file'], options['report'],
+                workers=options['workers'], partitions=options['partitions']
+            )
+        except (OSError, ValueError) as e:
+            raise CommandError(str(e))
+        issues = {issue: count for issue, count in totals.items() if issue != 'matched'}
+        self.stdout.write(f"Matched {totals['matched']} payments, {sum(issues.values())} discrepancies.")
+        for issue, count in sorted(issues.items()):
+            self.stdout.write(f"  {issue}: {count}")
+        self.stdout.write(f"Report written to {options['report']}.")
@@ -0,0 +1,38 @@
+import subprocess
+import sys
+
+from django.conf import settings
+from django.core.management.base import BaseCommand
+
+from api import jobs
+
+
+class Command(BaseCommand):
+    help = "Runs background jobs (event cancellations) from the database queue."
+
+    def add_arguments(self, parser):
+        parser.add_argument('--processes', type=int, default=1, help="Number of worker processes to start.")
+        parser.add_argument('--once', action='store_true', help="Exit once the queue is empty.")
+        parser.add_argument('--poll-interval', type=float, default=1.0)
+
+    def handle(self, *args, **options):
+        if options['processes'] > 1:
+            self.spawn_workers(options)
+            return
+        if options['once']:
+            self.stdout.write(f"Ran {jobs.run_pending()} jobs.")
+            return
+        jobs.work(poll_interval=options['poll_interval'])
+
+    def spawn_workers(self, options):
+        command = [sys.executable, str(settings.BASE_DIR / 'manage.py'), 'run_jobs', '--processes', '1',
+                   '--poll-interval', str(options['poll_interval'])]
+        if options['once']:
+            command.append('--once')
+        workers = [subprocess.Popen(command) for _ in range(options['processes'])]
+        try:
+            for worker in workers:
+                worker.wait()
+        except KeyboardInterrupt:
+            for worker in workers:
+                worker.terminate()
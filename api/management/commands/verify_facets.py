@@ -0,0 +1,28 @@
+from django.core.management.base import BaseCommand, CommandError
+
+from api import facets
+
+
+class Command(BaseCommand):
+    help = "Compares the event facet counters with a live GROUP BY over events."
+
+    def add_arguments(self, parser):
+        parser.add_argument('--rebuild', action='store_true', help="Recompute the counters from the events table.")
+
+    def handle(self, *args, **options):
+        if options['rebuild']:
+            facets.rebuild()
+            self.stdout.write("Facet counters rebuilt.")
+
+        live = facets.live_counts()
+        stored = facets.stored_counts()
+        mismatches = sorted(key for key in live.keys() | stored.keys() if live.get(key) != stored.get(key))
+        for category, location, month in mismatches:
+            self.stdout.write(
+                f"{category} / {location} / {month:%Y-%m}: "
+                f"stored {stored.get((category, location, month), (0, 0))}, "
+                f"live {live.get((category, location, month), (0, 0))}"
+            )
+        if mismatches:
+            raise CommandError(f"{len(mismatches)} facet counter(s) differ from the live counts.")
+        self.stdout.write(f"All {len(live)} facet counters match.")
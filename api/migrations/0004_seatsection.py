@@ -0,0 +1,39 @@
+# Generated by Django 5.1.1 on 2026-10-19 01:22
+
+import django.db.models.deletion
+from django.db import migrations, models
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('api', '0003_waitlistentry'),
+    ]
+
+    operations = [
+        migrations.AddField(
+            model_name='booking',
+            name='first_seat',
+            field=models.PositiveIntegerField(blank=True, null=True),
+        ),
+        migrations.CreateModel(
+            name='SeatSection',
+            fields=[
+                ('id', models.BigAutoField(auto_created=True, primary_key=True, serialize=False, verbose_name='ID')),
+                ('name', models.CharField(max_length=100)),
+                ('capacity', models.PositiveIntegerField()),
+                ('seats_per_row', models.PositiveIntegerField()),
+                ('seat_map', models.BinaryField()),
+                ('version', models.PositiveIntegerField(default=0)),
+                ('event', models.ForeignKey(on_delete=django.db.models.deletion.CASCADE, related_name='seat_sections', to='api.event')),
+            ],
+            options={
+                'unique_together': {('event', 'name')},
+            },
+        ),
+        migrations.AddField(
+            model_name='booking',
+            name='section',
+            field=models.ForeignKey(blank=True, null=True, on_delete=django.db.models.deletion.SET_NULL, related_name='bookings', to='api.seatsection'),
+        ),
+    ]
@@ -0,0 +1,60 @@
+# Generated by Django 5.1.1 on 2026-10-19 01:40
+
+from datetime import datetime, timedelta
+
+import django.core.validators
+from django.conf import settings
+from django.db import migrations, models
+from django.utils import timezone
+
+
+def set_schedules(apps, schema_editor):
+    # Same as api.models.event_window when this migration was written
+    Event = apps.get_model('api', 'Event')
+    events = list(Event.objects.only('date', 'time', 'duration'))
+    for event in events:
+        start = datetime.combine(event.date, event.time)
+        if settings.USE_TZ:
+            start = timezone.make_aware(start)
+        event.starts_at, event.ends_at = start, start + timedelta(minutes=event.duration)
+    Event.objects.bulk_update(events, ['starts_at', 'ends_at'], batch_size=1000)
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('api', '0004_seatsection'),
+    ]
+
+    operations = [
+        migrations.AddField(
+            model_name='event',
+            name='duration',
+            field=models.PositiveIntegerField(default=120, help_text='Length of the event in minutes.', validators=[django.core.validators.MinValueValidator(1), django.core.validators.MaxValueValidator(1440)]),
+        ),
+        migrations.AddField(
+            model_name='event',
+            name='starts_at',
+            field=models.DateTimeField(editable=False, null=True),
+        ),
+        migrations.AddField(
+            model_name='event',
+            name='ends_at',
+            field=models.DateTimeField(editable=False, null=True),
+        ),
+        migrations.RunPython(set_schedules, migrations.RunPython.noop),
+        migrations.AlterField(
+            model_name='event',
+            name='starts_at',
+            field=models.DateTimeField(editable=False),
+        ),
+        migrations.AlterField(
+            model_name='event',
+            name='ends_at',
+            field=models.DateTimeField(editable=False),
+        ),
+        migrations.AddIndex(
+            model_name='event',
+            index=models.Index(fields=['location', 'starts_at'], name='event_venue_schedule_idx'),
+        ),
+    ]
@@ -0,0 +1,41 @@
+# Generated by Django 5.1.1 on 2026-10-19 01:27
+
+from django.db import migrations, models
+from django.db.models import Count, Q
+from django.db.models.functions import TruncMonth
+
+
+def build_facet_counts(apps, schema_editor):
+    Event = apps.get_model('api', 'Event')
+    EventFacetCount = apps.get_model('api', 'EventFacetCount')
+    rows = (
+        Event.objects.annotate(month=TruncMonth('date'))
+        .values('category', 'location', 'month')
+        .annotate(events=Count('id'), available=Count('id', filter=Q(available_tickets__gt=0)))
+    )
+    EventFacetCount.objects.bulk_create([EventFacetCount(**row) for row in rows], batch_size=1000)
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('api', '0005_event_schedule'),
+    ]
+
+    operations = [
+        migrations.CreateModel(
+            name='EventFacetCount',
+            fields=[
+                ('id', models.BigAutoField(auto_created=True, primary_key=True, serialize=False, verbose_name='ID')),
+                ('category', models.CharField(max_length=50)),
+                ('location', models.CharField(max_length=255)),
+                ('month', models.DateField()),
+                ('events', models.IntegerField(default=0)),
+                ('available', models.IntegerField(default=0)),
+            ],
+            options={
+                'unique_together': {('category', 'location', 'month')},
+            },
+        ),
+        migrations.RunPython(build_facet_counts, migrations.RunPython.noop),
+    ]
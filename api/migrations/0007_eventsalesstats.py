@@ -0,0 +1,47 @@
+# Generated by Django 5.1.1 on 2026-10-19 01:29
+
+import django.db.models.deletion
+from django.db import migrations, models
+from django.db.models import Count, Q, Sum
+
+
+def build_sales_stats(apps, schema_editor):
+    Booking = apps.get_model('api', 'Booking')
+    Payment = apps.get_model('api', 'Payment')
+    EventSalesStats = apps.get_model('api', 'EventSalesStats')
+    stats = {}
+    for row in Booking.objects.values('event_id').annotate(
+        tickets_sold=Sum('number_of_tickets', filter=Q(status='booked')),
+        cancellations=Count('id', filter=Q(status='cancelled')),
+    ):
+        stats[row['event_id']] = EventSalesStats(
+            event_id=row['event_id'], tickets_sold=row['tickets_sold'] or 0, cancellations=row['cancellations']
+        )
+    for row in Payment.objects.values('booking__event_id').annotate(
+        revenue=Sum('amount', filter=Q(status='completed')),
+        refunded_amount=Sum('amount', filter=Q(status='reverted')),
+    ):
+        stats[row['booking__event_id']].revenue = row['revenue'] or 0
+        stats[row['booking__event_id']].refunded_amount = row['refunded_amount'] or 0
+    EventSalesStats.objects.bulk_create(stats.values(), batch_size=1000)
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('api', '0006_eventfacetcount'),
+    ]
+
+    operations = [
+        migrations.CreateModel(
+            name='EventSalesStats',
+            fields=[
+                ('event', models.OneToOneField(on_delete=django.db.models.deletion.CASCADE, primary_key=True, related_name='sales_stats', serialize=False, to='api.event')),
+                ('tickets_sold', models.IntegerField(default=0)),
+                ('revenue', models.DecimalField(decimal_places=2, default=0, max_digits=14)),
+                ('cancellations', models.IntegerField(default=0)),
+                ('refunded_amount', models.DecimalField(decimal_places=2, default=0, max_digits=14)),
+            ],
+        ),
+        migrations.RunPython(build_sales_stats, migrations.RunPython.noop),
+    ]
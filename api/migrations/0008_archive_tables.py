@@ -0,0 +1,57 @@
+# Generated by Django 5.1.1 on 2026-10-19 01:36
+
+import django.db.models.deletion
+from django.conf import settings
+from django.db import migrations, models
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('api', '0007_eventsalesstats'),
+    ]
+
+    operations = [
+        migrations.CreateModel(
+            name='ArchivedEvent',
+            fields=[
+                ('id', models.BigIntegerField(primary_key=True, serialize=False)),
+                ('title', models.CharField(max_length=255)),
+                ('description', models.TextField()),
+                ('date', models.DateField(db_index=True)),
+                ('time', models.TimeField()),
+                ('location', models.CharField(max_length=255)),
+                ('category', models.CharField(choices=[('music', 'Music'), ('sports', 'Sports'), ('theatre', 'Theatre')], max_length=50)),
+                ('payment_options', models.CharField(max_length=255)),
+                ('total_tickets', models.PositiveIntegerField()),
+                ('available_tickets', models.PositiveIntegerField()),
+                ('duration', models.PositiveIntegerField()),
+                ('starts_at', models.DateTimeField()),
+                ('ends_at', models.DateTimeField()),
+                ('archived_at', models.DateTimeField(auto_now_add=True)),
+                ('created_by', models.ForeignKey(on_delete=django.db.models.deletion.CASCADE, related_name='archived_events', to=settings.AUTH_USER_MODEL)),
+            ],
+        ),
+        migrations.CreateModel(
+            name='ArchivedBooking',
+            fields=[
+                ('id', models.BigIntegerField(primary_key=True, serialize=False)),
+                ('number_of_tickets', models.PositiveIntegerField()),
+                ('booking_date', models.DateTimeField()),
+                ('status', models.CharField(choices=[('booked', 'Booked'), ('cancelled', 'Cancelled')], max_length=20)),
+                ('user', models.ForeignKey(on_delete=django.db.models.deletion.CASCADE, related_name='archived_bookings', to=settings.AUTH_USER_MODEL)),
+                ('event', models.ForeignKey(on_delete=django.db.models.deletion.CASCADE, related_name='bookings', to='api.archivedevent')),
+            ],
+        ),
+        migrations.CreateModel(
+            name='ArchivedPayment',
+            fields=[
+                ('id', models.BigIntegerField(primary_key=True, serialize=False)),
+                ('payment_method', models.CharField(max_length=50)),
+                ('amount', models.DecimalField(decimal_places=2, max_digits=10)),
+                ('payment_date', models.DateTimeField()),
+                ('status', models.CharField(choices=[('completed', 'Completed'), ('reverted', 'Reverted')], max_length=20)),
+                ('booking', models.OneToOneField(on_delete=django.db.models.deletion.CASCADE, related_name='payment', to='api.archivedbooking')),
+            ],
+        ),
+    ]
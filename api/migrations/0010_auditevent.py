@@ -0,0 +1,31 @@
+# Generated by Django 5.1.1 on 2026-10-19 02:04
+
+from django.db import migrations, models
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('api', '0009_job'),
+    ]
+
+    operations = [
+        migrations.CreateModel(
+            name='AuditEvent',
+            fields=[
+                ('id', models.BigAutoField(auto_created=True, primary_key=True, serialize=False, verbose_name='ID')),
+                ('uid', models.CharField(max_length=32, unique=True)),
+                ('entity', models.CharField(choices=[('booking', 'Booking'), ('payment', 'Payment')], max_length=20)),
+                ('entity_id', models.BigIntegerField()),
+                ('from_status', models.CharField(blank=True, max_length=20)),
+                ('to_status', models.CharField(max_length=20)),
+                ('booking_id', models.BigIntegerField()),
+                ('event_id', models.BigIntegerField()),
+                ('user_id', models.BigIntegerField()),
+                ('created_at', models.DateTimeField()),
+            ],
+            options={
+                'indexes': [models.Index(fields=['booking_id', 'id'], name='audit_booking_idx'), models.Index(fields=['event_id', 'id'], name='audit_event_idx'), models.Index(fields=['user_id', 'id'], name='audit_user_idx')],
+            },
+        ),
+    ]
@@ -0,0 +1,17 @@
+# Generated by Django 5.1.1 on 2026-10-19 02:36
+
+from django.db import migrations, models
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('api', '0012_event_list_indexes'),
+    ]
+
+    operations = [
+        migrations.AddConstraint(
+            model_name='waitlistentry',
+            constraint=models.UniqueConstraint(condition=models.Q(('status', 'waiting')), fields=('event', 'user'), name='waitlist_one_waiting_entry'),
+        ),
+    ]
@@ -0,0 +1,20 @@
+# Generated by Django 5.1.1 on 2026-10-19 02:51
+
+from django.db import migrations, models
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('api', '0014_user_role_idx'),
+    ]
+
+    operations = [
+        migrations.CreateModel(
+            name='VenueLock',
+            fields=[
+                ('id', models.BigAutoField(auto_created=True, primary_key=True, serialize=False, verbose_name='ID')),
+                ('location', models.CharField(max_length=255, unique=True)),
+            ],
+        ),
+    ]
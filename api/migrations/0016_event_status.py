@@ -0,0 +1,23 @@
+# Generated by Django 5.1.1 on 2026-10-19 03:38
+
+from django.db import migrations, models
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('api', '0015_venuelock'),
+    ]
+
+    operations = [
+        migrations.AddField(
+            model_name='archivedevent',
+            name='status',
+            field=models.CharField(choices=[('open', 'Open'), ('cancelling', 'Cancelling')], default='open', max_length=20),
+        ),
+        migrations.AddField(
+            model_name='event',
+            name='status',
+            field=models.CharField(choices=[('open', 'Open'), ('cancelling', 'Cancelling')], default='open', max_length=20),
+        ),
+    ]
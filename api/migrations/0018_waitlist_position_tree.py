@@ -0,0 +1,61 @@
+# Generated by Django 5.1.1 on 2026-10-19 03:46
+
+import django.db.models.deletion
+from django.db import migrations, models
+
+
+def build_waitlist_queues(apps, schema_editor):
+    # Numbers each event's entries in id order and builds the departure tree
+    # the way api.waitlist maintains it
+    WaitlistEntry = apps.get_model('api', 'WaitlistEntry')
+    WaitlistQueue = apps.get_model('api', 'WaitlistQueue')
+    WaitlistDeparture = apps.get_model('api', 'WaitlistDeparture')
+    event_ids = WaitlistEntry.objects.order_by('event_id').values_list('event_id', flat=True).distinct()
+    for event_id in event_ids:
+        entries = list(WaitlistEntry.objects.filter(event_id=event_id).order_by('id').only('id', 'status'))
+        departed = [0]
+        for sequence, entry in enumerate(entries, 1):
+            entry.sequence = sequence
+            departed.append(departed[-1] + (entry.status != 'waiting'))
+        WaitlistEntry.objects.bulk_update(entries, ['sequence'], batch_size=1000)
+        WaitlistDeparture.objects.bulk_create([
+            WaitlistDeparture(event_id=event_id, node=node, count=departed[node] - departed[node - (node & -node)])
+            for node in range(1, len(entries) + 1)
+        ], batch_size=1000)
+        WaitlistQueue.objects.create(event_id=event_id, length=len(entries))
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('api', '0017_archivedeventsalesstats'),
+    ]
+
+    operations = [
+        migrations.CreateModel(
+            name='WaitlistQueue',
+            fields=[
+                ('event', models.OneToOneField(on_delete=django.db.models.deletion.CASCADE, primary_key=True, related_name='waitlist_queue', serialize=False, to='api.event')),
+                ('length', models.PositiveIntegerField(default=0)),
+            ],
+        ),
+        migrations.AddField(
+            model_name='waitlistentry',
+            name='sequence',
+            field=models.PositiveIntegerField(default=0, editable=False),
+            preserve_default=False,
+        ),
+        migrations.CreateModel(
+            name='WaitlistDeparture',
+            fields=[
+                ('id', models.BigAutoField(auto_created=True, primary_key=True, serialize=False, verbose_name='ID')),
+                ('node', models.PositiveIntegerField()),
+                ('count', models.PositiveIntegerField(default=0)),
+                ('event', models.ForeignKey(on_delete=django.db.models.deletion.CASCADE, related_name='waitlist_departures', to='api.event')),
+            ],
+            options={
+                'unique_together': {('event', 'node')},
+            },
+        ),
+        migrations.RunPython(build_waitlist_queues, migrations.RunPython.noop),
+    ]
@@ -1,5 +1,10 @@
+from datetime import datetime, timedelta
+
+from django.conf import settings
+from django.core.validators import MaxValueValidator, MinValueValidator
 from django.db import models
 from django.contrib.auth.models import AbstractUser
+from django.utils import timezone
 
 
 # Create your models here.
@@ -14,10 +19,29 @@ class User(AbstractUser):
 
     REQUIRED_FIELDS = ['email', 'first_name', 'last_name']  # Use existing fields
 
+    class Meta(AbstractUser.Meta):
+        # Role filter in the admin, newest first
+        indexes = [models.Index(fields=['role', 'id'], name='user_role_idx')]
+
     def __str__(self):
         return self.username
 
 
+# Upper bound on Event.duration. It bounds how far back a venue conflict
+# lookup has to scan the (location, starts_at) index.
+MAX_EVENT_DURATION_MINUTES = 24 * 60
+
+
+def event_window(date, time, duration):
+    """
+    Returns the aware ``(start, end)`` datetimes of an event.
+    """
+    start = datetime.combine(date, time)
+    if settings.USE_TZ:
+        start = timezone.make_aware(start)
+    return start, start + timedelta(minutes=duration)
+
+
 class Event(models.Model):
     CATEGORY_CHOICES = (
         ('music', 'Music'),
@@ -25,6 +49,11 @@ class Event(models.Model):
         ('theatre', 'Theatre'),
         # Add more categories as needed
     )
+    STATUS_CHOICES = (
+        ('open', 'Open'),
+        # Closed to sales while a job cancels its bookings (see api.lifecycle)
+        ('cancelling', 'Cancelling'),
+    )
 
     title = models.CharField(max_length=255)
     description = models.TextField()
@@ -36,10 +65,73 @@ class Event(models.Model):
     created_by = models.ForeignKey(User, on_delete=models.CASCADE, related_name='events')
     total_tickets = models.PositiveIntegerField(default=100)  # Example field
     available_tickets = models.PositiveIntegerField(default=100)
+    status = models.CharField(max_length=20, choices=STATUS_CHOICES, default='open')
+    duration = models.PositiveIntegerField(
+        default=120, validators=[MinValueValidator(1), MaxValueValidator(MAX_EVENT_DURATION_MINUTES)],
+        help_text="Length of the event in minutes."
+    )
+    # Derived from date, time and duration by set_schedule(), for venue conflict lookups
+    starts_at = models.DateTimeField(editable=False)
+    ends_at = models.DateTimeField(editable=False)
+
+    class Meta:
+        indexes = [
+            models.Index(fields=['location', 'starts_at'], name='event_venue_schedule_idx'),
+            # Event list date ranges, with and without a category
+            models.Index(fields=['date'], name='event_date_idx'),
+            models.Index(fields=['category', 'date'], name='event_category_date_idx'),
+            # Upcoming events with tickets left; sold-out events drop out of it
+            models.Index(
+                fields=['category', 'date'], condition=models.Q(available_tickets__gt=0), name='event_available_idx'
+            ),
+        ]
 
     def __str__(self):
         return self.title
 
+    def set_schedule(self):
+        self.starts_at, self.ends_at = event_window(self.date, self.time, self.duration)
+
+    def save(self, *args, **kwargs):
+        self.set_schedule()
+        update_fields = kwargs.get('update_fields')
+        if update_fields is not None and {'date', 'time', 'duration'} & set(update_fields):
+            kwargs['update_fields'] = {*update_fields, 'starts_at', 'ends_at'}
+        super().save(*args, **kwargs)
+
+
+class VenueLock(models.Model):
+    """
+    One row per event location, locked while events are scheduled there (see
+    ``scheduling.lock_venues``) so two transactions cannot both find the same
+    slot free.
+    """
+    location = models.CharField(max_length=255, unique=True)
+
+    def __str__(self):
+        return self.location
+
+
+class SeatSection(models.Model):
+    """
+    Assigned seating for part of an event. Seats are numbered from 0 in row
+    order and ``seat_map`` holds one bit per seat (set when taken), so a
+    100k-seat section is 12.5 KB.
+    """
+    event = models.ForeignKey(Event, on_delete=models.CASCADE, related_name='seat_sections')
+    name = models.CharField(max_length=100)
+    capacity = models.PositiveIntegerField()
+    seats_per_row = models.PositiveIntegerField()
+    seat_map = models.BinaryField()
+    # Bumped on every seat_map write, for compare-and-swap updates
+    version = models.PositiveIntegerField(default=0)
+
+    class Meta:
+        unique_together = ('event', 'name')
+
+    def __str__(self):
+        return f"{self.event.title} - {self.name}"
+
 
 class Booking(models.Model):
     STATUS_CHOICES = (
@@ -52,6 +144,13 @@ class Booking(models.Model):
     number_of_tickets = models.PositiveIntegerField()
     booking_date = models.DateTimeField(auto_now_add=True)
     status = models.CharField(max_length=20, choices=STATUS_CHOICES, default='booked')
+    # Assigned seats are always the adjacent block first_seat .. first_seat + number_of_tickets - 1
+    section = models.ForeignKey(SeatSection, on_delete=models.SET_NULL, null=True, blank=True, related_name='bookings')
+    first_seat = models.PositiveIntegerField(null=True, blank=True)
+
+    class Meta:
+        # Status filters in the admin, newest first
+        indexes = [models.Index(fields=['status', 'id'], name='booking_status_idx')]
 
     def __str__(self):
         return f"{self.user.username} - {self.event.title}"
@@ -69,5 +168,250 @@ class Payment(models.Model):
     payment_date = models.DateTimeField(auto_now_add=True)
     status = models.CharField(max_length=20, choices=STATUS_CHOICES, default='completed')
 
+    class Meta:
+        indexes = [models.Index(fields=['status', 'id'], name='payment_status_idx')]
+
     def __str__(self):
         return f"Payment for {self.booking}"
+
+
+class WaitlistEntry(models.Model):
+    STATUS_CHOICES = (
+        ('waiting', 'Waiting'),
+        ('promoted', 'Promoted'),
+        ('left', 'Left'),
+    )
+
+    user = models.ForeignKey(User, on_delete=models.CASCADE, related_name='waitlist_entries')
+    event = models.ForeignKey(Event, on_delete=models.CASCADE, related_name='waitlist_entries')
+    number_of_tickets = models.PositiveIntegerField()
+    created_at = models.DateTimeField(auto_now_add=True)
+    status = models.CharField(max_length=20, choices=STATUS_CHOICES, default='waiting')
+    booking = models.OneToOneField(Booking, on_delete=models.SET_NULL, null=True, blank=True,
+                                   related_name='waitlist_entry')
+    # 1-based join order within the event, assigned by api.waitlist.enqueue
+    sequence = models.PositiveIntegerField(editable=False)
+
+    class Meta:
+        # The id gives FIFO order, so the head of an event's queue is an
+        # index range lookup
+        indexes = [models.Index(fields=['event', 'status', 'id'], name='waitlist_queue_idx')]
+        constraints = [
+            models.UniqueConstraint(
+                fields=['event', 'user'], condition=models.Q(status='waiting'), name='waitlist_one_waiting_entry'
+            ),
+        ]
+
+    def __str__(self):
+        return f"{self.user.username} waiting for {self.event.title}"
+
+
+class WaitlistQueue(models.Model):
+    """
+    The number of entries that ever joined an event's waitlist. Its row is
+    locked while entries join, leave or are promoted.
+    """
+    event = models.OneToOneField(Event, on_delete=models.CASCADE, primary_key=True, related_name='waitlist_queue')
+    length = models.PositiveIntegerField(default=0)
+
+    def __str__(self):
+        return f"Waitlist of {self.event}"
+
+
+class WaitlistDeparture(models.Model):
+    """
+    One node of a per-event Fenwick tree over entry sequences that counts
+    the entries no longer waiting. Node ``n`` holds the count for sequences
+    ``n - (n & -n) + 1 .. n``, so the departures ahead of an entry are the
+    sum of at most log2(n) nodes (see ``api.waitlist``).
+    """
+    event = models.ForeignKey(Event, on_delete=models.CASCADE, related_name='waitlist_departures')
+    node = models.PositiveIntegerField()
+    count = models.PositiveIntegerField(default=0)
+
+    class Meta:
+        unique_together = ('event', 'node')
+
+    def __str__(self):
+        return f"{self.event} node {self.node}: {self.count}"
+
+
+class EventSalesStats(models.Model):
+    """
+    Denormalized sales figures for one event, kept up to date by
+    ``api.stats`` in the same code paths that change bookings and payments.
+    """
+    event = models.OneToOneField(Event, on_delete=models.CASCADE, primary_key=True, related_name='sales_stats')
+    tickets_sold = models.IntegerField(default=0)
+    revenue = models.DecimalField(max_digits=14, decimal_places=2, default=0)
+    cancellations = models.IntegerField(default=0)
+    refunded_amount = models.DecimalField(max_digits=14, decimal_places=2, default=0)
+
+    def __str__(self):
+        return f"Sales for {self.event}"
+
+
+class EventFacetCount(models.Model):
+    """
+    One cell of the event facet cube: how many events, and how many with
+    tickets left, exist per category, location and month. Maintained by
+    ``api.facets`` as events are created, sold out, reopened and cancelled.
+    """
+    category = models.CharField(max_length=50)
+    location = models.CharField(max_length=255)
+    month = models.DateField()
+    events = models.IntegerField(default=0)
+    available = models.IntegerField(default=0)
+
+    class Meta:
+        unique_together = ('category', 'location', 'month')
+
+    def __str__(self):
+        return f"{self.category} / {self.location} / {self.month:%Y-%m}"
+
+
+class IdempotencyKey(models.Model):
+    # sha256 of user, path and the client's Idempotency-Key header
+    key_hash = models.CharField(max_length=64, unique=True)
+    request_hash = models.CharField(max_length=64)
+    # Null while the first request with this key is still being processed
+    status_code = models.PositiveSmallIntegerField(null=True)
+    response_body = models.BinaryField(null=True)
+    created_at = models.DateTimeField(auto_now_add=True, db_index=True)
+
+    def __str__(self):
+        return self.key_hash
+
+
+class ArchivedEvent(models.Model):
+    """
+    A past event moved out of the hot ``Event`` table by ``api.archive``.
+    Keeps the original primary key.
+    """
+    id = models.BigIntegerField(primary_key=True)
+    title = models.CharField(max_length=255)
+    description = models.TextField()
+    date = models.DateField(db_index=True)
+    time = models.TimeField()
+    location = models.CharField(max_length=255)
+    category = models.CharField(max_length=50, choices=Event.CATEGORY_CHOICES)
+    payment_options = models.CharField(max_length=255)
+    created_by = models.ForeignKey(User, on_delete=models.CASCADE, related_name='archived_events')
+    total_tickets = models.PositiveIntegerField()
+    available_tickets = models.PositiveIntegerField()
+    status = models.CharField(max_length=20, choices=Event.STATUS_CHOICES, default='open')
+    duration = models.PositiveIntegerField()
+    starts_at = models.DateTimeField()
+    ends_at = models.DateTimeField()
+    archived_at = models.DateTimeField(auto_now_add=True)
+
+    def __str__(self):
+        return self.title
+
+
+class ArchivedBooking(models.Model):
+    id = models.BigIntegerField(primary_key=True)
+    user = models.ForeignKey(User, on_delete=models.CASCADE, related_name='archived_bookings')
+    event = models.ForeignKey(ArchivedEvent, on_delete=models.CASCADE, related_name='bookings')
+    number_of_tickets = models.PositiveIntegerField()
+    booking_date = models.DateTimeField()
+    status = models.CharField(max_length=20, choices=Booking.STATUS_CHOICES)
+
+    def __str__(self):
+        return f"{self.user.username} - {self.event.title}"
+
+
+class ArchivedPayment(models.Model):
+    id = models.BigIntegerField(primary_key=True)
+    booking = models.OneToOneField(ArchivedBooking, on_delete=models.CASCADE, related_name='payment')
+    payment_method = models.CharField(max_length=50)
+    amount = models.DecimalField(max_digits=10, decimal_places=2)
+    payment_date = models.DateTimeField()
+    status = models.CharField(max_length=20, choices=Payment.STATUS_CHOICES)
+
+    def __str__(self):
+        return f"Payment for {self.booking}"
+
+
+class ArchivedEventSalesStats(models.Model):
+    """
+    The ``EventSalesStats`` of an archived event, moved with it because the
+    bookings and payments they were computed from no longer exist in the
+    hot tables.
+    """
+    event = models.OneToOneField(ArchivedEvent, on_delete=models.CASCADE, primary_key=True, related_name='sales_stats')
+    tickets_sold = models.IntegerField(default=0)
+    revenue = models.DecimalField(max_digits=14, decimal_places=2, default=0)
+    cancellations = models.IntegerField(default=0)
+    refunded_amount = models.DecimalField(max_digits=14, decimal_places=2, default=0)
+
+    def __str__(self):
+        return f"Sales for {self.event}"
+
+
+class Job(models.Model):
+    """
+    A long-running operation processed in chunks by ``api.jobs`` workers.
+    """
+    STATUS_CHOICES = (
+        ('queued', 'Queued'),
+        ('running', 'Running'),
+        ('done', 'Done'),
+        ('failed', 'Failed'),
+    )
+
+    kind = models.CharField(max_length=50)
+    payload = models.JSONField(default=dict)
+    status = models.CharField(max_length=20, choices=STATUS_CHOICES, default='queued')
+    created_by = models.ForeignKey(User, on_delete=models.CASCADE, related_name='jobs')
+    # Resume point for the next chunk, e.g. the last processed booking id
+    cursor = models.BigIntegerField(default=0)
+    processed = models.PositiveIntegerField(default=0)
+    total = models.PositiveIntegerField(null=True, blank=True)
+    attempts = models.PositiveSmallIntegerField(default=0)
+    # A running job whose lease has expired was abandoned by its worker
+    locked_until = models.DateTimeField(null=True, blank=True)
+    error = models.TextField(blank=True)
+    created_at = models.DateTimeField(auto_now_add=True)
+    updated_at = models.DateTimeField(auto_now=True)
+
+    class Meta:
+        indexes = [
+            models.Index(fields=['status', 'id'], name='job_queue_idx'),
+        ]
+
+    def __str__(self):
+        return f"{self.kind} #{self.id} ({self.status})"
+
+
+class AuditEvent(models.Model):
+    """
+    One status change of a booking or payment. Rows are append-only and keep
+    plain ids so the history outlives deleted and archived rows.
+    """
+    ENTITY_CHOICES = (
+        ('booking', 'Booking'),
+        ('payment', 'Payment'),
+    )
+
+    # Generated when the change is recorded, so replaying a spool file
+    # cannot insert the same change twice
+    uid = models.CharField(max_length=32, unique=True)
+    entity = models.CharField(max_length=20, choices=ENTITY_CHOICES)
+    entity_id = models.BigIntegerField()
+    from_status = models.CharField(max_length=20, blank=True)
+    to_status = models.CharField(max_length=20)
+    booking_id = models.BigIntegerField()
+    event_id = models.BigIntegerField()
+    user_id = models.BigIntegerField()
+    created_at = models.DateTimeField()
+
+    class Meta:
+        indexes = [
+            models.Index(fields=['booking_id', 'id'], name='audit_booking_idx'),
+            models.Index(fields=['event_id', 'id'], name='audit_event_idx'),
+            models.Index(fields=['user_id', 'id'], name='audit_user_idx'),
+        ]
+
+    def __str__(self):
+        return f"{self.entity} {self.entity_id}: {self.from_status or '-'} -> {self.to_status}"
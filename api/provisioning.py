@@ -0,0 +1,93 @@
+"""
+Bulk creation of user accounts, e.g. for corporate ticketing customers.
+
+Rows are validated with one ``RegisterSerializer``, checked for taken
+usernames and emails with one query per batch, hashed in parallel on the
+password hashing pool and inserted with ``bulk_create``: one write per user,
+in as few statements as the batch size allows.
+"""
+from django.db import transaction
+from django.db.models import Q
+from rest_framework.exceptions import ValidationError
+
+from . import hashing
+from .models import User
+from .serializers import RegisterSerializer, taken_field_errors
+
+PROVISION_BATCH_SIZE = 500
+PROVISION_MAX_ROWS = 10000
+# Rows one HTTP request may provision. Hashing is slow by design, so larger
+# imports go through the provision_users command instead of holding a worker
+PROVISION_HTTP_MAX_ROWS = 100
+
+
+def taken(usernames, emails):
+    """
+    Returns the sets of ``usernames`` and ``emails`` that already belong to
+    a user, with one query.
+    """
+    usernames, emails = set(usernames), set(emails)
+    taken_usernames, taken_emails = set(), set()
+    rows = User.objects.filter(Q(username__in=usernames) | Q(email__in=emails)).values_list('username', 'email')
+    for username, email in rows:
+        if username in usernames:
+            taken_usernames.add(username)
+        if email in emails:
+            taken_emails.add(email)
+    return taken_usernames, taken_emails
+
+
+def validate_user_rows(rows):
+    """
+    Returns ``(index, data)`` pairs for the rows that can be created and a
+    list of ``{'row': index, 'errors': ...}`` for the rejected ones. A
+    username or email repeated within the rows is only accepted the first
+    time.
+    """
+    serializer = RegisterSerializer(context={'check_taken': False})
+    valid, errors = [], []
+    for index, row in enumerate(rows):
+        if not isinstance(row, dict):
+            errors.append({'row': index, 'errors': {'non_field_errors': ["Expected an object."]}})
+            continue
+        try:
+            valid.append((index, serializer.run_validation(row)))
+        except ValidationError as exc:
+            errors.append({'row': index, 'errors': exc.detail})
+
+    accepted, seen_usernames, seen_emails = [], set(), set()
+    for start in range(0, len(valid), PROVISION_BATCH_SIZE):
+        batch = valid[start:start + PROVISION_BATCH_SIZE]
+        taken_usernames, taken_emails = taken(
+            (data['username'] for _, data in batch), (data['email'] for _, data in batch)
+        )
+        for index, data in batch:
+            row_errors = taken_field_errors(
+                data['username'] in taken_usernames or data['username'] in seen_usernames,
+                data['email'] in taken_emails or data['email'] in seen_emails,
+            )
+            if row_errors:
+                errors.append({'row': index, 'errors': row_errors})
+                continue
+            seen_usernames.add(data['username'])
+            seen_emails.add(data['email'])
+            accepted.append((index, data))
+    errors.sort(key=lambda error: error['row'])
+    return accepted, errors
+
+
+def provision_users(rows):
+    """
+    Creates a user for every valid row and reports the invalid ones without
+    aborting. Raises ``IntegrityError`` if a username or email is taken
+    concurrently, in which case nothing is created.
+    """
+    valid, errors = validate_user_rows(rows)
+    passwords = hashing.make_passwords(data['password'] for _, data in valid)
+    users = [
+        User(password=password, **{field: value for field, value in data.items() if field != 'password'})
+        for (_, data), password in zip(valid, passwords)
+    ]
+    with transaction.atomic():
+        User.objects.bulk_create(users, batch_size=PROVISION_BATCH_SIZE)
+    return users, errors
@@ -0,0 +1,114 @@
+"""
+Reconciles payments against a settlement file.
+
+Both inputs are streamed once into partition files keyed by
+``booking_id % partitions``. Each partition pair is then hash-joined on
+booking id in its own worker process (see ``api.settlement``), so memory is
+bounded by one partition whatever the number of payments.
+
+The settlement file is a CSV with ``booking_id,amount,status`` columns,
+where status is ``settled`` or ``refunded``. Blank lines are skipped. A
+booking settled more than once is reported as ``duplicate_settlement``.
+"""
+import csv
+import os
+import shutil
+import tempfile
+from collections import Counter
+from concurrent.futures import ProcessPoolExecutor
+
+from .models import Payment
+from .settlement import EXPECTED_SETTLEMENT_STATUS, join_partition
+
+RECONCILE_CHUNK_SIZE = 5000
+# Target number of payments per partition, which bounds worker memory
+RECONCILE_PARTITION_ROWS = 200000
+RECONCILE_MAX_PARTITIONS = 256
+
+SETTLEMENT_FIELDS = ('booking_id', 'amount', 'status')
+REPORT_FIELDS = (
+    'booking_id', 'issue', 'payment_id', 'payment_amount', 'payment_status', 'booking_status',
+    'settled_amount', 'settlement_status',
+)
+
+
+def write_settlement_file(path, payments=None):
+    """
+    Writes a settlement file that matches ``payments`` (all payments by
+    default), as a stand-in for the processor's file.
+    """
+    payments = Payment.objects.order_by('id') if payments is None else payments
+    with open(path, 'w', newline='') as f:
+        writer = csv.writer(f)
+        writer.writerow(SETTLEMENT_FIELDS)
+        for booking_id, amount, status in payments.values_list('booking_id', 'amount', 'status').iterator(
+            chunk_size=RECONCILE_CHUNK_SIZE
+        ):
+            writer.writerow((booking_id, amount, EXPECTED_SETTLEMENT_STATUS[status]))
+
+
+def _partition(rows, directory, prefix, partitions):
+    files = [open(os.path.join(directory, f'{prefix}-{index}.csv'), 'w', newline='') for index in range(partitions)]
+    try:
+        writers = [csv.writer(f) for f in files]
+        for row in rows:
+            writers[int(row[0]) % partitions].writerow(row)
+    finally:
+        for f in files:
+            f.close()
+    return [f.name for f in files]
+
+
+def _payment_rows():
+    return Payment.objects.order_by('id').values_list(
+        'booking_id', 'id', 'amount', 'status', 'booking__status'
+    ).iterator(chunk_size=RECONCILE_CHUNK_SIZE)
+
+
+def _settlement_rows(path):
+    with open(path, newline='') as f:
+        reader = csv.reader(f)
+        header = next(reader, None)
+        if tuple(header or ()) != SETTLEMENT_FIELDS:
+            raise ValueError(f"Settlement file must have the columns {', '.join(SETTLEMENT_FIELDS)}.")
+        for row in reader:
+            if not row:
+                continue
+            if len(row) != len(SETTLEMENT_FIELDS):
+                raise ValueError(
+                    f"Line {reader.line_num}: expected {len(SETTLEMENT_FIELDS)} columns, got {len(row)}."
+                )
+            booking_id, amount, status = row
+            try:
+                booking_id = int(booking_id)
+            except ValueError:
+                raise ValueError(f"Line {reader.line_num}: booking_id must be an integer.") from None
+            yield booking_id, amount, status
+
+
+def reconcile(settlement_path, report_path, workers=None, partitions=None):
+    """
+    Compares every payment with ``settlement_path`` and writes the
+    discrepancies to ``report_path`` as CSV. Returns the row counts per issue.
+    """
+    if partitions is None:
+        partitions = min(RECONCILE_MAX_PARTITIONS, Payment.objects.count() // RECONCILE_PARTITION_ROWS + 1)
+
+    with tempfile.TemporaryDirectory() as directory:
+        payment_files = _partition(_payment_rows(), directory, 'payments', partitions)
+        settlement_files = _partition(_settlement_rows(settlement_path), directory, 'settlements', partitions)
+        report_files = [os.path.join(directory, f'report-{index}.csv') for index in range(partitions)]
+
+        jobs = (payment_files, settlement_files, report_files)
+        if workers == 1 or partitions == 1:
+            totals = sum(map(join_partition, *jobs), Counter())
+        else:
+            with ProcessPoolExecutor(max_workers=workers) as pool:
+                totals = sum(pool.map(join_partition, *jobs), Counter())
+
+        with open(report_path, 'w', newline='') as report:
+            csv.writer(report).writerow(REPORT_FIELDS)
+            for path in report_files:
+                with open(path, newline='') as f:
+                    shutil.copyfileobj(f, report)
+    return totals
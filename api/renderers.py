@@ -0,0 +1,86 @@
+import datetime
+import decimal
+import json
+
+from django.conf import settings
+from django.utils.functional import Promise
+from rest_framework.utils.encoders import JSONEncoder
+from rest_framework.exceptions import ParseError
+from rest_framework.parsers import JSONParser
+from rest_framework.renderers import JSONRenderer
+
+try:
+    import orjson
+except ImportError:  # pragma: no cover - falls back to the stdlib encoder
+    orjson = None
+
+
+def _default(obj):
+    # orjson handles date, time, datetime and UUID natively. Decimals are
+    # rendered as strings so amounts never lose precision through a float.
+    if isinstance(obj, (decimal.Decimal, Promise)):
+        return str(obj)
+    if isinstance(obj, datetime.timedelta):
+        # Same as DRF's JSONEncoder
+        return str(obj.total_seconds())
+    if hasattr(obj, '__iter__'):
+        return list(obj)
+    raise TypeError(f"Type is not JSON serializable: {type(obj).__name__}")
+
+
+class _DecimalStringEncoder(JSONEncoder):
+    def default(self, obj):
+        if isinstance(obj, decimal.Decimal):
+            return str(obj)
+        return super().default(obj)
+
+
+def dumps(obj):
+    """
+    Encodes ``obj`` to compact UTF-8 JSON bytes with the fastest backend
+    available.
+    """
+    if orjson is not None:
+        return orjson.dumps(obj, default=_default)
+    return json.dumps(obj, cls=_DecimalStringEncoder, ensure_ascii=False, separators=(',', ':')).encode()
+
+
+class FastJSONRenderer(JSONRenderer):
+    """
+    Drop-in replacement for ``JSONRenderer`` backed by orjson when it is
+    installed. Indented output (browsable API, ``; indent=``) still goes
+    through the stdlib encoder.
+    """
+
+    def render(self, data, accepted_media_type=None, renderer_context=None):
+        if data is None:
+            return b''
+
+        indent = self.get_indent(accepted_media_type, renderer_context or {})
+        if orjson is None or indent is not None or self.ensure_ascii:
+            return super().render(data, accepted_media_type, renderer_context)
+
+        ret = dumps(data)
+        # Keep the output a strict javascript subset, like JSONRenderer does
+        if b'\xe2\x80\xa8' in ret or b'\xe2\x80\xa9' in ret:
+            ret = ret.replace(b'\xe2\x80\xa8', b'\\u2028').replace(b'\xe2\x80\xa9', b'\\u2029')
+        return ret
+
+
+class FastJSONParser(JSONParser):
+    """
+    ``JSONParser`` backed by orjson when it is installed. orjson only reads
+    UTF-8, so other request encodings fall back to the stdlib parser.
+    """
+    renderer_class = FastJSONRenderer
+
+    def parse(self, stream, media_type=None, parser_context=None):
+        parser_context = parser_context or {}
+        encoding = parser_context.get('encoding', settings.DEFAULT_CHARSET)
+        if orjson is None or encoding.lower().replace('_', '-') != 'utf-8':
+            return super().parse(stream, media_type, parser_context)
+
+        try:
+            return orjson.loads(stream.read())
+        except orjson.JSONDecodeError as exc:
+            raise ParseError('JSON parse error - %s' % str(exc))
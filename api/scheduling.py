@@ -0,0 +1,68 @@
+from bisect import bisect_left, insort
+from datetime import timedelta
+
+from .models import MAX_EVENT_DURATION_MINUTES, Event, VenueLock
+
+MAX_EVENT_DURATION = timedelta(minutes=MAX_EVENT_DURATION_MINUTES)
+
+
+def venue_conflicts(location, start, end, exclude_id=None):
+    """
+    Returns the events at ``location`` that overlap ``[start, end)``.
+
+    No event lasts longer than MAX_EVENT_DURATION, so only events starting in
+    ``[start - MAX_EVENT_DURATION, end)`` can overlap. That keeps the lookup a
+    bounded range scan of the (location, starts_at) index: O(log n + k).
+    """
+    conflicts = Event.objects.filter(
+        location=location,
+        starts_at__gte=start - MAX_EVENT_DURATION,
+        starts_at__lt=end,
+        ends_at__gt=start,
+    )
+    if exclude_id is not None:
+        conflicts = conflicts.exclude(id=exclude_id)
+    return conflicts
+
+
+def lock_venues(locations):
+    """
+    Locks ``locations`` until the current transaction ends, so conflict
+    checks followed by inserts at the same location run one at a time.
+    Locations are locked in sorted order to avoid deadlocks between batches.
+    """
+    locations = sorted(set(locations))
+    VenueLock.objects.bulk_create([VenueLock(location=location) for location in locations], ignore_conflicts=True)
+    list(VenueLock.objects.select_for_update().filter(location__in=locations).order_by('location').values_list('id'))
+
+
+class VenueSchedule:
+    """
+    In-memory sorted start index of the events at one location, used to check
+    a whole batch of new events with a single query per location.
+    """
+
+    def __init__(self, intervals=()):
+        self._intervals = sorted(intervals)
+
+    @classmethod
+    def load(cls, location, start, end):
+        """
+        Loads the events at ``location`` that can overlap anything in
+        ``[start, end)``.
+        """
+        rows = Event.objects.filter(
+            location=location,
+            starts_at__gte=start - MAX_EVENT_DURATION,
+            starts_at__lt=end,
+        ).values_list('starts_at', 'ends_at')
+        return cls(rows)
+
+    def overlaps(self, start, end):
+        # Candidates start in [start - MAX_EVENT_DURATION, end)
+        lo = bisect_left(self._intervals, (start - MAX_EVENT_DURATION,))
+        hi = bisect_left(self._intervals, (end,))
+        return any(other_end > start for _, other_end in self._intervals[lo:hi])
+
+    def add(self, start, end):
+        insort(self._intervals, (start, end))
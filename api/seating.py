@@ -0,0 +1,92 @@
+from functools import lru_cache
+
+from .models import SeatSection
+
+# Optimistic updates retry this many times before giving up on a hot section
+CAS_RETRIES = 10
+
+
+class SeatAllocationError(Exception):
+    pass
+
+
+def to_bitmap(taken, capacity):
+    return taken.to_bytes((capacity + 7) // 8, 'little')
+
+
+def from_bitmap(seat_map):
+    return int.from_bytes(bytes(seat_map), 'little')
+
+
+@lru_cache(maxsize=256)
+def _start_mask(capacity, seats_per_row, count):
+    # Bit i is set when a block of ``count`` seats starting at i stays inside
+    # one row and inside the section
+    if count > seats_per_row:
+        return 0
+    row_mask = (1 << (seats_per_row - count + 1)) - 1
+    mask = 0
+    for row_start in range(0, capacity, seats_per_row):
+        mask |= row_mask << row_start
+    return mask & ((1 << max(capacity - count + 1, 0)) - 1)
+
+
+def find_adjacent(taken, capacity, seats_per_row, count):
+    """
+    Returns the first seat of the lowest block of ``count`` adjacent free
+    seats in one row, or None. Runs in O(log count) big-integer operations.
+    """
+    if count < 1:
+        return None
+    runs = ~taken & ((1 << capacity) - 1)
+    length = 1
+    while length < count:
+        # After this step bit i is set iff seats i .. i + length + step - 1 are free
+        step = min(length, count - length)
+        runs &= runs >> step
+        length += step
+    candidates = runs & _start_mask(capacity, seats_per_row, count)
+    if not candidates:
+        return None
+    return (candidates & -candidates).bit_length() - 1
+
+
+def block_mask(first_seat, count):
+    return ((1 << count) - 1) << first_seat
+
+
+def _compare_and_swap(section_id, update):
+    for _ in range(CAS_RETRIES):
+        section = SeatSection.objects.only('capacity', 'seats_per_row', 'seat_map', 'version').get(id=section_id)
+        taken = from_bitmap(section.seat_map)
+        new_taken, result = update(section, taken)
+        updated = SeatSection.objects.filter(id=section_id, version=section.version).update(
+            seat_map=to_bitmap(new_taken, section.capacity), version=section.version + 1
+        )
+        if updated:
+            return result
+    raise SeatAllocationError("Seat map is busy, try again.")
+
+
+def allocate_seats(section_id, count):
+    """
+    Atomically marks ``count`` adjacent seats as taken and returns the first
+    seat number.
+    """
+    def update(section, taken):
+        first_seat = find_adjacent(taken, section.capacity, section.seats_per_row, count)
+        if first_seat is None:
+            raise SeatAllocationError(f"No block of {count} adjacent seats is available in this section.")
+        return taken | block_mask(first_seat, count), first_seat
+
+    return _compare_and_swap(section_id, update)
+
+
+def release_seats(section_id, first_seat, count):
+    """
+    Atomically marks a previously allocated block of seats as free again.
+    """
+    def update(section, taken):
+        return taken & ~block_mask(first_seat, count), None
+
+    return _compare_and_swap(section_id, update)
@@ -1,33 +1,85 @@
+from contextlib import nullcontext
+
+from django.conf import settings
+from django.db import IntegrityError, transaction
+from django.db.models import Case, F, Q, When
 from rest_framework import serializers
-from .models import User, Event, Booking, Payment
+from rest_framework.settings import api_settings
+from . import audit, facets, lifecycle, stats
+from .models import User, Event, Booking, Payment, WaitlistEntry, SeatSection, EventSalesStats, Job, AuditEvent, \
+    event_window
+from .scheduling import lock_venues, venue_conflicts
+from .seating import SeatAllocationError, allocate_seats, from_bitmap, to_bitmap
+from .waitlist import enqueue, get_position
 from django.contrib.auth.password_validation import validate_password
-from rest_framework.validators import UniqueValidator
 from rest_framework_simplejwt.serializers import TokenObtainPairSerializer
 
 
+def taken_field_errors(username_taken, email_taken):
+    errors = {}
+    if username_taken:
+        errors['username'] = ["A user with that username already exists."]
+    if email_taken:
+        errors['email'] = ["This field must be unique."]
+    return errors
+
+
 class RegisterSerializer(serializers.ModelSerializer):
-    email = serializers.EmailField(
-        required=True,
-        validators=[UniqueValidator(queryset=User.objects.all())]
-    )
+    # Uniqueness of username and email is left to the database constraints,
+    # so a signup is a single INSERT instead of two lookups and an INSERT
+    email = serializers.EmailField(required=True)
     password = serializers.CharField(write_only=True, required=True, validators=[validate_password])
     role = serializers.ChoiceField(choices=User.ROLE_CHOICES, default='user')
 
     class Meta:
         model = User
         fields = ('id', 'username', 'email', 'password', 'role', 'first_name', 'last_name')
+        extra_kwargs = {'username': {'validators': [User.username_validator]}}
 
-    def create(self, validated_data):
-        user = User.objects.create(
-            username=validated_data['username'],
-            email=validated_data['email'],
-            role=validated_data['role'],
-            first_name=validated_data.get('first_name', ''),
-            last_name=validated_data.get('last_name', '')
+    def taken_errors(self, username, email):
+        taken = User.objects.filter(Q(username=username) | Q(email=email)).values_list('username', 'email')
+        return taken_field_errors(
+            any(row[0] == username for row in taken), any(row[1] == email for row in taken)
         )
-        user.set_password(validated_data['password'])
-        user.save()
-        return user
+
+    def to_internal_value(self, data):
+        try:
+            return super().to_internal_value(data)
+        except serializers.ValidationError as exc:
+            # A rejected signup also reports a taken username or email, as
+            # a unique validator would have; set-based callers such as
+            # api.provisioning check uniqueness themselves
+            if self.context.get('check_taken', True) and isinstance(exc.detail, dict):
+                fields = {name: data.get(name) for name in ('username', 'email') if name not in exc.detail}
+                if any(isinstance(value, str) and value for value in fields.values()):
+                    taken = self.taken_errors(fields.get('username'), fields.get('email'))
+                    exc.detail.update({name: errors for name, errors in taken.items() if name in fields})
+            raise
+
+    def create(self, validated_data):
+        from . import hashing
+
+        # Hash first so a saturated hashing pool does not leave a user behind
+        password = hashing.make_password(validated_data['password'])
+        # A savepoint is only needed to carry on inside an outer transaction
+        # (e.g. an atomic /api/batch/ call); on its own the INSERT is the
+        # only statement
+        in_transaction = transaction.get_connection().in_atomic_block
+        try:
+            with transaction.atomic() if in_transaction else nullcontext():
+                return User.objects.create(
+                    username=validated_data['username'],
+                    email=validated_data['email'],
+                    role=validated_data['role'],
+                    first_name=validated_data.get('first_name', ''),
+                    last_name=validated_data.get('last_name', ''),
+                    password=password
+                )
+        except IntegrityError:
+            errors = self.taken_errors(validated_data['username'], validated_data['email'])
+            if not errors:
+                raise
+            raise serializers.ValidationError(errors)
 
 
 class LoginSerializer(TokenObtainPairSerializer):
@@ -56,42 +108,181 @@ class LogoutSerializer(serializers.Serializer):
             self.fail('bad_token')
 
 
+class SparseFieldsetSerializerMixin:
+    """
+    Drops every field that is not listed in the ``selected_fields`` context
+    entry (see ``views.SparseFieldsetMixin``).
+    """
+
+    def __init__(self, *args, **kwargs):
+        super().__init__(*args, **kwargs)
+        selected = self.context.get('selected_fields')
+        if selected is not None:
+            for name in set(self.fields) - set(selected):
+                self.fields.pop(name)
+
+
 class EventSerializer(serializers.ModelSerializer):
     class Meta:
         model = Event
         fields = '__all__'
-        read_only_fields = ['created_by', 'available_tickets']
-
+        read_only_fields = ['created_by', 'available_tickets', 'status']
 
-class EventListSerializer(serializers.ModelSerializer):
+    def create(self, validated_data):
+        # The check and the insert hold the venue's lock together, so two
+        # requests cannot both find the slot free. Imports check their whole
+        # batch at once instead (see imports.py)
+        location = validated_data['location']
+        start, end = event_window(validated_data['date'], validated_data['time'], validated_data.get('duration', 120))
+        with transaction.atomic():
+            lock_venues([location])
+            if venue_conflicts(location, start, end).exists():
+                raise serializers.ValidationError({api_settings.NON_FIELD_ERRORS_KEY: [
+                    "Another event is already scheduled at this location and time."
+                ]})
+            return super().create(validated_data)
+
+
+class EventListSerializer(SparseFieldsetSerializerMixin, serializers.ModelSerializer):
     class Meta:
         model = Event
         fields = '__all__'
 
 
+class SeatSectionSerializer(serializers.ModelSerializer):
+    available_seats = serializers.SerializerMethodField()
+
+    class Meta:
+        model = SeatSection
+        fields = ['id', 'event', 'name', 'capacity', 'seats_per_row', 'available_seats']
+        read_only_fields = ['event']
+
+    def get_available_seats(self, obj):
+        return obj.capacity - from_bitmap(obj.seat_map).bit_count()
+
+    def validate(self, attrs):
+        event = self.context['event']
+        if attrs['seats_per_row'] < 1:
+            raise serializers.ValidationError("seats_per_row must be at least 1.")
+        allocated = sum(event.seat_sections.values_list('capacity', flat=True))
+        if allocated + attrs['capacity'] > event.total_tickets:
+            raise serializers.ValidationError("Sections cannot hold more seats than the event's total tickets.")
+        return attrs
+
+    def create(self, validated_data):
+        validated_data['seat_map'] = to_bitmap(0, validated_data['capacity'])
+        return super().create(validated_data)
+
+
 class BookingSerializer(serializers.ModelSerializer):
+    section = serializers.PrimaryKeyRelatedField(
+        queryset=SeatSection.objects.only('id', 'event_id'), required=False, allow_null=True
+    )
+
     class Meta:
         model = Booking
-        fields = ['id', 'user', 'event', 'number_of_tickets', 'booking_date', 'status']
-        read_only_fields = ['user', 'booking_date', 'status']
+        fields = ['id', 'user', 'event', 'number_of_tickets', 'booking_date', 'status', 'section', 'first_seat']
+        read_only_fields = ['user', 'booking_date', 'status', 'first_seat']
 
     def validate(self, attrs):
         event = attrs.get('event')
         number_of_tickets = attrs.get('number_of_tickets')
+        if event.status == 'cancelling':
+            raise serializers.ValidationError("This event is being cancelled.")
         if event.available_tickets < number_of_tickets:
             raise serializers.ValidationError("Not enough tickets available.")
+        section = attrs.get('section')
+        if section is not None and section.event_id != event.id:
+            raise serializers.ValidationError("This section does not belong to the event.")
         return attrs
 
     def create(self, validated_data):
         event = validated_data['event']
         number_of_tickets = validated_data['number_of_tickets']
-        event.available_tickets -= number_of_tickets
-        event.save()
-        booking = Booking.objects.create(**validated_data)
+        section = validated_data.get('section')
+        # The seats, the ticket count and the booking are written together, so
+        # a failure part way leaves no seats taken and no tickets missing
+        with transaction.atomic():
+            # The locked row, not the copy loaded during validation, decides
+            # whether tickets are left and whether the event sells out
+            locked = Event.objects.select_for_update().only(
+                'available_tickets', 'status', 'category', 'location', 'date'
+            ).get(id=event.id)
+            if locked.status == 'cancelling':
+                raise serializers.ValidationError("This event is being cancelled.")
+            if locked.available_tickets < number_of_tickets:
+                raise serializers.ValidationError("Not enough tickets available.")
+            if section is not None:
+                try:
+                    validated_data['first_seat'] = allocate_seats(section.id, number_of_tickets)
+                except SeatAllocationError as e:
+                    raise serializers.ValidationError(str(e))
+            Event.objects.filter(id=event.id).update(available_tickets=F('available_tickets') - number_of_tickets)
+            facets.availability_changed(locked, locked.available_tickets, locked.available_tickets - number_of_tickets)
+            event.available_tickets = locked.available_tickets - number_of_tickets
+            booking = Booking.objects.create(**validated_data)
+            stats.booked(event.id, number_of_tickets)
+            audit.booking_changed([booking], 'booked')
         return booking
 
 
-class BookingDetailSerializer(serializers.ModelSerializer):
+class BookingItemSerializer(serializers.Serializer):
+    event = serializers.IntegerField(min_value=1)
+    number_of_tickets = serializers.IntegerField(min_value=1)
+
+
+class BulkBookingSerializer(serializers.Serializer):
+    """
+    Books tickets for several events at once. Either every booking is made or
+    none is, and the number of queries does not depend on the number of items.
+    """
+    items = BookingItemSerializer(many=True, allow_empty=False)
+
+    def create(self, validated_data):
+        items = validated_data['items']
+        requested = {}
+        for item in items:
+            requested[item['event']] = requested.get(item['event'], 0) + item['number_of_tickets']
+
+        with transaction.atomic():
+            # Lock in primary key order so concurrent bulk bookings cannot deadlock
+            events = {
+                event.id: event
+                for event in Event.objects.select_for_update().filter(id__in=requested).order_by('id')
+            }
+            missing = sorted(set(requested) - set(events))
+            if missing:
+                raise serializers.ValidationError({'items': [f"Event {event_id} does not exist." for event_id in missing]})
+            closed = sorted(event_id for event_id, event in events.items() if event.status == 'cancelling')
+            if closed:
+                raise serializers.ValidationError({'items': [f"Event {event_id} is being cancelled." for event_id in closed]})
+            short = [event_id for event_id, tickets in requested.items() if events[event_id].available_tickets < tickets]
+            if short:
+                raise serializers.ValidationError(
+                    {'items': [f"Not enough tickets available for event {event_id}." for event_id in sorted(short)]}
+                )
+
+            Event.objects.filter(id__in=requested).update(available_tickets=Case(
+                *[When(id=event_id, then=F('available_tickets') - tickets) for event_id, tickets in requested.items()]
+            ))
+            facets.availability_changed_many(
+                (events[event_id], events[event_id].available_tickets, events[event_id].available_tickets - tickets)
+                for event_id, tickets in requested.items()
+            )
+            stats.booked_many(requested)
+            bookings = Booking.objects.bulk_create([
+                Booking(
+                    user=validated_data['user'],
+                    event=events[item['event']],
+                    number_of_tickets=item['number_of_tickets']
+                )
+                for item in items
+            ])
+            audit.booking_changed(bookings, 'booked')
+        return bookings
+
+
+class BookingDetailSerializer(SparseFieldsetSerializerMixin, serializers.ModelSerializer):
     event = EventListSerializer(read_only=True)
 
     class Meta:
@@ -99,7 +290,41 @@ class BookingDetailSerializer(serializers.ModelSerializer):
         fields = ['id', 'event', 'number_of_tickets', 'booking_date', 'status']
 
 
+class WaitlistEntrySerializer(serializers.ModelSerializer):
+    position = serializers.SerializerMethodField()
+
+    class Meta:
+        model = WaitlistEntry
+        fields = ['id', 'event', 'number_of_tickets', 'created_at', 'status', 'booking', 'position']
+        read_only_fields = ['created_at', 'status', 'booking']
+
+    def get_position(self, obj):
+        return get_position(obj) if obj.status == 'waiting' else None
+
+    def validate(self, attrs):
+        event = attrs.get('event')
+        if event.status == 'cancelling':
+            raise serializers.ValidationError("This event is being cancelled.")
+        if event.available_tickets >= attrs.get('number_of_tickets'):
+            raise serializers.ValidationError("Tickets are available, book them directly.")
+        user = self.context['request'].user
+        if WaitlistEntry.objects.filter(event=event, user=user, status='waiting').exists():
+            raise serializers.ValidationError("Already on the waitlist for this event.")
+        return attrs
+
+    def create(self, validated_data):
+        # The check in validate() is only a fast path; a concurrent join is
+        # caught by the waitlist_one_waiting_entry constraint
+        try:
+            return enqueue(validated_data['event'].id, [WaitlistEntry(**validated_data)])[0]
+        except IntegrityError:
+            raise serializers.ValidationError("Already on the waitlist for this event.")
+
+
 class PaymentSerializer(serializers.ModelSerializer):
+    # Loads the payment with the booking so the duplicate check below is free
+    booking = serializers.PrimaryKeyRelatedField(queryset=Booking.objects.select_related('payment'))
+
     class Meta:
         model = Payment
         fields = ['id', 'booking', 'payment_method', 'amount', 'payment_date', 'status']
@@ -114,10 +339,35 @@ class PaymentSerializer(serializers.ModelSerializer):
         return attrs
 
     def create(self, validated_data):
-        payment = Payment.objects.create(**validated_data)
+        with transaction.atomic():
+            payment = Payment.objects.create(**validated_data)
+            stats.paid(payment.booking.event_id, payment.amount)
+            audit.payment_changed([(payment.id, payment.booking)], 'completed')
         return payment
 
 
+class EventSalesStatsSerializer(serializers.ModelSerializer):
+    event_title = serializers.CharField(source='event.title', read_only=True)
+
+    class Meta:
+        model = EventSalesStats
+        fields = ['event', 'event_title', 'tickets_sold', 'revenue', 'cancellations', 'refunded_amount']
+
+
+class JobSerializer(serializers.ModelSerializer):
+    class Meta:
+        model = Job
+        fields = ['id', 'kind', 'status', 'processed', 'total', 'error', 'created_at', 'updated_at']
+
+
+class AuditEventSerializer(serializers.ModelSerializer):
+    class Meta:
+        model = AuditEvent
+        fields = [
+            'id', 'entity', 'entity_id', 'from_status', 'to_status', 'booking_id', 'event_id', 'user_id', 'created_at'
+        ]
+
+
 class RevertPaymentSerializer(serializers.Serializer):
     booking_id = serializers.IntegerField()
     reason = serializers.CharField()
@@ -133,21 +383,27 @@ class RevertPaymentSerializer(serializers.Serializer):
         booking = self.validated_data['booking_id']
         reason = self.validated_data['reason']
 
-        if not hasattr(booking, 'payment'):
-            raise serializers.ValidationError("No payment found for this booking.")
+        try:
+            lifecycle.revert_payment(booking.id)
+        except lifecycle.BookingLifecycleError as e:
+            raise serializers.ValidationError({'non_field_errors': [str(e)]})
 
-        payment = booking.payment
-        payment.status = 'reverted'
-        payment.save()
+        # Send Email Notification (optional)
+        # Implement email sending here
 
-        # Update booking status
-        booking.status = 'cancelled'
-        booking.save()
 
-        # Update available tickets
-        event = booking.event
-        event.available_tickets += booking.number_of_tickets
-        event.save()
+class BatchItemSerializer(serializers.Serializer):
+    method = serializers.ChoiceField(choices=['GET', 'HEAD', 'POST', 'PUT', 'PATCH', 'DELETE'])
+    path = serializers.CharField()
+    body = serializers.JSONField(required=False, allow_null=True)
+    headers = serializers.DictField(child=serializers.CharField(), required=False)
 
-        # Send Email Notification (optional)
-        # Implement email sending here
+
+class BatchSerializer(serializers.Serializer):
+    requests = BatchItemSerializer(many=True, allow_empty=False)
+    atomic = serializers.BooleanField(default=False)
+
+    def validate_requests(self, value):
+        if len(value) > settings.BATCH_MAX_REQUESTS:
+            raise serializers.ValidationError(f"A batch can contain at most {settings.BATCH_MAX_REQUESTS} requests.")
+        return value
@@ -0,0 +1,64 @@
+"""
+The per-partition join of ``api.reconciliation``, run in worker processes.
+
+This module must not import Django: under the spawn and forkserver start
+methods each worker imports it in a fresh interpreter where the app
+registry is not set up.
+"""
+import csv
+from collections import Counter
+from decimal import Decimal, InvalidOperation
+
+# Payment status -> settlement status it should have
+EXPECTED_SETTLEMENT_STATUS = {'completed': 'settled', 'reverted': 'refunded'}
+
+
+def _same_amount(amount, settled_amount):
+    try:
+        return Decimal(amount) == Decimal(settled_amount)
+    except InvalidOperation:
+        return False
+
+
+def join_partition(payments_path, settlements_path, report_path):
+    """
+    Hash-joins one partition and writes its discrepancies. Returns the
+    number of rows per issue, plus ``matched``.
+    """
+    settlements, duplicates = {}, []
+    with open(settlements_path, newline='') as f:
+        for booking_id, amount, status in csv.reader(f):
+            if booking_id in settlements:
+                # The first row is matched against the payment, later ones
+                # are charges the customer should not have paid
+                duplicates.append((booking_id, amount, status))
+            else:
+                settlements[booking_id] = (amount, status)
+
+    issues = Counter()
+    with open(payments_path, newline='') as payments, open(report_path, 'w', newline='') as report:
+        writer = csv.writer(report)
+        for booking_id, amount, status in duplicates:
+            issues['duplicate_settlement'] += 1
+            writer.writerow((booking_id, 'duplicate_settlement', '', '', '', '', amount, status))
+        for booking_id, payment_id, amount, status, booking_status in csv.reader(payments):
+            settled = settlements.pop(booking_id, None)
+            if settled is None:
+                issue = 'missing_settlement'
+                settled = ('', '')
+            elif not _same_amount(amount, settled[0]):
+                issue = 'amount_mismatch'
+            elif EXPECTED_SETTLEMENT_STATUS.get(status) != settled[1]:
+                issue = 'status_mismatch'
+            elif status == 'completed' and booking_status == 'cancelled':
+                issue = 'cancelled_booking_charged'
+            else:
+                issues['matched'] += 1
+                continue
+            issues[issue] += 1
+            writer.writerow((booking_id, issue, payment_id, amount, status, booking_status, *settled))
+        # Whatever is left was settled without a payment on our side
+        for booking_id, (amount, status) in settlements.items():
+            issues['missing_payment'] += 1
+            writer.writerow((booking_id, 'missing_payment', '', '', '', '', amount, status))
+    return issues
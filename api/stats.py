@@ -0,0 +1,117 @@
+from decimal import Decimal
+
+from django.db import IntegrityError, transaction
+from django.db.models import Case, Count, F, Q, Sum, When
+
+from .models import Booking, Event, EventSalesStats, Payment
+
+STAT_FIELDS = ('tickets_sold', 'revenue', 'cancellations', 'refunded_amount')
+
+
+def _adjust(event_id, **deltas):
+    deltas = {name: delta for name, delta in deltas.items() if delta}
+    if not deltas:
+        return
+    stats = EventSalesStats.objects.filter(event_id=event_id)
+    if stats.update(**{name: F(name) + delta for name, delta in deltas.items()}):
+        return
+    try:
+        with transaction.atomic():
+            EventSalesStats.objects.create(event_id=event_id, **deltas)
+    except IntegrityError:
+        # Created concurrently by another request
+        stats.update(**{name: F(name) + delta for name, delta in deltas.items()})
+
+
+def _money(value):
+    return Decimal(str(value or 0)).quantize(Decimal('0.01'))
+
+
+def booked(event_id, number_of_tickets):
+    _adjust(event_id, tickets_sold=number_of_tickets)
+
+
+def booked_many(tickets_by_event):
+    """
+    Same as ``booked`` for several events, in a constant number of queries.
+    """
+    EventSalesStats.objects.bulk_create(
+        [EventSalesStats(event_id=event_id) for event_id in tickets_by_event], ignore_conflicts=True
+    )
+    EventSalesStats.objects.filter(event_id__in=tickets_by_event).update(tickets_sold=Case(
+        *[When(event_id=event_id, then=F('tickets_sold') + tickets) for event_id, tickets in tickets_by_event.items()]
+    ))
+
+
+def paid(event_id, amount):
+    _adjust(event_id, revenue=_money(amount))
+
+
+def cancelled(event_id, number_of_tickets, refunded=None, bookings=1):
+    """
+    Records cancelled bookings, and the refund of their payments if they had
+    any. ``number_of_tickets`` and ``refunded`` are totals over ``bookings``.
+    """
+    refunded = _money(refunded)
+    _adjust(
+        event_id, tickets_sold=-number_of_tickets, cancellations=bookings, revenue=-refunded, refunded_amount=refunded
+    )
+
+
+def live_stats(event_ids=None):
+    """
+    Recomputes the figures from the bookings and payments tables.
+    """
+    bookings = Booking.objects.all()
+    payments = Payment.objects.all()
+    if event_ids is not None:
+        bookings = bookings.filter(event_id__in=event_ids)
+        payments = payments.filter(booking__event_id__in=event_ids)
+
+    figures = {}
+    for row in bookings.values('event_id').annotate(
+        tickets_sold=Sum('number_of_tickets', filter=Q(status='booked')),
+        cancellations=Count('id', filter=Q(status='cancelled')),
+    ):
+        figures[row['event_id']] = {
+            'tickets_sold': row['tickets_sold'] or 0,
+            'revenue': Decimal('0.00'),
+            'cancellations': row['cancellations'],
+            'refunded_amount': Decimal('0.00'),
+        }
+    for row in payments.values('booking__event_id').annotate(
+        revenue=Sum('amount', filter=Q(status='completed')),
+        refunded_amount=Sum('amount', filter=Q(status='reverted')),
+    ):
+        stats = figures[row['booking__event_id']]
+        stats['revenue'] = row['revenue'] or Decimal('0.00')
+        stats['refunded_amount'] = row['refunded_amount'] or Decimal('0.00')
+    return figures
+
+
+def stored_stats(event_ids=None):
+    stats = EventSalesStats.objects.all()
+    if event_ids is not None:
+        stats = stats.filter(event_id__in=event_ids)
+    return {row['event_id']: {name: row[name] for name in STAT_FIELDS} for row in stats.values('event_id', *STAT_FIELDS)}
+
+
+def rebuild(batch_size=1000):
+    """
+    Replaces every stats row with figures recomputed from the raw tables, one
+    batch of events at a time.
+    """
+    event_ids = list(Event.objects.order_by('id').values_list('id', flat=True))
+    for start in range(0, len(event_ids), batch_size):
+        batch = event_ids[start:start + batch_size]
+        with transaction.atomic():
+            # Bookings and cancellations lock their event and payments update
+            # the stats row, so holding both keeps the figures current until
+            # they are written
+            list(Event.objects.select_for_update().filter(id__in=batch).values_list('id', flat=True))
+            list(EventSalesStats.objects.select_for_update().filter(event_id__in=batch).values_list('pk', flat=True))
+            figures = live_stats(batch)
+            EventSalesStats.objects.filter(event_id__in=batch).delete()
+            EventSalesStats.objects.bulk_create([
+                EventSalesStats(event_id=event_id, **stats) for event_id, stats in figures.items()
+            ])
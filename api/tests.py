@@ -1,14 +1,66 @@
+import gzip
+import io
+import csv
+import difflib
+import functools
+import json
+import multiprocessing
+import os
+import re
+import subprocess
+import tempfile
+import sys
+import threading
+import time as timer
+from concurrent.futures import ProcessPoolExecutor
+from datetime import date, time
+from decimal import Decimal
+from unittest import mock, skipUnless
+
 from django.urls import reverse
-from rest_framework import status
+from rest_framework import generics, status
+from rest_framework.pagination import LimitOffsetPagination
+from rest_framework.exceptions import ParseError, ValidationError
 from rest_framework.test import APITestCase
-from .models import User, Event, Booking, Payment
+from .middleware import parse_accept_encoding
+from .idempotency import purge_expired_keys
+from .imports import read_csv_rows
+from . import audit, batch, facets, hashing, jobs, lifecycle, stats, throttling, waitlist
+from .archive import archive_batch, archive_past_events
+from .models import User, Event, Booking, Payment, IdempotencyKey, WaitlistEntry, SeatSection, EventFacetCount, \
+    EventSalesStats, ArchivedEvent, ArchivedBooking, ArchivedEventSalesStats, ArchivedPayment, Job, AuditEvent, VenueLock
+from .reconciliation import reconcile, write_settlement_file
+from .renderers import FastJSONParser, FastJSONRenderer
+from .scheduling import VenueSchedule, venue_conflicts
+from .serializers import BookingSerializer
+from .views import EventListView, ExportView, IncludeArchivedMixin
+from .seating import block_mask, find_adjacent, from_bitmap, to_bitmap
+from rest_framework_simplejwt.authentication import JWTAuthentication
 from rest_framework_simplejwt.tokens import RefreshToken
 from django.utils import timezone
 from datetime import timedelta
+from django.contrib.auth import authenticate
 from django.core import mail
+from django.core.management import call_command
+from django.core.management.base import CommandError
+from django.core.files.uploadedfile import SimpleUploadedFile
+from django.db import DatabaseError, IntegrityError, connection, transaction
+from django.db.models import F
+from django.conf import settings
+from django.test import SimpleTestCase, override_settings
+from django.test.utils import CaptureQueriesContext
+from django.contrib import admin
+from django.utils.module_loading import import_string
 
+# Audit events are written by the request that fills the buffer, on the
+# test database connection
+@override_settings(AUDIT_FLUSH_IN_BACKGROUND=False)
 class APITestSetup(APITestCase):
     def setUp(self):
+        # Rate limit buckets and audit events live in memory across tests
+        throttling.get_store().clear()
+        self.addCleanup(audit.reset)
+
         # Create a regular user
         self.user = User.objects.create_user(
             username='user1',
@@ -480,11 +532,12 @@ class EventCancellationTests(APITestSetup):
         url = reverse('cancel-event', kwargs={'event_id': self.event.id})
         self.client.credentials(HTTP_AUTHORIZATION='Bearer ' + self.manager_tokens['access'])
         response = self.client.post(url, format='json')
-        self.assertEqual(response.status_code, status.HTTP_200_OK)
+        self.assertEqual(response.status_code, status.HTTP_202_ACCEPTED)
+        with self.captureOnCommitCallbacks(execute=True):
+            jobs.run_pending()
         self.assertFalse(Event.objects.filter(id=self.event.id).exists())
-        self.booking1.refresh_from_db()
-        self.assertEqual(self.booking1.status, 'cancelled')
-        self.assertEqual(self.event.available_tickets, 100)  # Assuming event is deleted
+        self.assertEqual(Job.objects.get(id=response.data['job_id']).status, 'done')
+        self.assertEqual(len(mail.outbox), 1)
     
     def test_cancel_event_by_non_manager(self):
         url = reverse('cancel-event', kwargs={'event_id': self.event.id})
@@ -496,4 +549,2031 @@ class EventCancellationTests(APITestSetup):
         url = reverse('cancel-event', kwargs={'event_id': 999})  # Assuming this ID doesn't exist
         self.client.credentials(HTTP_AUTHORIZATION='Bearer ' + self.manager_tokens['access'])
         response = self.client.post(url, format='json')
-        self.assertEqual(response.status_code, status.HTTP_404_NOT_FOUND)
\ No newline at end of file
+        self.assertEqual(response.status_code, status.HTTP_404_NOT_FOUND)
+
+class SparseFieldsetTests(APITestSetup):
+    def setUp(self):
+        super().setUp()
+        Booking.objects.create(
+            user=self.user,
+            event=self.event,
+            number_of_tickets=2,
+            status='booked'
+        )
+
+    def test_event_list_fields(self):
+        url = reverse('event-list') + '?fields=id,title,date,available_tickets'
+        response = self.client.get(url, format='json')
+        self.assertEqual(response.status_code, status.HTTP_200_OK)
+        self.assertEqual(set(response.data[0]), {'id', 'title', 'date', 'available_tickets'})
+
+    def test_event_list_omit(self):
+        url = reverse('event-list') + '?omit=description,payment_options'
+        response = self.client.get(url, format='json')
+        self.assertEqual(response.status_code, status.HTTP_200_OK)
+        self.assertNotIn('description', response.data[0])
+        self.assertNotIn('payment_options', response.data[0])
+        self.assertIn('title', response.data[0])
+
+    def test_event_list_unknown_field(self):
+        url = reverse('event-list') + '?fields=id,secret'
+        response = self.client.get(url, format='json')
+        self.assertEqual(response.status_code, status.HTTP_400_BAD_REQUEST)
+
+    def test_event_list_trims_sql_columns(self):
+        url = reverse('event-list') + '?fields=id,title'
+        with CaptureQueriesContext(connection) as queries:
+            response = self.client.get(url, format='json')
+        self.assertEqual(response.status_code, status.HTTP_200_OK)
+        self.assertEqual(len(queries), 1)
+        self.assertNotIn('description', queries[0]['sql'])
+
+    def test_my_bookings_fields(self):
+        url = reverse('my-bookings') + '?fields=id,event'
+        self.client.credentials(HTTP_AUTHORIZATION='Bearer ' + self.user_tokens['access'])
+        with CaptureQueriesContext(connection) as queries:
+            response = self.client.get(url, format='json')
+        self.assertEqual(response.status_code, status.HTTP_200_OK)
+        self.assertEqual(set(response.data[0]), {'id', 'event'})
+        self.assertEqual(response.data[0]['event']['title'], "Concert")
+        # One query for the user, one for the bookings joined with their events
+        self.assertEqual(len(queries), 2)
+
+class RenderingAndCompressionTests(APITestSetup):
+    def test_fast_renderer_handles_decimal_date_time_and_duration(self):
+        data = {
+            'amount': Decimal('100.10'),
+            'date': date(2025, 1, 2),
+            'time': time(18, 30),
+            'duration': timedelta(minutes=90),
+        }
+        rendered = FastJSONRenderer().render(data)
+        self.assertEqual(
+            json.loads(rendered),
+            {'amount': '100.10', 'date': '2025-01-02', 'time': '18:30:00', 'duration': '5400.0'}
+        )
+
+    def test_fast_parser_rejects_invalid_json(self):
+        with self.assertRaises(ParseError):
+            FastJSONParser().parse(io.BytesIO(b'{"broken":'))
+
+    def test_event_list_is_gzipped(self):
+        Event.objects.bulk_create([
+            Event(
+                title=f"Concert {index}",
+                description="Live music concert",
+                date=self.event.date,
+                time=self.event.time,
+                location="Stadium",
+                category="music",
+                payment_options="Credit Card, PayPal",
+                created_by=self.manager,
+                starts_at=self.event.starts_at,
+                ends_at=self.event.ends_at
+            )
+            for index in range(20)
+        ])
+        url = reverse('event-list')
+        response = self.client.get(url, HTTP_ACCEPT_ENCODING='gzip')
+        self.assertEqual(response.status_code, status.HTTP_200_OK)
+        self.assertEqual(response['Content-Encoding'], 'gzip')
+        self.assertEqual(json.loads(gzip.decompress(response.content))[0]['title'], "Concert")
+
+    def test_small_response_is_not_compressed(self):
+        url = reverse('event-list')
+        response = self.client.get(url, HTTP_ACCEPT_ENCODING='gzip')
+        self.assertEqual(response.status_code, status.HTTP_200_OK)
+        self.assertFalse(response.has_header('Content-Encoding'))
+
+    def test_parse_accept_encoding(self):
+        self.assertEqual(parse_accept_encoding('gzip;q=0.5, br, identity;q=0'), {'gzip': 0.5, 'br': 1.0, 'identity': 0.0})
+
+class ExportTests(APITestSetup):
+    def setUp(self):
+        super().setUp()
+        self.booking = Booking.objects.create(
+            user=self.user,
+            event=self.event,
+            number_of_tickets=2,
+            status='booked'
+        )
+        Payment.objects.create(
+            booking=self.booking,
+            payment_method="Credit Card",
+            amount=Decimal('49.90'),
+            status='completed'
+        )
+        other_manager = User.objects.create_user(
+            username='manager2',
+            email='manager2@example.com',
+            password='password123',
+            role='event_manager'
+        )
+        Event.objects.create(
+            title="Other Concert",
+            description="Not ours",
+            date=self.event.date,
+            time=self.event.time,
+            location="Arena",
+            category="music",
+            payment_options="Credit Card",
+            created_by=other_manager
+        )
+
+    def test_export_events_ndjson(self):
+        url = reverse('export-events')
+        self.client.credentials(HTTP_AUTHORIZATION='Bearer ' + self.manager_tokens['access'])
+        response = self.client.get(url)
+        self.assertEqual(response.status_code, status.HTTP_200_OK)
+        self.assertTrue(response.streaming)
+        rows = [json.loads(line) for line in b''.join(response.streaming_content).splitlines()]
+        self.assertEqual(len(rows), 1)
+        self.assertEqual(rows[0]['title'], "Concert")
+
+    def test_export_bookings_csv(self):
+        url = reverse('export-bookings') + '?export_format=csv'
+        self.client.credentials(HTTP_AUTHORIZATION='Bearer ' + self.manager_tokens['access'])
+        response = self.client.get(url)
+        self.assertEqual(response.status_code, status.HTTP_200_OK)
+        self.assertEqual(response['Content-Type'], 'text/csv')
+        lines = b''.join(response.streaming_content).decode().splitlines()
+        self.assertEqual(len(lines), 2)
+        self.assertIn('49.90', lines[1])
+
+    def test_export_invalid_format(self):
+        url = reverse('export-events') + '?export_format=xml'
+        self.client.credentials(HTTP_AUTHORIZATION='Bearer ' + self.manager_tokens['access'])
+        response = self.client.get(url)
+        self.assertEqual(response.status_code, status.HTTP_400_BAD_REQUEST)
+
+    def test_export_by_non_manager(self):
+        url = reverse('export-events')
+        self.client.credentials(HTTP_AUTHORIZATION='Bearer ' + self.user_tokens['access'])
+        response = self.client.get(url)
+        self.assertEqual(response.status_code, status.HTTP_403_FORBIDDEN)
+
+    def test_export_queryset_is_required(self):
+        with self.assertRaises(TypeError):
+            type('NoQueryset', (ExportView,), {})
+
+class EventImportTests(APITestSetup):
+    def event_row(self, **overrides):
+        row = {
+            "title": "Matinee",
+            "description": "Afternoon show",
+            "date": (timezone.now().date() + timedelta(days=30)).isoformat(),
+            "time": "14:00",
+            "location": "Theatre Hall",
+            "category": "theatre",
+            "payment_options": "Credit Card",
+            "total_tickets": 40
+        }
+        row.update(overrides)
+        return row
+
+    def test_import_json_with_row_errors(self):
+        url = reverse('import-events')
+        data = [self.event_row(), self.event_row(category="unknown"), self.event_row(title="Evening", time="19:00")]
+        self.client.credentials(HTTP_AUTHORIZATION='Bearer ' + self.manager_tokens['access'])
+        response = self.client.post(url, data, format='json')
+        self.assertEqual(response.status_code, status.HTTP_201_CREATED)
+        self.assertEqual(response.data['created'], 2)
+        self.assertEqual(response.data['errors'][0]['row'], 1)
+        self.assertIn('category', response.data['errors'][0]['errors'])
+        event = Event.objects.get(title="Evening")
+        self.assertEqual(event.created_by, self.manager)
+        self.assertEqual(event.available_tickets, 40)
+
+    def test_import_csv(self):
+        url = reverse('import-events')
+        row = self.event_row()
+        content = ','.join(row) + '\n' + ','.join(f'"{value}"' for value in row.values()) + '\n'
+        upload = SimpleUploadedFile('events.csv', content.encode(), content_type='text/csv')
+        self.client.credentials(HTTP_AUTHORIZATION='Bearer ' + self.manager_tokens['access'])
+        response = self.client.post(url, {'file': upload}, format='multipart')
+        self.assertEqual(response.status_code, status.HTTP_201_CREATED)
+        self.assertEqual(response.data['created'], 1)
+        self.assertTrue(Event.objects.filter(title="Matinee").exists())
+
+    def test_import_csv_over_row_limit(self):
+        url = reverse('import-events')
+        row = self.event_row()
+        content = ','.join(row) + '\n' + (','.join(f'"{value}"' for value in row.values()) + '\n') * 5
+        upload = SimpleUploadedFile('events.csv', content.encode(), content_type='text/csv')
+        self.client.credentials(HTTP_AUTHORIZATION='Bearer ' + self.manager_tokens['access'])
+        with mock.patch('api.imports.IMPORT_MAX_ROWS', 2):
+            response = self.client.post(url, {'file': upload}, format='multipart')
+        self.assertEqual(response.status_code, status.HTTP_400_BAD_REQUEST)
+        self.assertEqual(Event.objects.count(), 1)
+        self.assertEqual(len(read_csv_rows(io.BytesIO(content.encode()), 2)), 3)
+
+    def test_import_all_invalid(self):
+        url = reverse('import-events')
+        self.client.credentials(HTTP_AUTHORIZATION='Bearer ' + self.manager_tokens['access'])
+        response = self.client.post(url, [self.event_row(date="not-a-date")], format='json')
+        self.assertEqual(response.status_code, status.HTTP_400_BAD_REQUEST)
+        self.assertEqual(Event.objects.count(), 1)
+
+    def test_import_by_non_manager(self):
+        url = reverse('import-events')
+        self.client.credentials(HTTP_AUTHORIZATION='Bearer ' + self.user_tokens['access'])
+        response = self.client.post(url, [self.event_row()], format='json')
+        self.assertEqual(response.status_code, status.HTTP_403_FORBIDDEN)
+
+class BulkBookingTests(APITestSetup):
+    def setUp(self):
+        super().setUp()
+        self.other_event = Event.objects.create(
+            title="Festival Day 2",
+            description="Second day",
+            date=self.event.date,
+            time=self.event.time,
+            location="City Park",
+            category="music",
+            payment_options="Credit Card",
+            created_by=self.manager,
+            total_tickets=10,
+            available_tickets=10
+        )
+        self.client.credentials(HTTP_AUTHORIZATION='Bearer ' + self.user_tokens['access'])
+
+    def test_bulk_booking_success(self):
+        url = reverse('book-tickets')
+        data = {"items": [
+            {"event": self.other_event.id, "number_of_tickets": 4},
+            {"event": self.event.id, "number_of_tickets": 2},
+        ]}
+        response = self.client.post(url, data, format='json')
+        self.assertEqual(response.status_code, status.HTTP_201_CREATED)
+        self.assertEqual(len(response.data), 2)
+        self.assertEqual(Booking.objects.filter(user=self.user).count(), 2)
+        self.event.refresh_from_db()
+        self.other_event.refresh_from_db()
+        self.assertEqual(self.event.available_tickets, 98)
+        self.assertEqual(self.other_event.available_tickets, 6)
+        self.assertEqual(EventSalesStats.objects.get(event=self.other_event).tickets_sold, 4)
+
+    def test_bulk_booking_is_all_or_nothing(self):
+        url = reverse('book-tickets')
+        data = {"items": [
+            {"event": self.event.id, "number_of_tickets": 2},
+            {"event": self.other_event.id, "number_of_tickets": 11},
+        ]}
+        response = self.client.post(url, data, format='json')
+        self.assertEqual(response.status_code, status.HTTP_400_BAD_REQUEST)
+        self.assertEqual(Booking.objects.count(), 0)
+        self.event.refresh_from_db()
+        self.assertEqual(self.event.available_tickets, 100)
+
+    def test_bulk_booking_unknown_event(self):
+        url = reverse('book-tickets')
+        response = self.client.post(url, {"items": [{"event": 999, "number_of_tickets": 1}]}, format='json')
+        self.assertEqual(response.status_code, status.HTTP_400_BAD_REQUEST)
+        self.assertIn('items', response.data)
+
+    def test_bulk_booking_query_count_is_constant(self):
+        url = reverse('book-tickets')
+        events = Event.objects.bulk_create([
+            Event(
+                title=f"Day {index}",
+                description="Festival day",
+                date=self.event.date,
+                time=self.event.time,
+                location="City Park",
+                category="music",
+                payment_options="Credit Card",
+                created_by=self.manager,
+                starts_at=self.event.starts_at,
+                ends_at=self.event.ends_at
+            )
+            for index in range(20)
+        ])
+        small = {"items": [{"event": self.event.id, "number_of_tickets": 1}]}
+        large = {"items": [{"event": event.id, "number_of_tickets": 1} for event in events]}
+        with CaptureQueriesContext(connection) as small_queries:
+            self.client.post(url, small, format='json')
+        with CaptureQueriesContext(connection) as large_queries:
+            response = self.client.post(url, large, format='json')
+        self.assertEqual(response.status_code, status.HTTP_201_CREATED)
+        self.assertEqual(len(small_queries), len(large_queries))
+
+class IdempotencyTests(APITestSetup):
+    def setUp(self):
+        super().setUp()
+        self.client.credentials(HTTP_AUTHORIZATION='Bearer ' + self.user_tokens['access'])
+
+    def test_retried_booking_is_replayed(self):
+        url = reverse('book-ticket')
+        data = {"event": self.event.id, "number_of_tickets": 2}
+        first = self.client.post(url, data, format='json', HTTP_IDEMPOTENCY_KEY='abc')
+        second = self.client.post(url, data, format='json', HTTP_IDEMPOTENCY_KEY='abc')
+        self.assertEqual(first.status_code, status.HTTP_201_CREATED)
+        self.assertEqual(second.status_code, status.HTTP_201_CREATED)
+        self.assertEqual(second['Idempotent-Replayed'], 'true')
+        self.assertEqual(second.data['id'], first.data['id'])
+        self.assertEqual(Booking.objects.count(), 1)
+        self.event.refresh_from_db()
+        self.assertEqual(self.event.available_tickets, 98)
+
+    def test_key_reused_with_different_payload(self):
+        url = reverse('book-ticket')
+        self.client.post(url, {"event": self.event.id, "number_of_tickets": 2}, format='json', HTTP_IDEMPOTENCY_KEY='abc')
+        response = self.client.post(url, {"event": self.event.id, "number_of_tickets": 3}, format='json',
+                                    HTTP_IDEMPOTENCY_KEY='abc')
+        self.assertEqual(response.status_code, status.HTTP_422_UNPROCESSABLE_ENTITY)
+        self.assertEqual(Booking.objects.count(), 1)
+
+    def test_in_flight_duplicate_conflicts(self):
+        url = reverse('book-ticket')
+        data = {"event": self.event.id, "number_of_tickets": 2}
+        first = self.client.post(url, data, format='json', HTTP_IDEMPOTENCY_KEY='abc')
+        IdempotencyKey.objects.update(status_code=None, response_body=None)
+        response = self.client.post(url, data, format='json', HTTP_IDEMPOTENCY_KEY='abc')
+        self.assertEqual(first.status_code, status.HTTP_201_CREATED)
+        self.assertEqual(response.status_code, status.HTTP_409_CONFLICT)
+        self.assertEqual(response['Retry-After'], '1')
+
+    def test_abandoned_and_expired_keys_are_taken_over(self):
+        url = reverse('book-ticket')
+        data = {"event": self.event.id, "number_of_tickets": 2}
+        self.client.post(url, data, format='json', HTTP_IDEMPOTENCY_KEY='abc')
+        # The worker died before storing the response
+        IdempotencyKey.objects.update(status_code=None, response_body=None,
+                                      created_at=timezone.now() - timedelta(minutes=10))
+        response = self.client.post(url, data, format='json', HTTP_IDEMPOTENCY_KEY='abc')
+        self.assertEqual(response.status_code, status.HTTP_201_CREATED)
+        self.assertFalse(response.has_header('Idempotent-Replayed'))
+        self.assertEqual(IdempotencyKey.objects.get().status_code, 201)
+
+        IdempotencyKey.objects.update(created_at=timezone.now() - timedelta(days=2))
+        response = self.client.post(url, {"event": self.event.id, "number_of_tickets": 1}, format='json',
+                                    HTTP_IDEMPOTENCY_KEY='abc')
+        self.assertEqual(response.status_code, status.HTTP_201_CREATED)
+        self.assertEqual(Booking.objects.count(), 3)
+
+    def test_expired_keys_are_purged(self):
+        url = reverse('book-ticket')
+        self.client.post(url, {"event": self.event.id, "number_of_tickets": 1}, format='json', HTTP_IDEMPOTENCY_KEY='abc')
+        IdempotencyKey.objects.update(created_at=timezone.now() - timedelta(days=2))
+        self.assertEqual(purge_expired_keys(), 1)
+        self.assertFalse(IdempotencyKey.objects.exists())
+
+class WaitlistTests(APITestSetup):
+    def setUp(self):
+        super().setUp()
+        self.booking = Booking.objects.create(
+            user=self.user,
+            event=self.event,
+            number_of_tickets=100,
+            status='booked'
+        )
+        self.event.available_tickets = 0
+        self.event.save()
+        self.waiting_users = [
+            User.objects.create_user(
+                username=f'waiting{index}',
+                email=f'waiting{index}@example.com',
+                password='password123'
+            )
+            for index in range(3)
+        ]
+
+    def join(self, user, number_of_tickets):
+        url = reverse('join-waitlist')
+        self.client.credentials(HTTP_AUTHORIZATION='Bearer ' + self.get_tokens_for_user(user)['access'])
+        return self.client.post(url, {"event": self.event.id, "number_of_tickets": number_of_tickets}, format='json')
+
+    def test_join_reports_position(self):
+        self.join(self.waiting_users[0], 2)
+        response = self.join(self.waiting_users[1], 2)
+        self.assertEqual(response.status_code, status.HTTP_201_CREATED)
+        self.assertEqual(response.data['position'], 2)
+
+    def test_one_waiting_entry_per_user(self):
+        self.join(self.waiting_users[0], 2)
+        with self.assertRaises(IntegrityError), transaction.atomic():
+            WaitlistEntry.objects.create(user=self.waiting_users[0], event=self.event, number_of_tickets=1, sequence=2)
+        # A duplicate that slips past the validation check is still rejected
+        with mock.patch('api.serializers.WaitlistEntry.objects.filter') as lookup:
+            lookup.return_value.exists.return_value = False
+            response = self.join(self.waiting_users[0], 2)
+        self.assertEqual(response.status_code, status.HTTP_400_BAD_REQUEST)
+        WaitlistEntry.objects.filter(user=self.waiting_users[0]).update(status='left')
+        self.assertEqual(self.join(self.waiting_users[0], 2).status_code, status.HTTP_201_CREATED)
+
+    def test_join_when_tickets_available(self):
+        self.event.available_tickets = 10
+        self.event.save()
+        response = self.join(self.waiting_users[0], 2)
+        self.assertEqual(response.status_code, status.HTTP_400_BAD_REQUEST)
+
+    def test_cancellation_promotes_in_fifo_order(self):
+        self.join(self.waiting_users[0], 60)
+        self.join(self.waiting_users[1], 50)
+        self.join(self.waiting_users[2], 10)
+
+        url = reverse('cancel-booking', kwargs={'booking_id': self.booking.id})
+        self.client.credentials(HTTP_AUTHORIZATION='Bearer ' + self.user_tokens['access'])
+        response = self.client.post(url, format='json')
+        self.assertEqual(response.status_code, status.HTTP_200_OK)
+
+        # The second entry does not fit, so promotion stops there
+        promoted = WaitlistEntry.objects.filter(status='promoted')
+        self.assertEqual([entry.user for entry in promoted], [self.waiting_users[0]])
+        self.assertEqual(Booking.objects.get(user=self.waiting_users[0]).number_of_tickets, 60)
+        self.event.refresh_from_db()
+        self.assertEqual(self.event.available_tickets, 40)
+
+        waiting = WaitlistEntry.objects.get(user=self.waiting_users[1])
+        response = self.client.get(reverse('waitlist-entry', kwargs={'entry_id': waiting.id}))
+        self.assertEqual(response.status_code, status.HTTP_404_NOT_FOUND)
+        self.client.credentials(HTTP_AUTHORIZATION='Bearer ' + self.get_tokens_for_user(self.waiting_users[1])['access'])
+        response = self.client.get(reverse('waitlist-entry', kwargs={'entry_id': waiting.id}))
+        self.assertEqual(response.data['position'], 1)
+
+    def test_positions_follow_leaves_and_promotions(self):
+        users = User.objects.bulk_create([
+            User(username=f'queued{index}', email=f'queued{index}@example.com') for index in range(40)
+        ])
+        entries = waitlist.enqueue(self.event.id, [WaitlistEntry(user=user, number_of_tickets=1) for user in users])
+        for index in (3, 17, 18, 31, 39):
+            self.assertTrue(waitlist.leave_waitlist(entries[index].id, users[index]))
+        self.assertFalse(waitlist.leave_waitlist(entries[3].id, users[3]))
+        Event.objects.filter(id=self.event.id).update(available_tickets=4)
+        self.assertEqual(len(waitlist.promote_waitlist(self.event.id)), 4)
+        entries += waitlist.enqueue(self.event.id, [WaitlistEntry(user=self.waiting_users[0], number_of_tickets=1)])
+
+        waiting = list(WaitlistEntry.objects.filter(event=self.event, status='waiting').order_by('id'))
+        self.assertEqual(len(waiting), 32)
+        for rank, entry in enumerate(waiting, 1):
+            with CaptureQueriesContext(connection) as queries:
+                self.assertEqual(waitlist.get_position(entry), rank)
+            # At most log2(sequence) tree nodes, read by their unique index
+            nodes = re.search(r'"node" IN \(([^)]*)\)', queries[0]['sql']).group(1).split(',')
+            self.assertEqual(len(queries), 1)
+            self.assertLessEqual(len(nodes), entry.sequence.bit_length())
+
+    def test_join_locks_the_event_before_the_queue(self):
+        locks = mock.Mock()
+        locks.attach_mock(mock.Mock(wraps=Event.objects.select_for_update), 'event')
+        locks.attach_mock(mock.Mock(wraps=waitlist._lock_queue), 'queue')
+        with mock.patch.object(Event.objects, 'select_for_update', locks.event), \
+                mock.patch.object(waitlist, '_lock_queue', locks.queue):
+            waitlist.enqueue(self.event.id, [WaitlistEntry(user=self.waiting_users[0], number_of_tickets=1)])
+        self.assertEqual([name for name, _, _ in locks.mock_calls], ['event', 'queue'])
+
+    def test_leave_waitlist(self):
+        response = self.join(self.waiting_users[0], 2)
+        url = reverse('leave-waitlist', kwargs={'entry_id': response.data['id']})
+        response = self.client.post(url, format='json')
+        self.assertEqual(response.status_code, status.HTTP_200_OK)
+        self.assertEqual(WaitlistEntry.objects.get().status, 'left')
+        response = self.client.post(url, format='json')
+        self.assertEqual(response.status_code, status.HTTP_400_BAD_REQUEST)
+
+class SeatSectionTests(APITestSetup):
+    def setUp(self):
+        super().setUp()
+        self.client.credentials(HTTP_AUTHORIZATION='Bearer ' + self.manager_tokens['access'])
+        url = reverse('seat-sections', kwargs={'event_id': self.event.id})
+        response = self.client.post(url, {"name": "Balcony", "capacity": 20, "seats_per_row": 5}, format='json')
+        self.assertEqual(response.status_code, status.HTTP_201_CREATED)
+        self.section_id = response.data['id']
+        self.client.credentials(HTTP_AUTHORIZATION='Bearer ' + self.user_tokens['access'])
+
+    def book(self, number_of_tickets):
+        url = reverse('book-ticket')
+        data = {"event": self.event.id, "number_of_tickets": number_of_tickets, "section": self.section_id}
+        return self.client.post(url, data, format='json')
+
+    def test_find_adjacent_stays_in_one_row(self):
+        taken = block_mask(0, 3)
+        self.assertEqual(find_adjacent(taken, 10, 5, 2), 3)
+        self.assertEqual(find_adjacent(taken, 10, 5, 3), 5)
+        self.assertIsNone(find_adjacent(taken, 10, 5, 6))
+
+    def test_booking_allocates_adjacent_seats(self):
+        first = self.book(3)
+        second = self.book(3)
+        self.assertEqual(first.status_code, status.HTTP_201_CREATED)
+        self.assertEqual(first.data['first_seat'], 0)
+        self.assertEqual(second.data['first_seat'], 5)
+
+    def test_cancel_releases_seats(self):
+        response = self.book(4)
+        url = reverse('cancel-booking', kwargs={'booking_id': response.data['id']})
+        self.client.post(url, format='json')
+        self.assertEqual(from_bitmap(SeatSection.objects.get(id=self.section_id).seat_map), 0)
+        self.assertEqual(self.book(4).data['first_seat'], 0)
+
+    def test_no_adjacent_block(self):
+        response = self.book(6)
+        self.assertEqual(response.status_code, status.HTTP_400_BAD_REQUEST)
+        self.assertEqual(Booking.objects.count(), 0)
+
+    def test_section_capacity_limited_by_total_tickets(self):
+        self.client.credentials(HTTP_AUTHORIZATION='Bearer ' + self.manager_tokens['access'])
+        url = reverse('seat-sections', kwargs={'event_id': self.event.id})
+        response = self.client.post(url, {"name": "Floor", "capacity": 81, "seats_per_row": 9}, format='json')
+        self.assertEqual(response.status_code, status.HTTP_400_BAD_REQUEST)
+
+    def test_failed_booking_frees_seats_and_tickets(self):
+        with mock.patch('api.serializers.Booking.objects.create', side_effect=DatabaseError):
+            with self.assertRaises(DatabaseError):
+                self.book(3)
+        self.assertEqual(from_bitmap(SeatSection.objects.get(id=self.section_id).seat_map), 0)
+        self.assertEqual(Event.objects.get(id=self.event.id).available_tickets, 100)
+
+    def test_stale_event_cannot_oversell(self):
+        # Another booking took the tickets after this request loaded the event
+        Event.objects.filter(id=self.event.id).update(available_tickets=2)
+        serializer = BookingSerializer()
+        with self.assertRaises(ValidationError):
+            serializer.create({'user': self.user, 'event': self.event, 'number_of_tickets': 3})
+        self.assertEqual(Event.objects.get(id=self.event.id).available_tickets, 2)
+
+class VenueConflictTests(APITestSetup):
+    def event_data(self, **overrides):
+        data = {
+            "title": "Late Show",
+            "description": "Second show",
+            "date": self.event.date.isoformat(),
+            "time": "19:00",
+            "location": "Stadium",
+            "category": "music",
+            "payment_options": "Credit Card",
+            "total_tickets": 50
+        }
+        data.update(overrides)
+        return data
+
+    def test_create_overlapping_event_rejected(self):
+        # The sample event runs 18:00-20:00 at the Stadium
+        url = reverse('create-event')
+        self.client.credentials(HTTP_AUTHORIZATION='Bearer ' + self.manager_tokens['access'])
+        response = self.client.post(url, self.event_data(), format='json')
+        self.assertEqual(response.status_code, status.HTTP_400_BAD_REQUEST)
+        response = self.client.post(url, self.event_data(time="20:00"), format='json')
+        self.assertEqual(response.status_code, status.HTTP_201_CREATED)
+        response = self.client.post(url, self.event_data(time="17:00", location="Arena"), format='json')
+        self.assertEqual(response.status_code, status.HTTP_201_CREATED)
+
+    def test_event_crossing_midnight_conflicts_next_day(self):
+        url = reverse('create-event')
+        self.client.credentials(HTTP_AUTHORIZATION='Bearer ' + self.manager_tokens['access'])
+        response = self.client.post(url, self.event_data(time="22:00", duration=240), format='json')
+        self.assertEqual(response.status_code, status.HTTP_201_CREATED)
+        next_day = (self.event.date + timedelta(days=1)).isoformat()
+        response = self.client.post(url, self.event_data(date=next_day, time="01:00"), format='json')
+        self.assertEqual(response.status_code, status.HTTP_400_BAD_REQUEST)
+
+    def test_import_rejects_overlaps_within_batch_and_with_existing(self):
+        url = reverse('import-events')
+        rows = [
+            self.event_data(time="10:00"),
+            self.event_data(time="11:00", title="Clash"),
+            self.event_data(time="19:30", title="Clash with existing"),
+            self.event_data(time="12:00", title="Fits"),
+        ]
+        self.client.credentials(HTTP_AUTHORIZATION='Bearer ' + self.manager_tokens['access'])
+        response = self.client.post(url, rows, format='json')
+        self.assertEqual(response.status_code, status.HTTP_201_CREATED)
+        self.assertEqual(response.data['created'], 2)
+        self.assertEqual([error['row'] for error in response.data['errors']], [1, 2])
+
+    def test_conflict_check_and_insert_hold_the_venue_lock(self):
+        self.client.credentials(HTTP_AUTHORIZATION='Bearer ' + self.manager_tokens['access'])
+        with CaptureQueriesContext(connection) as queries:
+            response = self.client.post(reverse('create-event'), self.event_data(time="21:00"), format='json')
+        self.assertEqual(response.status_code, status.HTTP_201_CREATED)
+        sqls = [query['sql'] for query in queries]
+        lock = next(index for index, sql in enumerate(sqls) if 'api_venuelock' in sql and sql.startswith('SELECT'))
+        check = next(index for index, sql in enumerate(sqls) if 'FROM "api_event"' in sql and 'starts_at' in sql)
+        insert = next(index for index, sql in enumerate(sqls) if sql.startswith('INSERT INTO "api_event"'))
+        self.assertLess(lock, check)
+        self.assertLess(check, insert)
+
+        rows = [self.event_data(time="10:00", location="Arena"), self.event_data(time="10:00", location="Hall")]
+        self.client.post(reverse('import-events'), rows, format='json')
+        self.assertEqual(
+            list(VenueLock.objects.order_by('location').values_list('location', flat=True)),
+            ['Arena', 'Hall', 'Stadium']
+        )
+
+    def test_conflict_lookup_at_scale(self):
+        start = self.event.starts_at + timedelta(days=1)
+        Event.objects.bulk_create([
+            Event(
+                title=f"Show {index}",
+                description="Nightly show",
+                date=self.event.date,
+                time=self.event.time,
+                location="Stadium",
+                category="music",
+                payment_options="Credit Card",
+                created_by=self.manager,
+                duration=60,
+                starts_at=start + timedelta(hours=2 * index),
+                ends_at=start + timedelta(hours=2 * index, minutes=60)
+            )
+            for index in range(5000)
+        ])
+        target = start + timedelta(hours=2 * 2500)
+        overlapping = venue_conflicts("Stadium", target + timedelta(minutes=30), target + timedelta(minutes=90))
+        adjacent = venue_conflicts("Stadium", target + timedelta(minutes=60), target + timedelta(minutes=120))
+        self.assertEqual(overlapping.count(), 1)
+        self.assertFalse(adjacent.exists())
+        schedule = VenueSchedule.load("Stadium", target, target + timedelta(hours=4))
+        self.assertTrue(schedule.overlaps(target + timedelta(minutes=59), target + timedelta(minutes=61)))
+        self.assertFalse(schedule.overlaps(target + timedelta(minutes=60), target + timedelta(minutes=120)))
+        # Only events starting within the bounded window are loaded
+        self.assertLessEqual(len(schedule._intervals), 15)
+
+class EventFacetTests(APITestSetup):
+    def setUp(self):
+        super().setUp()
+        facets.rebuild()
+        self.client.credentials(HTTP_AUTHORIZATION='Bearer ' + self.manager_tokens['access'])
+
+    def create_event(self, **overrides):
+        data = {
+            "title": "Derby",
+            "description": "Local derby",
+            "date": (self.event.date + timedelta(days=1)).isoformat(),
+            "time": "15:00",
+            "location": "Sports Arena",
+            "category": "sports",
+            "payment_options": "Credit Card",
+            "total_tickets": 100
+        }
+        data.update(overrides)
+        return self.client.post(reverse('create-event'), data, format='json')
+
+    def test_facets_follow_create_sell_out_and_cancel(self):
+        event_id = self.create_event().data['id']
+        self.create_event(location="Stadium", time="10:00")
+        response = self.client.get(reverse('event-facets'))
+        self.assertEqual(response.data['category'], {'music': 1, 'sports': 2})
+        self.assertEqual(response.data['location'], {'Sports Arena': 1, 'Stadium': 2})
+
+        self.client.credentials(HTTP_AUTHORIZATION='Bearer ' + self.user_tokens['access'])
+        self.client.post(reverse('book-ticket'), {"event": event_id, "number_of_tickets": 100}, format='json')
+        response = self.client.get(reverse('event-facets') + '?available_only=true')
+        self.assertEqual(response.data['location'], {'Stadium': 2})
+
+        self.client.credentials(HTTP_AUTHORIZATION='Bearer ' + self.manager_tokens['access'])
+        self.client.post(reverse('cancel-event', kwargs={'event_id': event_id}), format='json')
+        jobs.run_pending()
+        response = self.client.get(reverse('event-facets') + '?category=sports')
+        self.assertEqual(response.data['location'], {'Stadium': 1})
+        call_command('verify_facets', stdout=io.StringIO())
+
+    def test_facets_honor_filters(self):
+        self.create_event()
+        month = self.event.date.strftime('%Y-%m')
+        response = self.client.get(reverse('event-facets') + f'?location=Stadium&month={month}')
+        self.assertEqual(response.status_code, status.HTTP_200_OK)
+        self.assertEqual(response.data['category'], {'music': 1})
+
+    def test_invalid_month(self):
+        response = self.client.get(reverse('event-facets') + '?month=2025-13')
+        self.assertEqual(response.status_code, status.HTTP_400_BAD_REQUEST)
+
+    def test_verify_detects_drift(self):
+        EventFacetCount.objects.update(events=F('events') + 1)
+        with self.assertRaises(CommandError):
+            call_command('verify_facets', stdout=io.StringIO())
+        call_command('verify_facets', rebuild=True, stdout=io.StringIO())
+
+    def test_sell_out_from_stale_copy_updates_facets(self):
+        Event.objects.filter(id=self.event.id).update(available_tickets=3)
+        BookingSerializer().create({'user': self.user, 'event': self.event, 'number_of_tickets': 3})
+        self.assertEqual(facets.live_counts(), facets.stored_counts())
+
+    def test_bulk_sell_out_updates_facets(self):
+        derby = self.create_event().data['id']
+        final = self.create_event(location="Stadium", time="10:00").data['id']
+        Event.objects.filter(id=derby).update(available_tickets=2)
+        Event.objects.filter(id=final).update(available_tickets=1)
+        self.client.credentials(HTTP_AUTHORIZATION='Bearer ' + self.user_tokens['access'])
+        response = self.client.post(reverse('book-tickets'), {'items': [
+            {'event': derby, 'number_of_tickets': 2},
+            {'event': final, 'number_of_tickets': 1},
+            {'event': self.event.id, 'number_of_tickets': 1},
+        ]}, format='json')
+        self.assertEqual(response.status_code, status.HTTP_201_CREATED)
+        response = self.client.get(reverse('event-facets') + '?available_only=true')
+        self.assertEqual(response.data['location'], {'Stadium': 1})
+        self.assertEqual(facets.live_counts(), facets.stored_counts())
+
+
+class EventSalesStatsTests(APITestSetup):
+    def setUp(self):
+        super().setUp()
+        self.booking = Booking.objects.create(
+            user=self.user,
+            event=self.event,
+            number_of_tickets=4,
+            status='booked'
+        )
+        self.event.available_tickets -= 4
+        self.event.save()
+        Payment.objects.create(
+            booking=self.booking,
+            payment_method="Credit Card",
+            amount=Decimal('80.00'),
+            status='completed'
+        )
+        call_command('rebuild_event_stats', stdout=io.StringIO())
+
+    def test_stats_follow_booking_and_cancellation(self):
+        self.client.credentials(HTTP_AUTHORIZATION='Bearer ' + self.user_tokens['access'])
+        response = self.client.post(reverse('book-ticket'), {"event": self.event.id, "number_of_tickets": 2}, format='json')
+        self.assertEqual(response.status_code, status.HTTP_201_CREATED)
+        self.client.post(reverse('cancel-booking', kwargs={'booking_id': self.booking.id}), format='json')
+
+        sales = EventSalesStats.objects.get(event=self.event)
+        self.assertEqual(sales.tickets_sold, 2)
+        self.assertEqual(sales.cancellations, 1)
+        self.assertEqual(sales.revenue, Decimal('0.00'))
+        self.assertEqual(sales.refunded_amount, Decimal('80.00'))
+        call_command('rebuild_event_stats', check=True, stdout=io.StringIO())
+
+    def test_manager_dashboard(self):
+        self.client.credentials(HTTP_AUTHORIZATION='Bearer ' + self.manager_tokens['access'])
+        with CaptureQueriesContext(connection) as queries:
+            response = self.client.get(reverse('event-stats'))
+        self.assertEqual(response.status_code, status.HTTP_200_OK)
+        self.assertEqual(response.data[0]['event_title'], "Concert")
+        self.assertEqual(response.data[0]['tickets_sold'], 4)
+        self.assertEqual(response.data[0]['revenue'], '80.00')
+        # The user lookup and one query for all stats rows
+        self.assertEqual(len(queries), 2)
+
+    def test_stats_are_written_with_the_booking(self):
+        self.client.credentials(HTTP_AUTHORIZATION='Bearer ' + self.user_tokens['access'])
+        with mock.patch.object(stats, '_adjust', side_effect=DatabaseError):
+            with self.assertRaises(DatabaseError):
+                self.client.post(reverse('book-ticket'), {"event": self.event.id, "number_of_tickets": 2})
+        self.assertEqual(Booking.objects.count(), 1)
+        self.assertEqual(Event.objects.get(id=self.event.id).available_tickets, 96)
+        call_command('rebuild_event_stats', check=True, stdout=io.StringIO())
+
+    def test_rebuild_reads_figures_under_the_event_lock(self):
+        depth = len(connection.savepoint_ids)
+        calls = []
+
+        def live_stats(event_ids):
+            calls.append(len(connection.savepoint_ids))
+            return stats_live_stats(event_ids)
+
+        stats_live_stats = stats.live_stats
+        with mock.patch.object(stats, 'live_stats', side_effect=live_stats), \
+                mock.patch.object(Event.objects, 'select_for_update', wraps=Event.objects.select_for_update) as lock:
+            stats.rebuild()
+        self.assertEqual(calls, [depth + 1])
+        lock.assert_called_once_with()
+        call_command('rebuild_event_stats', check=True, stdout=io.StringIO())
+
+    def test_check_detects_drift(self):
+        EventSalesStats.objects.update(tickets_sold=99)
+        with self.assertRaises(CommandError):
+            call_command('rebuild_event_stats', check=True, stdout=io.StringIO())
+        call_command('rebuild_event_stats', stdout=io.StringIO())
+        call_command('rebuild_event_stats', check=True, stdout=io.StringIO())
+
+class BookingLifecycleTests(APITestSetup):
+    def setUp(self):
+        super().setUp()
+        self.booking = Booking.objects.create(
+            user=self.user,
+            event=self.event,
+            number_of_tickets=3,
+            status='booked'
+        )
+        self.event.available_tickets -= 3
+        self.event.save()
+        self.payment = Payment.objects.create(
+            booking=self.booking,
+            payment_method="Credit Card",
+            amount=Decimal('30.00'),
+            status='completed'
+        )
+
+    def test_revert_after_cancel_does_not_credit_twice(self):
+        self.client.credentials(HTTP_AUTHORIZATION='Bearer ' + self.user_tokens['access'])
+        response = self.client.post(reverse('cancel-booking', kwargs={'booking_id': self.booking.id}), format='json')
+        self.assertEqual(response.status_code, status.HTTP_200_OK)
+        response = self.client.post(reverse('revert-payment'), {"booking_id": self.booking.id, "reason": "Retry"},
+                                    format='json')
+        self.assertEqual(response.status_code, status.HTTP_400_BAD_REQUEST)
+        self.assertIn('non_field_errors', response.data)
+        self.event.refresh_from_db()
+        self.payment.refresh_from_db()
+        self.assertEqual(self.event.available_tickets, 100)
+        self.assertEqual(self.payment.status, 'reverted')
+
+    def test_cancel_after_revert_is_rejected(self):
+        lifecycle.revert_payment(self.booking.id)
+        with self.assertRaises(lifecycle.BookingLifecycleError):
+            lifecycle.cancel_booking(self.booking.id, user=self.user)
+        self.event.refresh_from_db()
+        self.assertEqual(self.event.available_tickets, 100)
+
+    def test_cancel_booking_query_budget(self):
+        with CaptureQueriesContext(connection) as queries:
+            lifecycle.cancel_booking(self.booking.id, user=self.user)
+        self.assertLessEqual(len(queries), 15)
+        self.assertFalse([query for query in queries if 'UPDATE "api_event" SET "title"' in query['sql']])
+
+    def test_cancel_locks_event_before_booking(self):
+        # Same order as booking and event cancellation, so they cannot deadlock
+        with CaptureQueriesContext(connection) as queries:
+            lifecycle.cancel_booking(self.booking.id, user=self.user)
+        selects = [query['sql'] for query in queries if query['sql'].startswith('SELECT')]
+        event_lock = next(i for i, sql in enumerate(selects) if 'FROM "api_event"' in sql)
+        booking_lock = next(i for i, sql in enumerate(selects) if 'JOIN "api_payment"' in sql)
+        self.assertLess(event_lock, booking_lock)
+
+    def test_cancel_of_deleted_event_booking_is_not_found(self):
+        Event.objects.filter(id=self.event.id).delete()
+        with self.assertRaises(Booking.DoesNotExist):
+            lifecycle.cancel_booking(self.booking.id, user=self.user)
+
+    def test_cancel_event_query_count_does_not_grow(self):
+        def cancel_with_bookings(count):
+            event = Event.objects.create(
+                title=f"Show for {count}",
+                description="Show",
+                date=self.event.date + timedelta(days=count),
+                time=self.event.time,
+                location="Stadium",
+                category="music",
+                payment_options="Credit Card",
+                created_by=self.manager
+            )
+            Booking.objects.bulk_create([
+                Booking(user=self.user, event=event, number_of_tickets=1) for _ in range(count)
+            ])
+            with self.captureOnCommitCallbacks(execute=True):
+                with CaptureQueriesContext(connection) as queries:
+                    lifecycle.cancel_event(event)
+            return len(queries)
+
+        self.assertEqual(cancel_with_bookings(2), cancel_with_bookings(20))
+        self.assertEqual(len(mail.outbox), 22)
+
+class ArchiveTests(APITestSetup):
+    def setUp(self):
+        super().setUp()
+        self.past_event = Event.objects.create(
+            title="Last Year's Gala",
+            description="Annual gala",
+            date=timezone.now().date() - timedelta(days=400),
+            time=self.event.time,
+            location="Opera House",
+            category="theatre",
+            payment_options="Credit Card",
+            created_by=self.manager
+        )
+        self.past_booking = Booking.objects.create(
+            user=self.user,
+            event=self.past_event,
+            number_of_tickets=2,
+            status='booked'
+        )
+        Payment.objects.create(
+            booking=self.past_booking,
+            payment_method="Credit Card",
+            amount=Decimal('20.00'),
+            status='completed'
+        )
+        facets.rebuild()
+        stats.rebuild()
+        call_command('archive_events', stdout=io.StringIO())
+
+    def test_past_events_are_moved(self):
+        self.assertFalse(Event.objects.filter(id=self.past_event.id).exists())
+        self.assertFalse(Booking.objects.filter(id=self.past_booking.id).exists())
+        self.assertEqual(ArchivedEvent.objects.get(id=self.past_event.id).title, "Last Year's Gala")
+        self.assertEqual(ArchivedBooking.objects.get(id=self.past_booking.id).event_id, self.past_event.id)
+        self.assertEqual(ArchivedPayment.objects.get(booking_id=self.past_booking.id).amount, Decimal('20.00'))
+        self.assertTrue(Event.objects.filter(id=self.event.id).exists())
+        call_command('verify_facets', stdout=io.StringIO())
+
+    def test_sales_stats_are_moved(self):
+        self.assertFalse(EventSalesStats.objects.filter(event_id=self.past_event.id).exists())
+        archived = ArchivedEventSalesStats.objects.get(event_id=self.past_event.id)
+        self.assertEqual((archived.tickets_sold, archived.revenue), (2, Decimal('20.00')))
+
+    def test_event_list_include_archived(self):
+        response = self.client.get(reverse('event-list'))
+        self.assertEqual([event['id'] for event in response.data], [self.event.id])
+        response = self.client.get(reverse('event-list') + '?include_archived=true&category=theatre')
+        self.assertEqual([event['id'] for event in response.data], [self.past_event.id])
+
+    def test_include_archived_orders_and_paginates_in_sql(self):
+        later = Event.objects.create(
+            title="Next Year's Gala", description="Gala", date=self.event.date + timedelta(days=300),
+            time=self.event.time, location="Opera House", category="theatre", payment_options="Card",
+            created_by=self.manager
+        )
+        url = reverse('event-list') + '?include_archived=true&ordering=-date'
+        with CaptureQueriesContext(connection) as queries:
+            response = self.client.get(url)
+        self.assertEqual([event['id'] for event in response.data], [later.id, self.event.id, self.past_event.id])
+        self.assertEqual(len(queries), 1)
+        self.assertIn('UNION ALL', queries[0]['sql'])
+
+        with mock.patch.object(EventListView, 'pagination_class', LimitOffsetPagination):
+            response = self.client.get(url + '&limit=2&offset=1')
+        self.assertEqual(response.data['count'], 3)
+        self.assertEqual([event['id'] for event in response.data['results']], [self.event.id, self.past_event.id])
+
+    def test_include_archived_pages_with_a_cursor(self):
+        Event.objects.bulk_create([
+            Event(
+                title=f"Show {index}", description="Show", date=self.event.date + timedelta(days=index % 2),
+                time=self.event.time, location="Opera House", category="theatre", payment_options="Card",
+                created_by=self.manager, starts_at=self.event.starts_at, ends_at=self.event.ends_at
+            )
+            for index in range(4)
+        ])
+        for query in ('', '&ordering=-date', '&ordering=created_by'):
+            url = reverse('event-list') + '?include_archived=true' + query
+            expected = [event['id'] for event in self.client.get(url).data]
+            self.assertEqual(len(expected), 6)
+            seen = []
+            with mock.patch.object(EventListView, 'archive_page_size', 2):
+                while url:
+                    with CaptureQueriesContext(connection) as queries:
+                        response = self.client.get(url)
+                    self.assertEqual(len(queries), 1)
+                    self.assertLessEqual(len(response.data), 2)
+                    seen.extend(event['id'] for event in response.data)
+                    link = response.get('Link')
+                    url = link[1:link.index('>')] if link else None
+            self.assertEqual(seen, expected)
+
+        response = self.client.get(reverse('event-list') + '?include_archived=true&cursor=nonsense')
+        self.assertEqual(response.status_code, status.HTTP_400_BAD_REQUEST)
+
+    def test_include_archived_cursor_keeps_microseconds(self):
+        Event.objects.bulk_create([
+            Event(
+                title=f"Show {index}", description="Show", date=self.event.date, time=time(10, 0, 0, index),
+                location="Opera House", category="theatre", payment_options="Card", created_by=self.manager,
+                starts_at=self.event.starts_at, ends_at=self.event.ends_at
+            )
+            for index in range(1, 8)
+        ])
+        url = reverse('event-list') + '?include_archived=true&ordering=time'
+        expected = [event['id'] for event in self.client.get(url).data]
+        seen = []
+        with mock.patch.object(EventListView, 'archive_page_size', 2):
+            while url and len(seen) < len(expected):
+                response = self.client.get(url)
+                seen.extend(event['id'] for event in response.data)
+                link = response.get('Link')
+                url = link[1:link.index('>')] if link else None
+        self.assertEqual(seen, expected)
+
+    def test_cancelling_events_are_not_archived(self):
+        self.past_event = Event.objects.create(
+            title="Cancelled Gala", description="Gala", date=timezone.now().date() - timedelta(days=10),
+            time=self.event.time, location="Opera House", category="theatre", payment_options="Card",
+            created_by=self.manager, status='cancelling'
+        )
+        self.assertEqual(archive_past_events(timezone.now().date()), 0)
+        self.assertTrue(Event.objects.filter(id=self.past_event.id).exists())
+
+    def test_archived_queryset_is_required(self):
+        with self.assertRaises(TypeError):
+            type('NoArchive', (IncludeArchivedMixin, generics.ListAPIView), {})
+
+    def test_my_bookings_include_archived(self):
+        self.client.credentials(HTTP_AUTHORIZATION='Bearer ' + self.user_tokens['access'])
+        response = self.client.get(reverse('my-bookings'))
+        self.assertEqual(len(response.data), 0)
+        response = self.client.get(reverse('my-bookings') + '?include_archived=1')
+        self.assertEqual(len(response.data), 1)
+        self.assertEqual(response.data[0]['event']['title'], "Last Year's Gala")
+
+    def test_batches_are_bounded(self):
+        Event.objects.bulk_create([
+            Event(
+                title=f"Old {index}",
+                description="Old show",
+                date=self.past_event.date,
+                time=self.event.time,
+                location="Opera House",
+                category="theatre",
+                payment_options="Credit Card",
+                created_by=self.manager,
+                starts_at=self.past_event.starts_at,
+                ends_at=self.past_event.ends_at
+            )
+            for index in range(5)
+        ])
+        self.assertEqual(archive_batch(timezone.now().date(), batch_size=2), 2)
+        self.assertEqual(archive_past_events(timezone.now().date(), batch_size=2), 3)
+
+
+class RateLimitTests(APITestSetup):
+    def book(self):
+        return self.client.post(reverse('book-ticket'), {'event': self.event.id, 'number_of_tickets': 1})
+
+    def test_parse_rate(self):
+        self.assertEqual(throttling.parse_rate('10/min'), (10, 10 / 60))
+        self.assertEqual(throttling.parse_rate('2/s'), (2, 2))
+
+    def test_bucket_refills_over_time(self):
+        store = throttling.LocalBucketStore()
+        self.assertEqual(store.consume('key', 2, 1, now=0), 0)
+        self.assertEqual(store.consume('key', 2, 1, now=0), 0)
+        self.assertEqual(store.consume('key', 2, 1, now=0.25), 0.75)
+        self.assertEqual(store.consume('key', 2, 1, now=1), 0)
+
+    @mock.patch.dict(throttling.get_rate_limits(), {'book-ticket': '2/min'})
+    def test_booking_is_limited_per_user(self):
+        self.client.credentials(HTTP_AUTHORIZATION='Bearer ' + self.user_tokens['access'])
+        self.assertEqual(self.book().status_code, status.HTTP_201_CREATED)
+        self.assertEqual(self.book().status_code, status.HTTP_201_CREATED)
+        response = self.book()
+        self.assertEqual(response.status_code, status.HTTP_429_TOO_MANY_REQUESTS)
+        self.assertEqual(response['Retry-After'], '30')
+
+        # Another user has their own bucket
+        self.client.credentials(HTTP_AUTHORIZATION='Bearer ' + self.manager_tokens['access'])
+        self.assertEqual(self.book().status_code, status.HTTP_201_CREATED)
+
+    def test_anonymous_requests_are_limited_per_ip(self):
+        data = {'email': 'nobody@example.com', 'password': 'wrong'}
+        for _ in range(10):
+            self.assertNotEqual(self.client.post(reverse('login'), data).status_code, 429)
+        self.assertEqual(self.client.post(reverse('login'), data).status_code, 429)
+        response = self.client.post(reverse('login'), data, REMOTE_ADDR='10.0.0.2')
+        self.assertNotEqual(response.status_code, 429)
+
+    def test_forwarded_for_header_does_not_reset_the_limit(self):
+        data = {'email': 'nobody@example.com', 'password': 'wrong'}
+        statuses = [
+            self.client.post(reverse('login'), data, HTTP_X_FORWARDED_FOR=f'203.0.113.{index}').status_code
+            for index in range(15)
+        ]
+        self.assertEqual(statuses.count(429), 5)
+
+    def test_full_store_only_evicts_refilled_buckets(self):
+        store = throttling.LocalBucketStore(max_keys=2)
+        self.assertEqual(store.consume('a', 1, 1, now=0), 0)
+        self.assertEqual(store.consume('b', 1, 1, now=0), 0)
+        # 'a' is still empty, so a new key cannot push it out
+        self.assertEqual(store.consume('c', 1, 1, now=0.5), 0.5)
+        self.assertEqual(store.consume('a', 1, 1, now=0.5), 0.5)
+        self.assertEqual(store.consume('c', 1, 1, now=1.5), 0)
+
+    @override_settings(
+        CACHES={'default': {'BACKEND': 'django.core.cache.backends.locmem.LocMemCache', 'LOCATION': 'throttle-test'}},
+        RATE_LIMIT_CACHE='default',
+    )
+    def test_clearing_shared_buckets_keeps_other_cache_entries(self):
+        from django.core.cache import cache
+
+        store = throttling.get_store()
+        cache.set('unrelated', 'kept')
+        self.assertEqual(store.consume('key', 1, 1, now=0), 0)
+        self.assertEqual(store.consume('key', 1, 1, now=0), 1)
+        store.clear()
+        self.assertEqual(store.consume('key', 1, 1, now=0), 0)
+        self.assertEqual(cache.get('unrelated'), 'kept')
+
+    def test_unlisted_routes_are_not_limited(self):
+        for _ in range(20):
+            self.assertEqual(self.client.get(reverse('event-list')).status_code, status.HTTP_200_OK)
+
+
+@override_settings(PASSWORD_HASH_ITERATIONS=1000)
+class PasswordHashingTests(APITestSetup):
+    def test_register_hashes_on_pool(self):
+        data = {
+            'username': 'pooled', 'email': 'pooled@example.com', 'password': 'Str0ngPassw0rd!',
+            'first_name': 'Pooled', 'last_name': 'User'
+        }
+        with mock.patch.object(hashing, 'run', wraps=hashing.run) as run:
+            response = self.client.post(reverse('register'), data)
+        self.assertEqual(response.status_code, status.HTTP_201_CREATED)
+        self.assertTrue(run.called)
+        user = User.objects.get(username='pooled')
+        self.assertTrue(user.password.startswith('pbkdf2_sha256$1000$'))
+        self.assertTrue(user.check_password('Str0ngPassw0rd!'))
+
+    def test_authenticate_upgrades_work_factor(self):
+        self.user.set_password('password123')
+        self.user.save()
+        with override_settings(PASSWORD_HASH_ITERATIONS=2000):
+            self.assertEqual(authenticate(username='user1', password='password123'), self.user)
+        self.user.refresh_from_db()
+        self.assertTrue(self.user.password.startswith('pbkdf2_sha256$2000$'))
+
+    def test_wrong_password_is_not_upgraded(self):
+        self.user.set_password('password123')
+        self.user.save()
+        encoded = self.user.password
+        with override_settings(PASSWORD_HASH_ITERATIONS=2000):
+            self.assertIsNone(authenticate(username='user1', password='wrong'))
+            self.assertIsNone(authenticate(username='nobody', password='password123'))
+        self.user.refresh_from_db()
+        self.assertEqual(self.user.password, encoded)
+
+    def test_saturated_pool_returns_503(self):
+        executor, _ = hashing._get_pool()
+        with mock.patch.object(hashing, '_get_pool', return_value=(executor, threading.BoundedSemaphore(1))) as pool:
+            pool.return_value[1].acquire()
+            with self.settings(PASSWORD_HASH_WAIT=0.01):
+                response = self.client.post(reverse('register'), {
+                    'username': 'busy', 'email': 'busy@example.com', 'password': 'Str0ngPassw0rd!',
+                    'first_name': 'Busy', 'last_name': 'User'
+                })
+        self.assertEqual(response.status_code, status.HTTP_503_SERVICE_UNAVAILABLE)
+        self.assertEqual(response['Retry-After'], '1')
+        self.assertFalse(User.objects.filter(username='busy').exists())
+
+
+class BatchTests(APITestSetup):
+    def post_batch(self, requests, **extra):
+        return self.client.post(reverse('batch'), {'requests': requests, **extra}, format='json')
+
+    def test_checkout_in_one_round_trip(self):
+        self.client.credentials(HTTP_AUTHORIZATION='Bearer ' + self.user_tokens['access'])
+        with mock.patch('rest_framework_simplejwt.authentication.JWTAuthentication.authenticate',
+                        autospec=True, side_effect=JWTAuthentication.authenticate) as authenticate:
+            response = self.post_batch([
+                {'method': 'GET', 'path': '/api/events/?category=music'},
+                {'method': 'POST', 'path': '/api/book-ticket/', 'body': {'event': self.event.id, 'number_of_tickets': 2}},
+                {'method': 'GET', 'path': '/api/my-bookings/'},
+            ])
+        self.assertEqual(response.status_code, status.HTTP_200_OK)
+        self.assertEqual(authenticate.call_count, 1)
+        results = response.data['results']
+        self.assertEqual([result['status'] for result in results], [200, 201, 200])
+        self.assertEqual(results[0]['body'][0]['id'], self.event.id)
+        self.assertEqual(results[2]['body'][0]['number_of_tickets'], 2)
+
+    def test_atomic_batch_rolls_back_on_error(self):
+        self.client.credentials(HTTP_AUTHORIZATION='Bearer ' + self.user_tokens['access'])
+        booking = {'method': 'POST', 'path': '/api/book-ticket/', 'body': {'event': self.event.id, 'number_of_tickets': 2}}
+        too_many = {'method': 'POST', 'path': '/api/book-ticket/', 'body': {'event': self.event.id, 'number_of_tickets': 1000}}
+        response = self.post_batch([booking, too_many, booking], atomic=True)
+        self.assertEqual([result['status'] for result in response.data['results']], [201, 400, 424])
+        self.assertFalse(Booking.objects.exists())
+        self.event.refresh_from_db()
+        self.assertEqual(self.event.available_tickets, 100)
+
+    def test_rejects_unknown_and_nested_paths(self):
+        response = self.post_batch([
+            {'method': 'GET', 'path': '/api/nowhere/'},
+            {'method': 'GET', 'path': '/admin/'},
+            {'method': 'POST', 'path': '/api/batch/', 'body': {'requests': []}},
+            {'method': 'GET', 'path': '/api/my-bookings/'},
+        ])
+        self.assertEqual([result['status'] for result in response.data['results']], [404, 404, 400, 401])
+
+    def test_validates_batch_size(self):
+        with self.settings(BATCH_MAX_REQUESTS=2):
+            response = self.post_batch([{'method': 'GET', 'path': '/api/events/'}] * 3)
+        self.assertEqual(response.status_code, status.HTTP_400_BAD_REQUEST)
+        self.assertEqual(self.post_batch([]).status_code, status.HTTP_400_BAD_REQUEST)
+
+    def test_groups_consecutive_reads(self):
+        items = [{'method': method} for method in ('GET', 'GET', 'POST', 'GET', 'HEAD', 'DELETE')]
+        self.assertEqual([len(group) for group in batch.group_reads(items)], [2, 1, 2, 1])
+
+
+class ApiSettingsProfileTests(SimpleTestCase):
+    def test_context_processors_are_callables(self):
+        for template in settings.TEMPLATES:
+            for path in template['OPTIONS'].get('context_processors', []):
+                self.assertTrue(callable(import_string(path)), path)
+
+    def test_api_profile_passes_checks(self):
+        result = subprocess.run(
+            [sys.executable, 'manage.py', 'check', '--settings=AdvanceDjangoAssignment.settings_api'],
+            cwd=settings.BASE_DIR, capture_output=True, text=True
+        )
+        self.assertEqual(result.returncode, 0, result.stderr)
+
+    def test_api_profile_is_lean(self):
+        from AdvanceDjangoAssignment import settings_api
+
+        self.assertNotIn('django.contrib.admin', settings_api.INSTALLED_APPS)
+        self.assertNotIn('django.middleware.csrf.CsrfViewMiddleware', settings_api.MIDDLEWARE)
+        self.assertNotIn('django.contrib.sessions.middleware.SessionMiddleware', settings_api.MIDDLEWARE)
+        self.assertEqual(settings_api.REST_FRAMEWORK['DEFAULT_RENDERER_CLASSES'], ('api.renderers.FastJSONRenderer',))
+        self.assertEqual(settings_api.RATE_LIMIT_CACHE, settings.RATE_LIMIT_CACHE)
+
+
+class JobQueueTests(APITestSetup):
+    def setUp(self):
+        super().setUp()
+        self.bookings = Booking.objects.bulk_create([
+            Booking(user=self.user, event=self.event, number_of_tickets=1) for _ in range(5)
+        ])
+        self.client.credentials(HTTP_AUTHORIZATION='Bearer ' + self.manager_tokens['access'])
+
+    def cancel(self):
+        return self.client.post(reverse('cancel-event', kwargs={'event_id': self.event.id}), format='json')
+
+    def test_cancel_event_returns_job_and_reports_progress(self):
+        response = self.cancel()
+        self.assertEqual(response.status_code, status.HTTP_202_ACCEPTED)
+        self.event.refresh_from_db()
+        self.assertEqual(self.event.available_tickets, 0)
+
+        job_url = response.data['status_url']
+        self.assertEqual(job_url, reverse('job-detail', kwargs={'job_id': response.data['job_id']}))
+        self.assertEqual(self.client.get(job_url).data['status'], 'queued')
+        self.assertEqual(self.client.get(job_url).data['total'], 5)
+
+        with self.captureOnCommitCallbacks(execute=True):
+            self.assertEqual(jobs.run_pending(), 1)
+        data = self.client.get(job_url).data
+        self.assertEqual((data['status'], data['processed']), ('done', 5))
+        self.assertFalse(Event.objects.filter(id=self.event.id).exists())
+        self.assertEqual(len(mail.outbox), 5)
+
+        self.client.credentials(HTTP_AUTHORIZATION='Bearer ' + self.user_tokens['access'])
+        self.assertEqual(self.client.get(job_url).status_code, status.HTTP_404_NOT_FOUND)
+
+    def test_cancelling_event_stays_closed(self):
+        other = User.objects.create_user(username='fan', email='fan@example.com', password='password123')
+        entry, = waitlist.enqueue(self.event.id, [WaitlistEntry(user=other, number_of_tickets=1)])
+        self.assertEqual(self.cancel().status_code, status.HTTP_202_ACCEPTED)
+
+        self.client.credentials(HTTP_AUTHORIZATION='Bearer ' + self.user_tokens['access'])
+        response = self.client.post(reverse('cancel-booking', kwargs={'booking_id': self.bookings[0].id}))
+        self.assertEqual(response.status_code, status.HTTP_200_OK)
+        self.event.refresh_from_db()
+        self.assertEqual((self.event.status, self.event.available_tickets), ('cancelling', 0))
+        entry.refresh_from_db()
+        self.assertEqual(entry.status, 'waiting')
+
+        self.client.force_authenticate(other)
+        data = {'event': self.event.id, 'number_of_tickets': 1}
+        self.assertEqual(self.client.post(reverse('book-ticket'), data).status_code, status.HTTP_400_BAD_REQUEST)
+        response = self.client.post(reverse('book-tickets'), {'items': [data]}, format='json')
+        self.assertEqual(response.status_code, status.HTTP_400_BAD_REQUEST)
+        self.assertEqual(response.data['items'], [f"Event {self.event.id} is being cancelled."])
+        entry.delete()
+        response = self.client.post(reverse('join-waitlist'), {'event': self.event.id, 'number_of_tickets': 5})
+        self.assertEqual(response.status_code, status.HTTP_400_BAD_REQUEST)
+        self.assertEqual(Booking.objects.filter(user=other).count(), 0)
+
+    def test_repeated_cancel_reuses_job(self):
+        first = self.cancel()
+        second = self.cancel()
+        self.assertEqual(first.data['job_id'], second.data['job_id'])
+        self.assertEqual(Job.objects.count(), 1)
+
+    @mock.patch('api.lifecycle.CANCEL_EVENT_CHUNK_SIZE', 2)
+    def test_abandoned_job_resumes_from_cursor(self):
+        job_id = self.cancel().data['job_id']
+        job = jobs.claim()
+        self.assertEqual(job.id, job_id)
+        # The worker dies after its first chunk
+        with transaction.atomic():
+            jobs.HANDLERS['cancel_event'](job)
+            job.save(update_fields=['cursor', 'processed'])
+        self.assertEqual(job.cursor, self.bookings[1].id)
+        self.assertIsNone(jobs.claim())
+
+        Job.objects.filter(id=job_id).update(locked_until=timezone.now() - timedelta(seconds=1))
+        self.assertEqual(jobs.run_pending(), 1)
+        job.refresh_from_db()
+        self.assertEqual((job.status, job.processed, job.attempts), ('done', 5, 2))
+        self.assertEqual(Booking.objects.filter(event_id=self.event.id).count(), 0)
+
+    def test_failed_chunk_is_rolled_back(self):
+        job_id = self.cancel().data['job_id']
+        with mock.patch('api.lifecycle.send_mass_mail'), \
+                mock.patch('api.lifecycle.Payment.objects.filter', side_effect=RuntimeError("boom")):
+            jobs.run_pending()
+        job = Job.objects.get(id=job_id)
+        self.assertEqual((job.status, job.error, job.processed), ('failed', 'boom', 0))
+        self.assertEqual(Booking.objects.filter(event=self.event, status='booked').count(), 5)
+
+    @mock.patch('api.lifecycle.CANCEL_EVENT_CHUNK_SIZE', 2)
+    def test_stats_match_bookings_after_a_failed_chunk(self):
+        Payment.objects.bulk_create([
+            Payment(booking=booking, payment_method='Credit Card', amount=Decimal('20.00'), status='completed')
+            for booking in self.bookings
+        ])
+        call_command('rebuild_event_stats', stdout=io.StringIO())
+        job_id = self.cancel().data['job_id']
+        job = jobs.claim()
+        with transaction.atomic():
+            jobs.HANDLERS['cancel_event'](job)
+            job.save(update_fields=['cursor', 'processed'])
+        with mock.patch('api.lifecycle.send_mass_mail'), \
+                mock.patch('api.lifecycle.audit.booking_changed', side_effect=RuntimeError("boom")):
+            Job.objects.filter(id=job_id).update(locked_until=timezone.now() - timedelta(seconds=1))
+            jobs.run_pending()
+        self.assertEqual(Job.objects.get(id=job_id).status, 'failed')
+
+        sales = EventSalesStats.objects.get(event=self.event)
+        self.assertEqual((sales.tickets_sold, sales.cancellations), (3, 2))
+        self.assertEqual((sales.revenue, sales.refunded_amount), (Decimal('60.00'), Decimal('40.00')))
+        call_command('rebuild_event_stats', check=True, stdout=io.StringIO())
+
+    @mock.patch('api.lifecycle.CANCEL_EVENT_CHUNK_SIZE', 2)
+    def test_failed_job_is_requeued_by_cancelling_again(self):
+        job_id = self.cancel().data['job_id']
+        job = jobs.claim()
+        with transaction.atomic():
+            jobs.HANDLERS['cancel_event'](job)
+            job.save(update_fields=['cursor', 'processed'])
+        Job.objects.filter(id=job_id).update(status='failed', error='boom')
+
+        response = self.cancel()
+        self.assertEqual(response.data['job_id'], job_id)
+        job.refresh_from_db()
+        self.assertEqual((job.status, job.attempts, job.error), ('queued', 0, ''))
+        self.assertEqual(jobs.run_pending(), 1)
+        job.refresh_from_db()
+        self.assertEqual((job.status, job.processed), ('done', 5))
+        self.assertFalse(Event.objects.filter(id=self.event.id).exists())
+
+
+def normalize_sql(sql):
+    sql = re.sub(r'"s\d+_x\d+"', '?', sql)
+    sql = re.sub(r"'[^']*'", '?', sql)
+    sql = re.sub(r'\b\d+(\.\d+)?\b', '?', sql)
+    return re.sub(r'\((\?, )+\?\)', '(...)', sql)
+
+
+# url name -> (max queries, max milliseconds) for one request against the
+# QueryBudgetTests fixture. The query count must also not grow with the
+# fixture size. Times depend on the machine and are checked unless the
+# QUERY_BUDGET_TIMINGS setting is turned off.
+QUERY_BUDGETS = {
+    'register': (3, 500),
+    'provision-users': (5, 500),
+    'login': (2, 500),
+    'logout': (7, 200),
+    'create-event': (11, 200),
+    'import-events': (11, 500),
+    'seat-sections': (3, 200),
+    'event-list': (1, 200),
+    'event-facets': (1, 200),
+    'book-ticket': (8, 200),
+    'book-tickets': (8, 500),
+    'my-bookings': (2, 200),
+    'cancel-booking': (13, 200),
+    'join-waitlist': (12, 200),
+    'waitlist-entry': (3, 200),
+    'leave-waitlist': (7, 200),
+    'make-payment': (7, 200),
+    'revert-payment': (14, 200),
+    'token_refresh': (1, 200),
+    'cancel-event': (51, 500),
+    'job-detail': (2, 200),
+    'event-stats': (2, 200),
+    'audit-log': (2, 200),
+    'export-events': (2, 200),
+    'export-bookings': (2, 200),
+    'batch': (2, 200),
+}
+
+
+@override_settings(PASSWORD_HASH_ITERATIONS=1000)
+class QueryBudgetTests(APITestSetup):
+    """
+    Calls every route with a small and a large fixture and checks the
+    declared QUERY_BUDGETS. Failures include the captured SQL.
+    """
+    SIZES = (2, 20)
+
+    def build_fixture(self, size):
+        events = [
+            Event.objects.create(
+                title=f"Budget Show {index}",
+                description="Show",
+                date=self.event.date + timedelta(days=index + 1),
+                time=self.event.time,
+                location=f"Hall {index}",
+                category="music",
+                payment_options="Credit Card",
+                created_by=self.manager,
+                total_tickets=100,
+                available_tickets=100
+            )
+            for index in range(size)
+        ]
+        bookings = Booking.objects.bulk_create([Booking(user=self.user, event=event, number_of_tickets=1) for event in events])
+        Payment.objects.bulk_create([
+            Payment(booking=booking, payment_method='Card', amount=Decimal('10.00'), payment_date=timezone.now(),
+                    status='completed')
+            for booking in bookings
+        ])
+        SeatSection.objects.bulk_create([
+            SeatSection(event=events[0], name=f"Block {index}", capacity=10, seats_per_row=5,
+                        seat_map=to_bitmap(0, 10))
+            for index in range(size)
+        ])
+        Event.objects.filter(id=events[1].id).update(available_tickets=0)
+        waiting_users = User.objects.bulk_create([
+            User(username=f'waiting{index}', email=f'waiting{index}@example.com') for index in range(size - 1)
+        ])
+        entries = waitlist.enqueue(events[1].id, [
+            WaitlistEntry(user=user, number_of_tickets=1) for user in waiting_users + [self.user]
+        ])
+        facets.rebuild()
+        stats.rebuild()
+        return {
+            'events': events,
+            'event': events[0],
+            'sold_out': events[1],
+            'booking': bookings[0],
+            'unpaid': Booking.objects.create(user=self.user, event=events[0], number_of_tickets=1),
+            'entry': entries[-1],
+            'job': Job.objects.create(kind='cancel_event', created_by=self.manager, status='done'),
+            'staff_access': self.get_tokens_for_user(
+                User.objects.create_user(username='staff', email='staff@example.com', password='x', is_staff=True)
+            )['access'],
+        }
+
+    def as_user(self):
+        self.client.credentials(HTTP_AUTHORIZATION='Bearer ' + self.user_tokens['access'])
+
+    def as_manager(self):
+        self.client.credentials(HTTP_AUTHORIZATION='Bearer ' + self.manager_tokens['access'])
+
+    def call(self, name, fixture):
+        self.client.credentials()
+        size = len(fixture['events'])
+        if name == 'register':
+            return self.client.post(reverse(name), {
+                'username': 'budget', 'email': 'budget@example.com', 'password': 'Str0ngPassw0rd!',
+                'first_name': 'Budget', 'last_name': 'User'
+            })
+        if name == 'login':
+            return self.client.post(reverse(name), {'username': 'user1', 'password': 'password123'})
+        if name == 'token_refresh':
+            return self.client.post(reverse(name), {'refresh': self.user_tokens['refresh']})
+        if name in ('event-list', 'event-facets'):
+            return self.client.get(reverse(name))
+        if name == 'provision-users':
+            self.client.credentials(HTTP_AUTHORIZATION='Bearer ' + fixture['staff_access'])
+            rows = [
+                {'username': f'corp{index}', 'email': f'corp{index}@example.com', 'password': 'Str0ngPassw0rd!'}
+                for index in range(size)
+            ]
+            return self.client.post(reverse(name), rows, format='json')
+        if name == 'batch':
+            return self.client.post(reverse(name), {'requests': [
+                {'method': 'GET', 'path': reverse('event-list')},
+                {'method': 'GET', 'path': reverse('event-facets')},
+            ]}, format='json')
+
+        self.as_user()
+        if name == 'logout':
+            return self.client.post(reverse(name), {'refresh': self.user_tokens['refresh']})
+        if name == 'book-ticket':
+            return self.client.post(reverse(name), {'event': fixture['event'].id, 'number_of_tickets': 1})
+        if name == 'book-tickets':
+            items = [{'event': event.id, 'number_of_tickets': 1} for event in fixture['events'] if event.id != fixture['sold_out'].id]
+            return self.client.post(reverse(name), {'items': items}, format='json')
+        if name == 'my-bookings':
+            return self.client.get(reverse(name))
+        if name == 'cancel-booking':
+            return self.client.post(reverse(name, kwargs={'booking_id': fixture['booking'].id}))
+        if name == 'join-waitlist':
+            self.as_manager()
+            return self.client.post(reverse(name), {'event': fixture['sold_out'].id, 'number_of_tickets': 1})
+        if name == 'waitlist-entry':
+            return self.client.get(reverse(name, kwargs={'entry_id': fixture['entry'].id}))
+        if name == 'leave-waitlist':
+            return self.client.post(reverse(name, kwargs={'entry_id': fixture['entry'].id}))
+        if name == 'make-payment':
+            booking_id = fixture['unpaid'].id
+            return self.client.post(reverse(name), {
+                'booking': booking_id, 'booking_id': booking_id, 'payment_method': 'Card', 'amount': '10.00'
+            })
+        if name == 'revert-payment':
+            return self.client.post(reverse(name), {'booking_id': fixture['booking'].id, 'reason': 'Refund'})
+
+        self.as_manager()
+        if name == 'create-event':
+            return self.client.post(reverse(name), {
+                'title': 'New Show', 'description': 'Show', 'date': self.event.date.isoformat(), 'time': '10:00',
+                'location': 'Budget Hall', 'category': 'music', 'payment_options': 'Card', 'total_tickets': 10
+            })
+        if name == 'import-events':
+            rows = [
+                {'title': f'Imported {index}', 'description': 'Show', 'date': self.event.date.isoformat(),
+                 'time': f'{index % 24:02d}:00', 'location': 'Import Hall', 'category': 'music',
+                 'payment_options': 'Card', 'total_tickets': 10}
+                for index in range(size)
+            ]
+            return self.client.post(reverse(name), rows, format='json')
+        if name == 'seat-sections':
+            return self.client.get(reverse(name, kwargs={'event_id': fixture['event'].id}))
+        if name == 'cancel-event':
+            response = self.client.post(reverse(name, kwargs={'event_id': fixture['event'].id}))
+            jobs.run_pending()
+            return response
+        if name == 'job-detail':
+            return self.client.get(reverse(name, kwargs={'job_id': fixture['job'].id}))
+        if name == 'audit-log':
+            return self.client.get(reverse(name) + f"?event={fixture['event'].id}")
+        if name in ('event-stats', 'export-events', 'export-bookings'):
+            response = self.client.get(reverse(name))
+            if response.streaming:
+                b''.join(response.streaming_content)
+            return response
+        raise AssertionError(f"No budget request defined for {name!r}")
+
+    def measure(self, name, size):
+        with transaction.atomic():
+            fixture = self.build_fixture(size)
+            start = timer.perf_counter()
+            with CaptureQueriesContext(connection) as queries:
+                response = self.call(name, fixture)
+            elapsed = (timer.perf_counter() - start) * 1000
+            transaction.set_rollback(True)
+        self.assertLess(response.status_code, 400, f"{name}: {response.status_code} {getattr(response, 'data', '')}")
+        return [query['sql'] for query in queries], elapsed
+
+    def test_every_route_has_a_budget(self):
+        from .urls import urlpatterns
+
+        self.assertEqual({pattern.name for pattern in urlpatterns}, set(QUERY_BUDGETS))
+
+    def test_query_budgets(self):
+        for name, (max_queries, max_ms) in QUERY_BUDGETS.items():
+            with self.subTest(route=name):
+                small, _ = self.measure(name, self.SIZES[0])
+                large, _ = self.measure(name, self.SIZES[-1])
+                if len(large) != len(small):
+                    diff = difflib.unified_diff(
+                        [normalize_sql(sql) for sql in small], [normalize_sql(sql) for sql in large],
+                        f'{name} with {self.SIZES[0]} rows', f'{name} with {self.SIZES[-1]} rows', lineterm=''
+                    )
+                    self.fail(f"{name}: query count grows with the data\n" + '\n'.join(diff))
+                if len(large) > max_queries:
+                    listing = '\n'.join(f'{index}. {sql}' for index, sql in enumerate(large, 1))
+                    self.fail(
+                        f"{name}: {len(large)} queries against a budget of {max_queries} "
+                        f"(+{len(large) - max_queries})\n{listing}"
+                    )
+
+    @skipUnless(settings.QUERY_BUDGET_TIMINGS, 'The QUERY_BUDGET_TIMINGS setting is off')
+    def test_time_budgets(self):
+        for name, (_, max_ms) in QUERY_BUDGETS.items():
+            with self.subTest(route=name):
+                _, baseline = self.measure(name, self.SIZES[0])
+                _, elapsed = self.measure(name, self.SIZES[-1])
+                self.assertLessEqual(
+                    elapsed, max_ms,
+                    f"{name}: {elapsed:.0f} ms with {self.SIZES[-1]} rows against a budget of {max_ms} ms "
+                    f"({baseline:.0f} ms with {self.SIZES[0]} rows)"
+                )
+
+    def test_normalize_sql(self):
+        self.assertEqual(
+            normalize_sql("SELECT * FROM api_event WHERE id IN (1, 2, 3) AND title = 'x' LIMIT 21"),
+            'SELECT * FROM api_event WHERE id IN (...) AND title = ? LIMIT ?'
+        )
+
+
+class ReconciliationTests(APITestSetup):
+    def setUp(self):
+        super().setUp()
+        self.directory = tempfile.TemporaryDirectory()
+        self.addCleanup(self.directory.cleanup)
+        self.settlement_path = f'{self.directory.name}/settlement.csv'
+        self.report_path = f'{self.directory.name}/report.csv'
+
+        bookings = Booking.objects.bulk_create([
+            Booking(user=self.user, event=self.event, number_of_tickets=1) for _ in range(6)
+        ])
+        Booking.objects.filter(id=bookings[4].id).update(status='cancelled')
+        self.payments = Payment.objects.bulk_create([
+            Payment(booking=booking, payment_method='Card', amount=Decimal('25.00'), payment_date=timezone.now(),
+                    status='reverted' if index == 2 else 'completed')
+            for index, booking in enumerate(bookings[:5])
+        ])
+        self.bookings = bookings
+
+    def write_settlements(self, rows):
+        with open(self.settlement_path, 'w') as f:
+            f.write('booking_id,amount,status\n')
+            f.writelines(f'{booking_id},{amount},{status}\n' for booking_id, amount, status in rows)
+
+    def write_mismatched_settlements(self):
+        b = self.bookings
+        self.write_settlements([
+            (b[0].id, '25.00', 'settled'),
+            (b[1].id, '20.00', 'settled'),
+            (b[2].id, '25.00', 'settled'),
+            (b[4].id, '25', 'settled'),
+            (b[5].id, '25.00', 'settled'),
+        ])
+
+    def test_reports_each_discrepancy(self):
+        self.write_mismatched_settlements()
+        totals = reconcile(self.settlement_path, self.report_path, workers=1, partitions=3)
+        self.assertEqual(totals, {
+            'matched': 1, 'amount_mismatch': 1, 'status_mismatch': 1, 'missing_settlement': 1,
+            'cancelled_booking_charged': 1, 'missing_payment': 1,
+        })
+        with open(self.report_path) as f:
+            rows = {int(row['booking_id']): row for row in csv.DictReader(f)}
+        self.assertEqual(rows[self.bookings[1].id]['issue'], 'amount_mismatch')
+        self.assertEqual(rows[self.bookings[1].id]['settled_amount'], '20.00')
+        self.assertEqual(rows[self.bookings[3].id]['issue'], 'missing_settlement')
+        self.assertEqual(rows[self.bookings[5].id]['payment_id'], '')
+        self.assertNotIn(self.bookings[0].id, rows)
+
+    def test_matching_settlement_file_is_clean(self):
+        Booking.objects.filter(id=self.bookings[4].id).update(status='booked')
+        write_settlement_file(self.settlement_path)
+        totals = reconcile(self.settlement_path, self.report_path, workers=1)
+        self.assertEqual(totals, {'matched': 5})
+
+    def test_process_pool_matches_inline_run(self):
+        self.write_mismatched_settlements()
+        inline = reconcile(self.settlement_path, self.report_path, workers=1, partitions=4)
+        pooled = reconcile(self.settlement_path, self.report_path, workers=2, partitions=4)
+        self.assertEqual(inline, pooled)
+
+    def test_process_pool_works_under_spawn(self):
+        # Spawned workers start without Django set up, so the join they
+        # import must not touch the app registry
+        self.write_mismatched_settlements()
+        inline = reconcile(self.settlement_path, self.report_path, workers=1, partitions=4)
+        spawn_pool = functools.partial(ProcessPoolExecutor, mp_context=multiprocessing.get_context('spawn'))
+        with mock.patch('api.reconciliation.ProcessPoolExecutor', spawn_pool):
+            pooled = reconcile(self.settlement_path, self.report_path, workers=2, partitions=4)
+        self.assertEqual(inline, pooled)
+
+    def test_reports_duplicate_settlement(self):
+        Booking.objects.filter(id=self.bookings[4].id).update(status='booked')
+        write_settlement_file(self.settlement_path)
+        with open(self.settlement_path, 'a') as f:
+            f.write(f'{self.bookings[0].id},25.00,settled\n\n')
+        totals = reconcile(self.settlement_path, self.report_path, workers=1, partitions=3)
+        self.assertEqual(totals, {'matched': 5, 'duplicate_settlement': 1})
+        with open(self.report_path) as f:
+            rows = list(csv.DictReader(f))
+        self.assertEqual([(int(row['booking_id']), row['issue']) for row in rows],
+                         [(self.bookings[0].id, 'duplicate_settlement')])
+
+    def test_rejects_malformed_settlement_rows(self):
+        for row, message in (('1,25.00', 'Line 3: expected 3 columns'), ('x,25.00,settled', 'Line 3: booking_id')):
+            with open(self.settlement_path, 'w') as f:
+                f.write(f'booking_id,amount,status\n{self.bookings[0].id},25.00,settled\n{row}\n')
+            with self.assertRaisesMessage(CommandError, message):
+                call_command('reconcile_payments', self.settlement_path, report=self.report_path,
+                             workers=1, stdout=io.StringIO())
+
+    def test_command_rejects_bad_settlement_file(self):
+        with open(self.settlement_path, 'w') as f:
+            f.write('id,total\n1,2\n')
+        with self.assertRaises(CommandError):
+            call_command('reconcile_payments', self.settlement_path, report=self.report_path, stdout=io.StringIO())
+
+
+@override_settings(AUDIT_FLUSH_SIZE=500, AUDIT_FLUSH_INTERVAL=3600)
+class AuditLogTests(APITestSetup):
+    def book(self):
+        self.client.credentials(HTTP_AUTHORIZATION='Bearer ' + self.user_tokens['access'])
+        with self.captureOnCommitCallbacks(execute=True):
+            response = self.client.post(reverse('book-ticket'), {'event': self.event.id, 'number_of_tickets': 1})
+        return response.data['id']
+
+    def test_changes_are_buffered_until_flush(self):
+        booking_id = self.book()
+        with self.captureOnCommitCallbacks(execute=True):
+            self.client.post(reverse('cancel-booking', kwargs={'booking_id': booking_id}))
+        self.assertFalse(AuditEvent.objects.exists())
+
+        self.assertEqual(audit.flush(), 2)
+        self.assertEqual(
+            list(AuditEvent.objects.order_by('id').values_list('entity', 'from_status', 'to_status', 'user_id')),
+            [('booking', '', 'booked', self.user.id), ('booking', 'booked', 'cancelled', self.user.id)]
+        )
+
+    def test_size_threshold_and_failed_flush(self):
+        with self.settings(AUDIT_FLUSH_SIZE=2):
+            self.book()
+            with mock.patch('api.audit.AuditEvent.objects.bulk_create', side_effect=DatabaseError):
+                self.book()
+            self.assertFalse(AuditEvent.objects.exists())
+            self.book()
+        self.assertEqual(AuditEvent.objects.count(), 3)
+
+    def test_failed_flush_into_a_full_buffer_keeps_the_newest_rows(self):
+        booking_ids = []
+        with self.settings(AUDIT_BUFFER_CAPACITY=2):
+            audit.reset()
+            booking_ids.append(self.book())
+            with mock.patch('api.audit.AuditEvent.objects.bulk_create', side_effect=DatabaseError):
+                audit.flush()
+            booking_ids.append(self.book())
+            booking_ids.append(self.book())
+            audit.flush()
+        self.assertEqual(
+            set(AuditEvent.objects.filter(entity_id__in=booking_ids).values_list('entity_id', flat=True)),
+            set(booking_ids[1:])
+        )
+
+    def test_background_thread_writes_the_buffer(self):
+        with self.settings(AUDIT_FLUSH_IN_BACKGROUND=True, AUDIT_FLUSH_SIZE=2), \
+                mock.patch.object(audit, '_flusher_pid', None), \
+                mock.patch('api.audit.threading.Thread') as thread:
+            self.addCleanup(audit._wake.clear)
+            self.book()
+            thread.assert_called_once_with(target=audit._run_flusher, name='audit-flush', daemon=True)
+            self.assertFalse(audit._wake.is_set())
+            self.book()
+            self.assertEqual(thread.call_count, 1)
+            # The request only wakes the thread
+            self.assertTrue(audit._wake.is_set())
+            self.assertFalse(AuditEvent.objects.exists())
+
+        with mock.patch('api.audit.close_old_connections') as close:
+            audit._flush_in_background()
+        close.assert_called_once()
+        self.assertEqual(AuditEvent.objects.count(), 2)
+
+    def test_rolled_back_changes_are_not_recorded(self):
+        with self.captureOnCommitCallbacks(execute=True):
+            with transaction.atomic():
+                audit.booking_changed([Booking(id=1, event_id=self.event.id, user_id=self.user.id)], 'booked')
+                transaction.set_rollback(True)
+        self.assertEqual(audit.flush(), 0)
+
+    def test_spool_survives_a_lost_buffer(self):
+        with tempfile.TemporaryDirectory() as directory, self.settings(AUDIT_SPOOL_DIR=directory):
+            self.book()
+            self.book()
+            # The process dies before flushing
+            audit.reset()
+            call_command('flush_audit_log', stdout=io.StringIO())
+            self.assertEqual(AuditEvent.objects.count(), 2)
+            self.assertEqual(os.listdir(directory), [])
+            self.assertEqual(audit.replay_spool(), 0)
+
+    def test_query_endpoint(self):
+        booking_id = self.book()
+        audit.flush()
+        url = reverse('audit-log')
+        self.assertEqual(self.client.get(url).status_code, status.HTTP_400_BAD_REQUEST)
+        response = self.client.get(url + f'?booking={booking_id}')
+        self.assertEqual([row['to_status'] for row in response.data], ['booked'])
+
+        self.client.credentials(HTTP_AUTHORIZATION='Bearer ' + self.manager_tokens['access'])
+        self.assertEqual(len(self.client.get(url + f'?event={self.event.id}').data), 1)
+        self.assertEqual(len(self.client.get(url + f'?user={self.user.id}').data), 1)
+        other = User.objects.create_user(username='other', email='other@example.com', password='password123')
+        self.client.force_authenticate(other)
+        self.assertEqual(self.client.get(url + f'?event={self.event.id}').data, [])
+
+
+class AdminChangelistTests(APITestSetup):
+    def setUp(self):
+        super().setUp()
+        self.admin = User.objects.create_superuser(
+            username='admin', email='admin@example.com', password='password123'
+        )
+        self.client.force_login(self.admin)
+
+    def add_bookings(self, count):
+        bookings = Booking.objects.bulk_create(
+            Booking(user=self.user, event=self.event, number_of_tickets=1) for _ in range(count)
+        )
+        Payment.objects.bulk_create(
+            Payment(booking=booking, payment_method='card', amount=Decimal('10.00')) for booking in bookings
+        )
+        return bookings
+
+    def changelist(self, model, query=''):
+        with CaptureQueriesContext(connection) as queries:
+            response = self.client.get(reverse(f'admin:api_{model}_changelist') + query)
+        self.assertEqual(response.status_code, status.HTTP_200_OK)
+        return response, queries
+
+    def test_changelist_queries_do_not_grow_with_rows(self):
+        for model in ('user', 'event', 'booking', 'payment'):
+            self.add_bookings(2)
+            _, small = self.changelist(model)
+            self.add_bookings(20)
+            _, large = self.changelist(model)
+            self.assertEqual(len(small), len(large), model)
+
+    def test_counts_are_bounded(self):
+        self.add_bookings(5)
+        with self.settings(ADMIN_COUNT_LIMIT=3):
+            response, queries = self.changelist('booking')
+        self.assertEqual(response.context['cl'].result_count, 3)
+        counts = [query['sql'] for query in queries if 'COUNT(' in query['sql']]
+        self.assertTrue(counts)
+        self.assertTrue(all('LIMIT' in sql for sql in counts), counts)
+
+    def test_older_entries_link_pages_by_id(self):
+        bookings = self.add_bookings(3)
+        with mock.patch.object(admin.site._registry[Booking], 'list_per_page', 2):
+            response, _ = self.changelist('booking')
+            self.assertEqual([b.id for b in response.context['cl'].result_list], [bookings[2].id, bookings[1].id])
+            self.assertContains(response, f'?id__lt={bookings[1].id}')
+
+            response, queries = self.changelist('booking', f'?id__lt={bookings[1].id}')
+            self.assertEqual([b.id for b in response.context['cl'].result_list], [bookings[0].id])
+            self.assertIsNone(response.context['cl'].next_page_url)
+            self.assertFalse(any('OFFSET' in query['sql'] for query in queries))
+
+    def test_status_filter(self):
+        bookings = self.add_bookings(2)
+        Booking.objects.filter(id=bookings[0].id).update(status='cancelled')
+        response, _ = self.changelist('booking', '?status__exact=cancelled')
+        self.assertEqual([b.id for b in response.context['cl'].result_list], [bookings[0].id])
+
+    def test_change_form_uses_raw_id_widgets(self):
+        response = self.client.get(reverse('admin:api_event_change', args=[self.event.id]))
+        self.assertEqual(response.status_code, status.HTTP_200_OK)
+        self.assertNotContains(response, '<select name="created_by"')
+        self.assertContains(response, 'vForeignKeyRawIdAdminField')
+
+    def test_counters_cannot_be_changed_outside_the_lifecycle(self):
+        booking = self.add_bookings(1)[0]
+        for model, obj_id in (('event', self.event.id), ('booking', booking.id), ('payment', booking.payment.id)):
+            response = self.client.get(reverse(f'admin:api_{model}_change', args=[obj_id]))
+            self.assertNotContains(response, 'name="available_tickets"')
+            self.assertNotContains(response, 'name="status"')
+            self.assertNotContains(response, 'name="first_seat"')
+            self.assertEqual(
+                self.client.post(reverse(f'admin:api_{model}_delete', args=[obj_id]), {'post': 'yes'}).status_code,
+                status.HTTP_403_FORBIDDEN
+            )
+            self.assertEqual(self.client.get(reverse(f'admin:api_{model}_add')).status_code, status.HTTP_403_FORBIDDEN)
+        self.assertTrue(Booking.objects.filter(id=booking.id).exists())
+
+
+class EventRangeFilterTests(APITestSetup):
+    def setUp(self):
+        super().setUp()
+        today = timezone.now().date()
+        self.past = self.create_event('Past', today - timedelta(days=3), 100)
+        self.sold_out = self.create_event('Sold Out', today + timedelta(days=4), 0)
+        self.later = self.create_event('Later', today + timedelta(days=40), 50)
+
+    def create_event(self, title, day, available):
+        return Event.objects.create(
+            title=title, description=title, date=day, time=time(18, 0), location='Hall', category='music',
+            payment_options='Card', created_by=self.manager, total_tickets=100, available_tickets=available,
+        )
+
+    def titles(self, query):
+        response = self.client.get(reverse('event-list') + query)
+        self.assertEqual(response.status_code, status.HTTP_200_OK)
+        return sorted(event['title'] for event in response.data)
+
+    def plan(self, query):
+        with CaptureQueriesContext(connection) as queries:
+            self.client.get(reverse('event-list') + query)
+        sql = next(q['sql'] for q in queries if 'FROM "api_event"' in q['sql'])
+        with connection.cursor() as cursor:
+            cursor.execute(connection.ops.explain_query_prefix() + ' ' + sql)
+            return ' '.join(str(column) for row in cursor.fetchall() for column in row)
+
+    def test_date_range(self):
+        today = timezone.now().date()
+        self.assertEqual(self.titles(f'?date__gte={today}&date__lte={today + timedelta(days=10)}'),
+                         ['Concert', 'Sold Out'])
+        self.assertEqual(self.titles(f'?date__lte={today}'), ['Past'])
+
+    def test_available_only(self):
+        today = timezone.now().date()
+        self.assertEqual(self.titles(f'?category=music&date__gte={today}&available_only=true'), ['Concert', 'Later'])
+        self.assertEqual(self.titles('?available_only=false'), ['Concert', 'Later', 'Past', 'Sold Out'])
+
+    def test_invalid_values_are_rejected(self):
+        for query in ('?date__gte=soon', '?date__lte=2024-13-01', '?category=opera'):
+            response = self.client.get(reverse('event-list') + query)
+            self.assertEqual(response.status_code, status.HTTP_400_BAD_REQUEST, query)
+
+    def test_filters_apply_to_archived_events(self):
+        archive_past_events(timezone.now().date())
+        today = timezone.now().date()
+        self.assertEqual(self.titles(f'?date__lte={today}'), [])
+        self.assertEqual(self.titles(f'?date__lte={today}&include_archived=true'), ['Past'])
+
+    @skipUnless(connection.vendor == 'sqlite', 'Query plan format is SQLite specific')
+    def test_query_plans_use_indexes(self):
+        today = timezone.now().date()
+        self.assertIn('event_available_idx', self.plan(f'?category=music&date__gte={today}&available_only=true'))
+        self.assertIn('event_category_date_idx', self.plan(f'?category=music&date__gte={today}'))
+        self.assertIn('event_date_idx', self.plan(f'?date__gte={today}&date__lte={today + timedelta(days=7)}'))
+
+
+@override_settings(PASSWORD_HASH_ITERATIONS=1000)
+class UserProvisioningTests(APITestSetup):
+    def setUp(self):
+        super().setUp()
+        self.staff = User.objects.create_user(
+            username='staff', email='staff@example.com', password='password123', is_staff=True
+        )
+
+    def rows(self, count, prefix='corp'):
+        return [
+            {'username': f'{prefix}{index}', 'email': f'{prefix}{index}@example.com', 'password': f'Str0ng-{index}!x'}
+            for index in range(count)
+        ]
+
+    def test_registration_is_a_single_write(self):
+        data = {'username': 'solo', 'email': 'solo@example.com', 'password': 'Str0ngPassw0rd!'}
+        with CaptureQueriesContext(connection) as queries:
+            response = self.client.post(reverse('register'), data)
+        self.assertEqual(response.status_code, status.HTTP_201_CREATED)
+        user_queries = [query['sql'] for query in queries if '"api_user"' in query['sql']]
+        self.assertEqual(len(user_queries), 1)
+        self.assertTrue(user_queries[0].startswith('INSERT'))
+
+    def test_registration_reports_taken_username(self):
+        data = {'username': 'user1', 'email': 'fresh@example.com', 'password': 'Str0ngPassw0rd!'}
+        response = self.client.post(reverse('register'), data)
+        self.assertEqual(response.status_code, status.HTTP_400_BAD_REQUEST)
+        self.assertEqual(set(response.data), {'username'})
+        self.assertFalse(User.objects.filter(email='fresh@example.com').exists())
+
+    def test_bulk_endpoint(self):
+        rows = self.rows(3) + [
+            {'username': 'clash', 'email': 'user1@example.com', 'password': 'Str0ngPassw0rd!'},
+            {'username': 'corp0', 'email': 'again@example.com', 'password': 'Str0ngPassw0rd!'},
+            {'username': 'bad', 'email': 'not-an-email', 'password': 'Str0ngPassw0rd!'},
+        ]
+        self.client.force_authenticate(self.staff)
+        with CaptureQueriesContext(connection) as queries:
+            response = self.client.post(reverse('provision-users'), rows, format='json')
+        self.assertEqual(response.status_code, status.HTTP_201_CREATED)
+        self.assertEqual(response.data['created'], 3)
+        self.assertEqual([error['row'] for error in response.data['errors']], [3, 4, 5])
+        self.assertEqual(set(response.data['errors'][0]['errors']), {'email'})
+        self.assertEqual(set(response.data['errors'][1]['errors']), {'username'})
+        self.assertEqual(sum('SELECT' in query['sql'] and '"api_user"' in query['sql'] for query in queries), 1)
+        for index, user in enumerate(User.objects.filter(id__in=response.data['ids']).order_by('id')):
+            self.assertTrue(user.check_password(f'Str0ng-{index}!x'))
+
+    @mock.patch('api.provisioning.PROVISION_HTTP_MAX_ROWS', 2)
+    def test_bulk_endpoint_rejects_large_imports(self):
+        self.client.force_authenticate(self.staff)
+        with mock.patch.object(hashing, 'make_passwords') as make_passwords:
+            response = self.client.post(reverse('provision-users'), self.rows(3), format='json')
+        self.assertEqual(response.status_code, status.HTTP_400_BAD_REQUEST)
+        self.assertIn('provision_users command', response.data['detail'])
+        make_passwords.assert_not_called()
+        self.assertFalse(User.objects.filter(username__startswith='corp').exists())
+
+    def test_bulk_endpoint_is_staff_only(self):
+        self.client.force_authenticate(self.manager)
+        response = self.client.post(reverse('provision-users'), self.rows(1), format='json')
+        self.assertEqual(response.status_code, status.HTTP_403_FORBIDDEN)
+        self.assertFalse(User.objects.filter(username='corp0').exists())
+
+    def test_command_hashes_every_password_on_the_pool(self):
+        with tempfile.TemporaryDirectory() as directory:
+            path = os.path.join(directory, 'users.csv')
+            with open(path, 'w', newline='') as csv_file:
+                writer = csv.DictWriter(csv_file, fieldnames=['username', 'email', 'password'])
+                writer.writeheader()
+                writer.writerows(self.rows(6, prefix='cmd'))
+            with mock.patch.object(hashing, '_submit', wraps=hashing._submit) as submit:
+                out = io.StringIO()
+                call_command('provision_users', path, stdout=out, stderr=io.StringIO())
+        self.assertEqual(submit.call_count, 6)
+        self.assertIn('Created 6 users', out.getvalue())
+        self.assertTrue(User.objects.get(username='cmd5').check_password('Str0ng-5!x'))
+
+    @mock.patch('api.management.commands.provision_users.PROVISION_MAX_ROWS', 3)
+    def test_command_rejects_files_over_its_limit(self):
+        with tempfile.TemporaryDirectory() as directory:
+            path = os.path.join(directory, 'users.csv')
+            with open(path, 'w', newline='') as csv_file:
+                writer = csv.DictWriter(csv_file, fieldnames=['username', 'email', 'password'])
+                writer.writeheader()
+                writer.writerows(self.rows(4, prefix='cmd'))
+            with self.assertRaisesMessage(CommandError, 'At most 3 users'):
+                call_command('provision_users', path, stdout=io.StringIO(), stderr=io.StringIO())
+        self.assertFalse(User.objects.filter(username__startswith='cmd').exists())
+
+    def test_command_reports_busy_hashing_pool(self):
+        with tempfile.TemporaryDirectory() as directory:
+            path = os.path.join(directory, 'users.csv')
+            with open(path, 'w', newline='') as csv_file:
+                writer = csv.DictWriter(csv_file, fieldnames=['username', 'email', 'password'])
+                writer.writeheader()
+                writer.writerows(self.rows(2, prefix='cmd'))
+            with mock.patch.object(hashing, 'make_passwords', side_effect=hashing.HashingBusy):
+                with self.assertRaisesMessage(CommandError, 'busy'):
+                    call_command('provision_users', path, stdout=io.StringIO(), stderr=io.StringIO())
+        self.assertFalse(User.objects.filter(username__startswith='cmd').exists())
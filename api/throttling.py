@@ -0,0 +1,134 @@
+import threading
+import time
+from collections import OrderedDict
+
+from django.conf import settings
+from django.core.cache import caches
+from rest_framework.throttling import BaseThrottle
+
+PERIODS = {'s': 1, 'm': 60, 'h': 3600, 'd': 86400}
+
+
+def parse_rate(rate):
+    """
+    Parses ``'<requests>/<period>'`` (e.g. ``'10/min'``) into the bucket
+    capacity and its refill rate in tokens per second.
+    """
+    num, period = rate.split('/')
+    capacity = int(num)
+    return capacity, capacity / PERIODS[period[0]]
+
+
+class LocalBucketStore:
+    """
+    Token buckets for this process, as ``key -> (tokens, timestamp, full_at)``
+    in an LRU ordered dict capped at ``max_keys`` entries.
+
+    Only buckets that have refilled completely are evicted, since a dropped
+    bucket comes back full. When the least recently used bucket is still
+    refilling, requests for new keys are refused until it is full, so
+    flooding the store with new keys cannot reset a bucket.
+    """
+
+    def __init__(self, max_keys=100000):
+        self.max_keys = max_keys
+        self._buckets = OrderedDict()
+        self._lock = threading.Lock()
+
+    def consume(self, key, capacity, refill_rate, now):
+        """
+        Takes one token from the bucket. Returns 0 if the request is allowed,
+        otherwise the number of seconds until a token is available.
+        """
+        with self._lock:
+            if key not in self._buckets and len(self._buckets) >= self.max_keys:
+                full_at = next(iter(self._buckets.values()))[2]
+                if full_at > now:
+                    return full_at - now
+                self._buckets.popitem(last=False)
+            tokens, stamp, _ = self._buckets.pop(key, (capacity, now, now))
+            tokens, wait = _take(tokens, stamp, capacity, refill_rate, now)
+            self._buckets[key] = (tokens, now, now + (capacity - tokens) / refill_rate)
+        return wait
+
+    def clear(self):
+        with self._lock:
+            self._buckets.clear()
+
+
+class CacheBucketStore:
+    """
+    Token buckets kept in a Django cache so that every worker shares them.
+    Read-modify-write is not atomic, so limits are approximate under heavy
+    concurrency. A bucket the cache evicts early comes back full, so the
+    cache must be sized for the number of active clients.
+
+    Bucket keys carry a generation number. ``clear()`` bumps it, which
+    orphans every bucket without touching the other entries of a shared
+    cache; the orphans expire on their own.
+    """
+    GENERATION_KEY = 'throttle:generation'
+
+    def __init__(self, alias='default'):
+        self.cache = caches[alias]
+
+    def consume(self, key, capacity, refill_rate, now):
+        key = f'throttle:{self.cache.get_or_set(self.GENERATION_KEY, 1, timeout=None)}:{key}'
+        tokens, stamp = self.cache.get(key, (capacity, now))
+        tokens, wait = _take(tokens, stamp, capacity, refill_rate, now)
+        # A bucket left alone for this long is full again and can be dropped
+        self.cache.set(key, (tokens, now), timeout=int(capacity / refill_rate) + 1)
+        return wait
+
+    def clear(self):
+        try:
+            self.cache.incr(self.GENERATION_KEY)
+        except ValueError:
+            # No bucket has been written yet
+            pass
+
+
+def _take(tokens, stamp, capacity, refill_rate, now):
+    tokens = min(capacity, tokens + (now - stamp) * refill_rate)
+    if tokens >= 1:
+        return tokens - 1, 0
+    return tokens, (1 - tokens) / refill_rate
+
+
+_local_store = LocalBucketStore()
+
+
+def get_store():
+    alias = getattr(settings, 'RATE_LIMIT_CACHE', None)
+    return CacheBucketStore(alias) if alias else _local_store
+
+
+def get_rate_limits():
+    from .urls import RATE_LIMITS
+    return RATE_LIMITS
+
+
+class TokenBucketThrottle(BaseThrottle):
+    """
+    Applies the per-URL-name limits of ``api.urls.RATE_LIMITS``. Buckets are
+    keyed by endpoint and user, or by client IP for anonymous requests. The
+    IP only comes from ``X-Forwarded-For`` as far as ``NUM_PROXIES`` trusted
+    proxies allow. Routes without a limit are not throttled.
+    """
+
+    def allow_request(self, request, view):
+        match = request.resolver_match
+        rate = get_rate_limits().get(match.url_name) if match is not None else None
+        if rate is None:
+            return True
+
+        capacity, refill_rate = parse_rate(rate)
+        if request.user and request.user.is_authenticated:
+            key = f'{match.url_name}:user:{request.user.pk}'
+        else:
+            key = f'{match.url_name}:ip:{self.get_ident(request)}'
+        self._wait = get_store().consume(key, capacity, refill_rate, time.time())
+        return self._wait == 0
+
+    def wait(self):
+        return self._wait
@@ -2,23 +2,48 @@ from django.urls import path
 from .views import (
     RegisterView, LoginView, LogoutView, CreateEventView,
     EventListView, BookTicketView, MyBookingsView,
-    CancelBookingView, MakePaymentView, RevertPaymentView, CancelEventView
+    CancelBookingView, MakePaymentView, RevertPaymentView, CancelEventView,
+    ExportEventsView, ExportBookingsView, ImportEventsView, ProvisionUsersView,
+    BulkBookTicketsView, JoinWaitlistView, WaitlistEntryView, LeaveWaitlistView,
+    SeatSectionListCreateView, EventFacetsView, EventSalesStatsView, BatchView, JobDetailView, AuditLogView
 )
 from rest_framework_simplejwt.views import (
     TokenRefreshView,
 )
 
+# Token bucket limits per URL name, as '<requests>/<period>' (see api.throttling)
+RATE_LIMITS = {
+    'register': '5/min',
+    'login': '10/min',
+    'book-ticket': '30/min',
+    'book-tickets': '10/min',
+}
+
 urlpatterns = [
     path('register/', RegisterView.as_view(), name='register'),
     path('login/', LoginView.as_view(), name='login'),
+    path('users/bulk/', ProvisionUsersView.as_view(), name='provision-users'),
     path('logout/', LogoutView.as_view(), name='logout'),
     path('create-event/', CreateEventView.as_view(), name='create-event'),
+    path('import-events/', ImportEventsView.as_view(), name='import-events'),
+    path('seat-sections/<int:event_id>/', SeatSectionListCreateView.as_view(), name='seat-sections'),
     path('events/', EventListView.as_view(), name='event-list'),
+    path('event-facets/', EventFacetsView.as_view(), name='event-facets'),
     path('book-ticket/', BookTicketView.as_view(), name='book-ticket'),
+    path('book-tickets/', BulkBookTicketsView.as_view(), name='book-tickets'),
     path('my-bookings/', MyBookingsView.as_view(), name='my-bookings'),
     path('cancel-booking/<int:booking_id>/', CancelBookingView.as_view(), name='cancel-booking'),
+    path('join-waitlist/', JoinWaitlistView.as_view(), name='join-waitlist'),
+    path('waitlist/<int:entry_id>/', WaitlistEntryView.as_view(), name='waitlist-entry'),
+    path('leave-waitlist/<int:entry_id>/', LeaveWaitlistView.as_view(), name='leave-waitlist'),
     path('make-payment/', MakePaymentView.as_view(), name='make-payment'),
     path('revert-payment/', RevertPaymentView.as_view(), name='revert-payment'),
     path('token/refresh/', TokenRefreshView.as_view(), name='token_refresh'),
     path('cancel-event/<int:event_id>/', CancelEventView.as_view(), name='cancel-event'),
+    path('jobs/<int:job_id>/', JobDetailView.as_view(), name='job-detail'),
+    path('event-stats/', EventSalesStatsView.as_view(), name='event-stats'),
+    path('audit-log/', AuditLogView.as_view(), name='audit-log'),
+    path('export-events/', ExportEventsView.as_view(), name='export-events'),
+    path('export-bookings/', ExportBookingsView.as_view(), name='export-bookings'),
+    path('batch/', BatchView.as_view(), name='batch'),
 ]
\ No newline at end of file
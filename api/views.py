@@ -1,23 +1,195 @@
-from django.conf import settings
-from django.core.mail import send_mail
-from django.shortcuts import render
+import base64
+import csv
+import json
+from datetime import date, datetime, time
+from decimal import Decimal
+
+from django.db import IntegrityError, transaction
+from django.db.models import BooleanField, Q, Value, prefetch_related_objects
+from django.http import Http404, StreamingHttpResponse
 from rest_framework_simplejwt.views import TokenObtainPairView
 from rest_framework.permissions import AllowAny
 
-from . import serializers
-from .models import User, Event, Booking
+from . import facets, jobs, lifecycle, stats, waitlist
+from .filters import EventFilter
+from .exports import BOOKING_EXPORT_FIELDS, EVENT_EXPORT_FIELDS, iter_csv, iter_ndjson
+from .idempotency import IdempotencyMixin
+from .models import User, Event, Booking, WaitlistEntry, SeatSection, EventSalesStats, ArchivedEvent, \
+    ArchivedBooking, Job, AuditEvent
 from .serializers import RegisterSerializer, LoginSerializer, LogoutSerializer, EventSerializer, EventListSerializer, \
-    BookingSerializer, BookingDetailSerializer, PaymentSerializer, RevertPaymentSerializer
+    BookingSerializer, BookingDetailSerializer, PaymentSerializer, RevertPaymentSerializer, BulkBookingSerializer, \
+    WaitlistEntrySerializer, SeatSectionSerializer, EventSalesStatsSerializer, BatchSerializer, JobSerializer, \
+    AuditEventSerializer
 from .permissions import IsEventManager
 from rest_framework import generics, status, permissions, filters
+from rest_framework.exceptions import ValidationError
 from rest_framework.response import Response
+from rest_framework.utils.urls import replace_query_param
 from rest_framework.views import APIView
 from django_filters.rest_framework import DjangoFilterBackend
 from django.shortcuts import get_object_or_404
+from django.utils import timezone
+from django.urls import reverse
 
 
 # Create your views here.
 
+class SparseFieldsetMixin:
+    """
+    Supports ``?fields=a,b`` and ``?omit=c`` on list views. The selection trims
+    the serializer output and the SQL column list (``only()``).
+    """
+
+    def get_selected_fields(self):
+        if not hasattr(self, '_selected_fields'):
+            available = list(self.get_serializer_class()().fields)
+            params = self.request.query_params
+            requested = _split_param(params.get('fields')) or available
+            omitted = _split_param(params.get('omit'))
+            unknown = [name for name in requested + omitted if name not in available]
+            if unknown:
+                raise ValidationError({'detail': f"Unknown field(s): {', '.join(unknown)}."})
+            self._selected_fields = [name for name in requested if name not in omitted]
+        return self._selected_fields
+
+    def get_serializer_context(self):
+        context = super().get_serializer_context()
+        context['selected_fields'] = self.get_selected_fields()
+        return context
+
+    def get_queryset(self):
+        return self.apply_fieldset(super().get_queryset())
+
+    def apply_fieldset(self, queryset):
+        model_fields = {field.name for field in queryset.model._meta.concrete_fields}
+        columns = [name for name in self.get_selected_fields() if name in model_fields]
+        return queryset.only('pk', *columns)
+
+
+class IncludeArchivedMixin:
+    """
+    Adds the matching rows of the archive tables when the request has
+    ``?include_archived=true``. Otherwise only the hot tables are queried.
+
+    Both tables are filtered the same way and combined with one
+    ``UNION ALL``, so ``?ordering=`` and pagination apply to the combined
+    result in SQL. Without an ordering, hot rows come first. Subclasses must
+    define ``get_archived_queryset()``.
+
+    Without a pagination class, the combined rows are returned
+    ``archive_page_size`` at a time. The ``Link`` header of a full page
+    points to the next one, which continues after the page's last
+    ``(ordering, id)`` instead of using an offset.
+    """
+    ARCHIVED_FLAG = 'is_archived'
+    archive_page_size = 100
+
+    def __init_subclass__(cls, **kwargs):
+        super().__init_subclass__(**kwargs)
+        if not callable(getattr(cls, 'get_archived_queryset', None)):
+            raise TypeError(f"{cls.__name__} must define get_archived_queryset().")
+
+    def list(self, request, *args, **kwargs):
+        if request.query_params.get('include_archived', '').lower() not in ('1', 'true'):
+            return super().list(request, *args, **kwargs)
+
+        hot = self.filter_queryset(self.get_queryset())
+        archived = self.filter_queryset(self.get_archived_queryset())
+        archived_columns = {field.attname for field in archived.model._meta.concrete_fields}
+        columns = [
+            field.attname for field in hot.model._meta.concrete_fields if field.attname in archived_columns
+        ]
+        ordering = [*hot.query.order_by] or [self.ARCHIVED_FLAG]
+        related = list(hot.query.select_related) if isinstance(hot.query.select_related, dict) else []
+
+        def rows(queryset, flag):
+            return (
+                queryset.select_related(None).order_by()
+                .annotate(**{self.ARCHIVED_FLAG: Value(flag, output_field=BooleanField())})
+                .values_list(*columns, self.ARCHIVED_FLAG)
+            )
+
+        if self.paginator is not None:
+            combined = rows(hot, False).union(rows(archived, True), all=True).order_by(*ordering, 'id')
+            page = self.paginate_queryset(combined)
+            serializer = self.get_serializer(self.load_rows(page, hot, archived, columns, related), many=True)
+            return self.get_paginated_response(serializer.data)
+
+        # Sort keys by selected column, e.g. created_by -> created_by_id
+        keys = [
+            (name if name == self.ARCHIVED_FLAG else hot.model._meta.get_field(name).attname, descending)
+            for name, descending in ((name.lstrip('-'), name.startswith('-')) for name in [*ordering, 'id'])
+        ]
+        after = self.decode_cursor(request, len(keys))
+        hot_rows, archived_rows = rows(hot, False), rows(archived, True)
+        if after is not None:
+            hot_rows = hot_rows.filter(after_key(keys, after))
+            archived_rows = archived_rows.filter(after_key(keys, after))
+        combined = hot_rows.union(archived_rows, all=True).order_by(*ordering, 'id')
+        page = list(combined[:self.archive_page_size])
+        serializer = self.get_serializer(self.load_rows(page, hot, archived, columns, related), many=True)
+        response = Response(serializer.data)
+        if len(page) == self.archive_page_size:
+            names = [*columns, self.ARCHIVED_FLAG]
+            last = [page[-1][names.index(name)] for name, _ in keys]
+            cursor = base64.urlsafe_b64encode(json.dumps(last, default=_cursor_value).encode()).decode()
+            response['Link'] = f'<{replace_query_param(request.build_absolute_uri(), "cursor", cursor)}>; rel="next"'
+        return response
+
+    @staticmethod
+    def decode_cursor(request, length):
+        cursor = request.query_params.get('cursor')
+        if not cursor:
+            return None
+        try:
+            values = json.loads(base64.urlsafe_b64decode(cursor.encode()))
+        except (ValueError, TypeError):
+            values = None
+        if not isinstance(values, list) or len(values) != length:
+            raise ValidationError({'detail': "Invalid cursor."})
+        return values
+
+    @staticmethod
+    def load_rows(rows, hot, archived, columns, related):
+        # Each row becomes an instance of the model it came from, and the
+        # relations the view selected are fetched per table in one query each
+        objects, by_model = [], {hot.model: [], archived.model: []}
+        for *values, is_archived in rows:
+            model = archived.model if is_archived else hot.model
+            obj = model.from_db(hot.db, columns, values)
+            objects.append(obj)
+            by_model[model].append(obj)
+        if related:
+            for instances in by_model.values():
+                prefetch_related_objects(instances, *related)
+        return objects
+
+
+def _cursor_value(value):
+    # Full precision, unlike DjangoJSONEncoder which cuts times to milliseconds
+    if isinstance(value, (date, time)):
+        return value.isoformat()
+    if isinstance(value, Decimal):
+        return str(value)
+    raise TypeError(f"Cannot encode {type(value).__name__} in a cursor.")
+
+
+def after_key(keys, values):
+    """
+    Matches the rows that sort after ``values`` for ``(name, descending)``
+    sort ``keys``, e.g. ``a > 1 OR (a = 1 AND b > 2)``.
+    """
+    condition = Q(pk__in=[])
+    for index, (name, descending) in enumerate(keys):
+        equal = {prior: value for (prior, _), value in zip(keys[:index], values)}
+        condition |= Q(**equal, **{f'{name}__{"lt" if descending else "gt"}': values[index]})
+    return condition
+
+
+def _split_param(value):
+    return [name.strip() for name in value.split(',') if name.strip()] if value else []
+
+
 class RegisterView(generics.CreateAPIView):
     queryset = User.objects.all()
     permission_classes = [AllowAny]
@@ -48,19 +220,139 @@ class CreateEventView(generics.CreateAPIView):
     permission_classes = [permissions.IsAuthenticated, IsEventManager]
 
     def perform_create(self, serializer):
-        serializer.save(created_by=self.request.user)
+        event = serializer.save(created_by=self.request.user)
+        facets.events_created([event])
+
+
+class ImportEventsView(APIView):
+    """
+    Creates many events at once from a JSON array or an uploaded CSV file
+    (``file`` field). Invalid rows are reported and skipped.
+    """
+    permission_classes = [permissions.IsAuthenticated, IsEventManager]
+
+    def post(self, request):
+        # Imports are rare, so the bulk validation code loads on first use
+        from .imports import IMPORT_MAX_ROWS, import_events, read_csv_rows
+
+        if 'file' in request.FILES:
+            try:
+                rows = read_csv_rows(request.FILES['file'], IMPORT_MAX_ROWS)
+            except (UnicodeDecodeError, csv.Error):
+                return Response({"detail": "Could not read the CSV file."}, status=status.HTTP_400_BAD_REQUEST)
+        else:
+            rows = request.data
+        if not isinstance(rows, list):
+            return Response({"detail": "Expected a list of events or a CSV file."}, status=status.HTTP_400_BAD_REQUEST)
+        if len(rows) > IMPORT_MAX_ROWS:
+            return Response({"detail": f"At most {IMPORT_MAX_ROWS} events can be imported at once."},
+                            status=status.HTTP_400_BAD_REQUEST)
+
+        events, errors = import_events(rows, created_by=request.user)
+        return Response(
+            {"created": len(events), "ids": [event.id for event in events], "errors": errors},
+            status=status.HTTP_201_CREATED if events else status.HTTP_400_BAD_REQUEST
+        )
+
+
+class ProvisionUsersView(APIView):
+    """
+    Creates many user accounts at once from a JSON array or an uploaded CSV
+    file (``file`` field), for corporate ticketing customers. Staff only.
+    Invalid rows and taken usernames or emails are reported and skipped.
+    """
+    permission_classes = [permissions.IsAdminUser]
+
+    def post(self, request):
+        from .imports import read_csv_rows
+        from .provisioning import PROVISION_HTTP_MAX_ROWS, provision_users
+
+        if 'file' in request.FILES:
+            try:
+                rows = read_csv_rows(request.FILES['file'], PROVISION_HTTP_MAX_ROWS)
+            except (UnicodeDecodeError, csv.Error):
+                return Response({"detail": "Could not read the CSV file."}, status=status.HTTP_400_BAD_REQUEST)
+        else:
+            rows = request.data
+        if not isinstance(rows, list):
+            return Response({"detail": "Expected a list of users or a CSV file."}, status=status.HTTP_400_BAD_REQUEST)
+        if len(rows) > PROVISION_HTTP_MAX_ROWS:
+            return Response(
+                {"detail": f"At most {PROVISION_HTTP_MAX_ROWS} users can be created at once, "
+                           "use the provision_users command for larger imports."},
+                status=status.HTTP_400_BAD_REQUEST,
+            )
+
+        try:
+            users, errors = provision_users(rows)
+        except IntegrityError:
+            return Response({"detail": "Some users were created concurrently, retry the request."},
+                            status=status.HTTP_409_CONFLICT)
+        return Response(
+            {"created": len(users), "ids": [user.id for user in users], "errors": errors},
+            status=status.HTTP_201_CREATED if users else status.HTTP_400_BAD_REQUEST
+        )
+
+
+class SeatSectionListCreateView(generics.ListCreateAPIView):
+    serializer_class = SeatSectionSerializer
+    permission_classes = [permissions.IsAuthenticated, IsEventManager]
+
+    def get_event(self):
+        if not hasattr(self, '_event'):
+            self._event = get_object_or_404(Event, id=self.kwargs['event_id'], created_by=self.request.user)
+        return self._event
+
+    def get_queryset(self):
+        return SeatSection.objects.filter(event=self.get_event())
+
+    def get_serializer_context(self):
+        context = super().get_serializer_context()
+        context['event'] = self.get_event()
+        return context
+
+    def perform_create(self, serializer):
+        serializer.save(event=self.get_event())
 
 
-class EventListView(generics.ListAPIView):
+class EventListView(IncludeArchivedMixin, SparseFieldsetMixin, generics.ListAPIView):
     queryset = Event.objects.all()
     serializer_class = EventListSerializer
     permission_classes = [permissions.AllowAny]
     filter_backends = [DjangoFilterBackend, filters.SearchFilter, filters.OrderingFilter]
-    filterset_fields = ['location', 'date', 'category']
+    filterset_class = EventFilter
     search_fields = ['title', 'description']
 
+    def get_archived_queryset(self):
+        return self.apply_fieldset(ArchivedEvent.objects.all())
+
 
-class BookTicketView(generics.CreateAPIView):
+class EventFacetsView(APIView):
+    """
+    Event counts per category, location and month for the browse filters.
+    Accepts ``category``, ``location``, ``month`` (YYYY-MM) and
+    ``available_only`` filters.
+    """
+    permission_classes = [permissions.AllowAny]
+
+    def get(self, request):
+        params = request.query_params
+        month = params.get('month')
+        if month:
+            try:
+                month = datetime.strptime(month, '%Y-%m').date()
+            except ValueError:
+                return Response({"detail": "month must be in YYYY-MM format."}, status=status.HTTP_400_BAD_REQUEST)
+        counts = facets.facet_counts(
+            category=params.get('category'),
+            location=params.get('location'),
+            month=month,
+            available_only=params.get('available_only', '').lower() in ('1', 'true'),
+        )
+        return Response(counts, status=status.HTTP_200_OK)
+
+
+class BookTicketView(IdempotencyMixin, generics.CreateAPIView):
     serializer_class = BookingSerializer
     permission_classes = [permissions.IsAuthenticated]
 
@@ -68,35 +360,43 @@ class BookTicketView(generics.CreateAPIView):
         serializer.save(user=self.request.user)
 
 
-class MyBookingsView(generics.ListAPIView):
+class BulkBookTicketsView(APIView):
+    permission_classes = [permissions.IsAuthenticated]
+
+    def post(self, request):
+        serializer = BulkBookingSerializer(data=request.data)
+        serializer.is_valid(raise_exception=True)
+        bookings = serializer.save(user=request.user)
+        return Response(BookingSerializer(bookings, many=True).data, status=status.HTTP_201_CREATED)
+
+
+class MyBookingsView(IncludeArchivedMixin, SparseFieldsetMixin, generics.ListAPIView):
     serializer_class = BookingDetailSerializer
     permission_classes = [permissions.IsAuthenticated]
 
     def get_queryset(self):
-        return Booking.objects.filter(user=self.request.user)
+        return self.with_event(Booking.objects.filter(user=self.request.user))
+
+    def get_archived_queryset(self):
+        return self.with_event(ArchivedBooking.objects.filter(user=self.request.user))
+
+    def with_event(self, queryset):
+        queryset = self.apply_fieldset(queryset)
+        if 'event' in self.get_selected_fields():
+            queryset = queryset.select_related('event')
+        return queryset
 
 
 class CancelBookingView(APIView):
     permission_classes = [permissions.IsAuthenticated]
 
     def post(self, request, booking_id):
-        booking = get_object_or_404(Booking, id=booking_id, user=request.user)
-        if booking.status == 'cancelled':
-            return Response({"detail": "Booking already cancelled."}, status=status.HTTP_400_BAD_REQUEST)
-
-        booking.status = 'cancelled'
-        booking.save()
-
-        # Revert payment
-        if hasattr(booking, 'payment'):
-            payment = booking.payment
-            payment.status = 'reverted'
-            payment.save()
-
-        # Update available tickets
-        event = booking.event
-        event.available_tickets += booking.number_of_tickets
-        event.save()
+        try:
+            lifecycle.cancel_booking(booking_id, user=request.user)
+        except Booking.DoesNotExist:
+            raise Http404
+        except lifecycle.BookingLifecycleError as e:
+            return Response({"detail": str(e)}, status=status.HTTP_400_BAD_REQUEST)
 
         # Send Email Notification (optional)
         # Implement email sending here
@@ -104,7 +404,37 @@ class CancelBookingView(APIView):
         return Response({"detail": "Booking cancelled and payment reverted."}, status=status.HTTP_200_OK)
 
 
-class MakePaymentView(generics.CreateAPIView):
+class JoinWaitlistView(generics.CreateAPIView):
+    serializer_class = WaitlistEntrySerializer
+    permission_classes = [permissions.IsAuthenticated]
+
+    def perform_create(self, serializer):
+        serializer.save(user=self.request.user)
+
+
+class WaitlistEntryView(generics.RetrieveAPIView):
+    serializer_class = WaitlistEntrySerializer
+    permission_classes = [permissions.IsAuthenticated]
+    lookup_url_kwarg = 'entry_id'
+
+    def get_queryset(self):
+        return WaitlistEntry.objects.filter(user=self.request.user)
+
+
+class LeaveWaitlistView(APIView):
+    permission_classes = [permissions.IsAuthenticated]
+
+    def post(self, request, entry_id):
+        try:
+            left = waitlist.leave_waitlist(entry_id, request.user)
+        except WaitlistEntry.DoesNotExist:
+            raise Http404
+        if not left:
+            return Response({"detail": "Not on the waitlist anymore."}, status=status.HTTP_400_BAD_REQUEST)
+        return Response({"detail": "Left the waitlist."}, status=status.HTTP_200_OK)
+
+
+class MakePaymentView(IdempotencyMixin, generics.CreateAPIView):
     serializer_class = PaymentSerializer
     permission_classes = [permissions.IsAuthenticated]
 
@@ -132,42 +462,165 @@ class RevertPaymentView(APIView):
         try:
             serializer.save()
             return Response({"detail": "Payment reverted and booking cancelled."}, status=status.HTTP_200_OK)
-        except serializers.ValidationError as e:
+        except ValidationError as e:
             return Response(e.detail, status=status.HTTP_400_BAD_REQUEST)
 
 
 class CancelEventView(APIView):
+    """
+    Stops sales for the event and queues a job that cancels its bookings in
+    chunks and then deletes it. Poll the returned job for progress.
+
+    A job that failed leaves the event closed with part of its bookings
+    cancelled. Posting again re-queues that job; it only picks up the
+    bookings that are still active.
+    """
     permission_classes = [permissions.IsAuthenticated, IsEventManager]
 
     def post(self, request, event_id):
-        event = get_object_or_404(Event, id=event_id, created_by=request.user)
-        bookings = event.bookings.filter(status='booked')
-
-        for booking in bookings:
-            # Cancel each booking
-            booking.status = 'cancelled'
-            booking.save()
-
-            # Revert payment
-            if hasattr(booking, 'payment'):
-                payment = booking.payment
-                payment.status = 'reverted'
-                payment.save()
-
-            # Update available tickets
-            event.available_tickets += booking.number_of_tickets
-            event.save()
-
-            # Send cancellation email to user
-            send_mail(
-                'Event Cancelled',
-                f'Hi {booking.user.username}, the event {event.title} has been cancelled.',
-                settings.EMAIL_HOST_USER,
-                [booking.user.email],
-                fail_silently=False,
+        with transaction.atomic():
+            # Concurrent cancels of the same event queue behind this lock, so
+            # only the first one creates a job
+            event = get_object_or_404(
+                Event.objects.select_for_update().only('id'), id=event_id, created_by=request.user
             )
+            job = Job.objects.filter(
+                kind='cancel_event', payload__event_id=event.id, status__in=('queued', 'running', 'failed')
+            ).order_by('-id').first()
+            if job is not None and job.status == 'failed':
+                Job.objects.filter(id=job.id).update(status='queued', attempts=0, error='', updated_at=timezone.now())
+            elif job is None:
+                lifecycle.close_event(event.id)
+                job = jobs.enqueue(
+                    'cancel_event', request.user, event_id=event.id,
+                    total=Booking.objects.filter(event=event, status='booked').count()
+                )
+
+        return Response(
+            {
+                "detail": "Event cancellation started.",
+                "job_id": job.id,
+                "status_url": reverse('job-detail', kwargs={'job_id': job.id}),
+            },
+            status=status.HTTP_202_ACCEPTED
+        )
+
+
+class JobDetailView(generics.RetrieveAPIView):
+    serializer_class = JobSerializer
+    permission_classes = [permissions.IsAuthenticated]
+    lookup_url_kwarg = 'job_id'
+
+    def get_queryset(self):
+        return Job.objects.filter(created_by=self.request.user)
+
+
+class AuditLogView(generics.ListAPIView):
+    """
+    Status changes of bookings and payments, newest first, filtered by
+    ``booking``, ``event`` or ``user`` (at least one is required). Returns
+    ``page_size`` rows; pass the last id as ``?before=`` for the next page.
+    Users see their own history and managers also that of their events.
+    """
+    serializer_class = AuditEventSerializer
+    permission_classes = [permissions.IsAuthenticated]
+    filter_backends = []
+    page_size = 100
+
+    def get_queryset(self):
+        params = self.request.query_params
+        try:
+            lookups = {f'{name}_id': int(params[name]) for name in ('booking', 'event', 'user') if params.get(name)}
+            before = int(params['before']) if params.get('before') else None
+        except ValueError:
+            raise ValidationError({'detail': "Filters must be ids."})
+        if not lookups:
+            raise ValidationError({'detail': "Filter by booking, event or user."})
+
+        user = self.request.user
+        visible = Q(user_id=user.id)
+        if user.role == 'event_manager':
+            visible |= Q(event_id__in=Event.objects.filter(created_by=user).values('id'))
+        queryset = AuditEvent.objects.filter(visible, **lookups)
+        if before is not None:
+            queryset = queryset.filter(id__lt=before)
+        return queryset.order_by('-id')[:self.page_size]
+
+
+class EventSalesStatsView(generics.ListAPIView):
+    """
+    Sales figures for the manager's events, read from the denormalized
+    EventSalesStats rows.
+    """
+    serializer_class = EventSalesStatsSerializer
+    permission_classes = [permissions.IsAuthenticated, IsEventManager]
+
+    def get_queryset(self):
+        return EventSalesStats.objects.filter(event__created_by=self.request.user).select_related('event').only(
+            'event__id', 'event__title', *stats.STAT_FIELDS
+        ).order_by('event_id')
+
+
+class ExportView(APIView):
+    """
+    Streams the manager's rows as NDJSON (default) or CSV with
+    ``?export_format=csv``. Subclasses must define ``get_queryset()``.
+    """
+    permission_classes = [permissions.IsAuthenticated, IsEventManager]
+    export_name = None
+    export_fields = ()
+
+    def __init_subclass__(cls, **kwargs):
+        super().__init_subclass__(**kwargs)
+        if not callable(getattr(cls, 'get_queryset', None)):
+            raise TypeError(f"{cls.__name__} must define get_queryset().")
+
+    def get(self, request):
+        export_format = request.query_params.get('export_format', 'ndjson')
+        if export_format == 'csv':
+            content_type = 'text/csv'
+            rows = iter_csv(self.get_queryset(), self.export_fields)
+        elif export_format == 'ndjson':
+            content_type = 'application/x-ndjson'
+            rows = iter_ndjson(self.get_queryset(), self.export_fields)
+        else:
+            return Response({"detail": "export_format must be 'ndjson' or 'csv'."}, status=status.HTTP_400_BAD_REQUEST)
+
+        response = StreamingHttpResponse(rows, content_type=content_type)
+        response['Content-Disposition'] = f'attachment; filename="{self.export_name}.{export_format}"'
+        return response
+
+
+class ExportEventsView(ExportView):
+    export_name = 'events'
+    export_fields = EVENT_EXPORT_FIELDS
 
-        # Optionally, deactivate or delete the event
-        event.delete()
+    def get_queryset(self):
+        return Event.objects.filter(created_by=self.request.user).order_by('id')
+
+
+class ExportBookingsView(ExportView):
+    export_name = 'bookings'
+    export_fields = BOOKING_EXPORT_FIELDS
+
+    def get_queryset(self):
+        return Booking.objects.filter(event__created_by=self.request.user).order_by('id')
 
-        return Response({"detail": "Event cancelled and all associated bookings reverted."}, status=status.HTTP_200_OK)
+
+class BatchView(APIView):
+    """
+    Runs an ordered list of API calls in one round trip and returns their
+    results in the same order. With ``"atomic": true`` the calls share one
+    transaction that is rolled back if any of them fails.
+    """
+
+    def post(self, request):
+        from . import batch
+
+        serializer = BatchSerializer(data=request.data)
+        serializer.is_valid(raise_exception=True)
+        prefix = reverse('batch')[:-len('batch/')]
+        results = batch.run_batch(
+            request, serializer.validated_data['requests'], serializer.validated_data['atomic'], prefix
+        )
+        return Response({'results': results})
@@ -0,0 +1,170 @@
+"""
+Per-event FIFO waitlists.
+
+Entries are numbered 1, 2, 3... per event as they join. The entries that
+stopped waiting (left or promoted) are counted in a Fenwick tree of
+``WaitlistDeparture`` nodes, so the position of an entry is its sequence
+minus the departures ahead of it: a read of at most log2(n) nodes by their
+unique index. Joining, leaving and promotion each update O(log n) nodes in
+one statement, under a lock on the event's ``WaitlistQueue`` row (joining and
+promotion lock the event first).
+"""
+from collections import Counter, defaultdict
+
+from django.db import transaction
+from django.db.models import Case, F, Sum, When
+
+from . import audit, facets, stats
+from .models import Booking, Event, WaitlistDeparture, WaitlistEntry, WaitlistQueue
+
+PROMOTION_BATCH_SIZE = 500
+
+
+def _prefix_nodes(sequence):
+    # The nodes whose counts add up to the departures among 1 .. sequence
+    while sequence > 0:
+        yield sequence
+        sequence -= sequence & -sequence
+
+
+def _covering_nodes(sequence, length):
+    # The existing nodes whose range includes sequence
+    while sequence <= length:
+        yield sequence
+        sequence += sequence & -sequence
+
+
+def _lock_queue(event_id):
+    queue = WaitlistQueue.objects.select_for_update().filter(event_id=event_id).first()
+    if queue is None:
+        WaitlistQueue.objects.bulk_create([WaitlistQueue(event_id=event_id)], ignore_conflicts=True)
+        queue = WaitlistQueue.objects.select_for_update().get(event_id=event_id)
+    return queue
+
+
+def _record_departures(event_id, sequences, length):
+    # Adds the entries at ``sequences`` to every node covering them
+    deltas = Counter(node for sequence in sequences for node in _covering_nodes(sequence, length))
+    nodes_by_delta = defaultdict(list)
+    for node, delta in deltas.items():
+        nodes_by_delta[delta].append(node)
+    if nodes_by_delta:
+        WaitlistDeparture.objects.filter(event_id=event_id, node__in=deltas).update(count=Case(
+            *[When(node__in=nodes, then=F('count') + delta) for delta, nodes in nodes_by_delta.items()]
+        ))
+
+
+def enqueue(event_id, entries):
+    """
+    Saves new ``entries`` at the tail of the event's waitlist, in order, and
+    returns them. Adds one tree node per entry, filled from the existing
+    nodes it covers.
+    """
+    with transaction.atomic():
+        # Promotion reads and updates the tree under the event lock, so a
+        # join takes it too, before the queue row as everywhere else
+        list(Event.objects.select_for_update().filter(id=event_id).values_list('id', flat=True))
+        queue = _lock_queue(event_id)
+        length = queue.length
+        sequences = range(length + 1, length + len(entries) + 1)
+        # Node n counts departures in n - (n & -n) + 1 .. n; the new entries
+        # are all waiting, so only sequences up to length contribute
+        bounds = [(min(node - 1, length), min(node - (node & -node), length)) for node in sequences]
+        needed = {node for bound in bounds for end in bound for node in _prefix_nodes(end)}
+        counts = dict(
+            WaitlistDeparture.objects.filter(event_id=event_id, node__in=needed).values_list('node', 'count')
+        ) if needed else {}
+
+        def departed(end):
+            return sum(counts[node] for node in _prefix_nodes(end))
+
+        for entry, sequence in zip(entries, sequences):
+            entry.event_id, entry.sequence = event_id, sequence
+        WaitlistEntry.objects.bulk_create(entries)
+        WaitlistDeparture.objects.bulk_create([
+            WaitlistDeparture(event_id=event_id, node=node, count=departed(end) - departed(start))
+            for node, (end, start) in zip(sequences, bounds)
+        ])
+        queue.length += len(entries)
+        queue.save(update_fields=['length'])
+    return entries
+
+
+def leave_waitlist(entry_id, user):
+    """
+    Takes a waiting entry of ``user`` off its waitlist. Returns False when
+    the entry is no longer waiting and raises ``WaitlistEntry.DoesNotExist``
+    when the user has no such entry.
+    """
+    with transaction.atomic():
+        entry = WaitlistEntry.objects.only('event_id', 'sequence').get(id=entry_id, user=user)
+        queue = _lock_queue(entry.event_id)
+        if not WaitlistEntry.objects.filter(id=entry.id, status='waiting').update(status='left'):
+            return False
+        _record_departures(entry.event_id, [entry.sequence], queue.length)
+    return True
+
+
+def get_position(entry):
+    """
+    Returns the 1-based position of a waiting entry in its event's queue.
+    """
+    departed = WaitlistDeparture.objects.filter(
+        event_id=entry.event_id, node__in=list(_prefix_nodes(entry.sequence - 1))
+    ).aggregate(total=Sum('count'))['total']
+    return entry.sequence - (departed or 0)
+
+
+def promote_waitlist(event_id):
+    """
+    Turns the head of the event's waitlist into bookings for as long as the
+    released tickets cover it. Promotion is strictly FIFO: it stops at the
+    first entry that asks for more tickets than are left. Returns the new
+    bookings.
+    """
+    promoted = []
+    with transaction.atomic():
+        event = (
+            Event.objects.select_for_update()
+            .filter(id=event_id)
+            .only('id', 'available_tickets', 'category', 'location', 'date')
+            .first()
+        )
+        if event is None:
+            return promoted
+        available = event.available_tickets
+        # Events nobody waited for have no queue row
+        queue = WaitlistQueue.objects.select_for_update().filter(event_id=event_id).first() if available else None
+        while queue is not None and available > 0:
+            batch = list(
+                WaitlistEntry.objects.filter(event_id=event_id, status='waiting')
+                .order_by('id')
+                .only('id', 'user_id', 'number_of_tickets', 'sequence')[:PROMOTION_BATCH_SIZE]
+            )
+            entries = []
+            for entry in batch:
+                if entry.number_of_tickets > available:
+                    break
+                available -= entry.number_of_tickets
+                entries.append(entry)
+            if not entries:
+                break
+
+            bookings = Booking.objects.bulk_create([
+                Booking(user_id=entry.user_id, event_id=event_id, number_of_tickets=entry.number_of_tickets)
+                for entry in entries
+            ])
+            for entry, booking in zip(entries, bookings):
+                entry.status = 'promoted'
+                entry.booking = booking
+            WaitlistEntry.objects.bulk_update(entries, ['status', 'booking'])
+            _record_departures(event_id, [entry.sequence for entry in entries], queue.length)
+            tickets = sum(entry.number_of_tickets for entry in entries)
+            Event.objects.filter(id=event_id).update(available_tickets=F('available_tickets') - tickets)
+            stats.booked(event_id, tickets)
+            audit.booking_changed(bookings, 'booked')
+            promoted.extend(bookings)
+            if len(entries) < len(batch):
+                break
+        facets.availability_changed(event, event.available_tickets, available)
+    return promoted